@@ -2,9 +2,11 @@
 Analyzer Agent - Email Analysis with Dialogue Support & Query API
 """
 from uagents import Agent, Context, Model, Protocol
-from openai import OpenAI
-from typing import List
+from typing import Dict, List
+import asyncio
 import time
+import sys
+import os
 from datetime import datetime
 from uuid import uuid4
 from uagents_core.contrib.protocols.chat import (
@@ -16,11 +18,17 @@ from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
 )
 
-# Initialize OpenAI
-client = OpenAI(
-    base_url='https://api.asi1.ai/v1',
-    api_key='sk_a77e3af6ceb240939b2c03ce2d30a9f750fb81f4266d44d192d3a4af763f7b8c',
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.llm import complete
+from src.utils.msglog import MessageLog
+from src.utils.pair_profiles import culture_profile
+from src.utils.config import (
+    ANALYZER_MAX_CONCURRENCY, AGENT_LOG_DIR, AGENT_LOG_SEGMENT_SIZE, AGENT_LOG_MAX_MESSAGES, AGENT_LOG_MAX_AGE, AGENT_LOG_MAX_BYTES,
+    AGENT_LOG_COMPACT_SECONDS, AGENT_MESSAGES_PAGE_SIZE,
 )
+from src.utils.store import email_job_id, results as result_store
 
 # Models
 class EmailInput(Model):
@@ -28,6 +36,7 @@ class EmailInput(Model):
     sender_info: str
     recipient_info: str
     original_chat_sender: str = ""
+    job_id: str = ""  # result store id of this submission (assigned by the Analyzer if empty)
 
 class TestRequest(Model):
     message: str
@@ -37,6 +46,7 @@ class Response(Model):
 
 class GetMessagesRequest(Model):
     last_index: int = 0
+    limit: int = 0  # 0 = AGENT_MESSAGES_PAGE_SIZE
 
 class AgentMessage(Model):
     timestamp: float
@@ -47,7 +57,10 @@ class AgentMessage(Model):
 
 class MessagesResponse(Model):
     messages: List[AgentMessage]
-    last_index: int
+    last_index: int  # pass back as last_index to continue
+    has_more: bool = False
+    first_index: int = 0  # oldest message still kept; older ones were dropped by retention
+    reset: bool = False  # last_index was past the end (the log was cleared): messages start over at first_index
 
 class AnalysisResult(Model):
     context_analysis: str
@@ -61,6 +74,7 @@ class AnalysisResult(Model):
     email_text: str = ""
     sender_info: str = ""
     recipient_info: str = ""
+    job_id: str = ""
 
 class DialogueQuestion(Model):
     """Evaluator asks Analyzer a question"""
@@ -83,6 +97,12 @@ analyzer = Agent(
     endpoint=["http://localhost:8001/submit"]
 )
 
+# Timeline served to GetMessagesRequest queries: appended to, never rewritten, old segments dropped by retention
+message_log = MessageLog(
+    os.path.join(AGENT_LOG_DIR, "analyzer"), AGENT_LOG_SEGMENT_SIZE,
+    max_records=AGENT_LOG_MAX_MESSAGES, max_age=AGENT_LOG_MAX_AGE, max_bytes=AGENT_LOG_MAX_BYTES,
+)
+
 # Helper function to create chat messages
 def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
     content = [TextContent(type="text", text=text)]
@@ -94,25 +114,20 @@ def create_text_chat(text: str, end_session: bool = False) -> ChatMessage:
 chat_protocol = Protocol(spec=chat_protocol_spec)
 
 def add_message(ctx: Context, msg_type: str, content: str, recipient: str = ""):
-    """Add a message to storage"""
-    messages = ctx.storage.get("messages") or []
-    messages.append({
+    """Append a message to the agent's log"""
+    message_log.append({
         "timestamp": time.time(),
         "agent": "Analyzer",
         "type": msg_type,
         "content": content,
         "recipient": recipient
     })
-    ctx.storage.set("messages", messages)
     ctx.logger.info(f"[{msg_type}] {content[:100]}")
 
 @analyzer.on_event("startup")
 async def startup(ctx: Context):
     ctx.logger.info(f"Analyzer Agent started with address: {analyzer.address}")
 
-    # Initialize message storage
-    ctx.storage.set("messages", [])
-
     # Store evaluator address (set this to your evaluator's address)
     ctx.storage.set("evaluator_address", "agent1qw4m67px6nqk0zjmqgv23hux0phn5cukjj8ewt5qlmcvhwmaxxx8v2r3m85")
 
@@ -136,114 +151,143 @@ async def test_query_handler(ctx: Context, sender: str, _query: TestRequest):
 
 @analyzer.on_query(model=GetMessagesRequest, replies={MessagesResponse})
 async def get_messages_handler(ctx: Context, sender: str, msg: GetMessagesRequest):
-    """Query handler to get messages"""
-    messages = ctx.storage.get("messages") or []
-    new_messages = messages[msg.last_index:]
+    """Query handler to get a page of messages from last_index on"""
+    limit = min(msg.limit, AGENT_MESSAGES_PAGE_SIZE) if msg.limit > 0 else AGENT_MESSAGES_PAGE_SIZE
+    first_index = message_log.first
+    start, reset = message_log.resume(msg.last_index)
+    new_messages = message_log.read(start, limit)
+    last_index = start + len(new_messages)
 
     await ctx.send(sender, MessagesResponse(
         messages=new_messages,
-        last_index=len(messages)
+        last_index=last_index,
+        has_more=last_index < len(message_log),
+        first_index=first_index,
+        reset=reset,
     ))
 
+@analyzer.on_interval(period=AGENT_LOG_COMPACT_SECONDS)
+async def compact_messages(ctx: Context):
+    """Apply the message log's retention limits"""
+    dropped = message_log.compact()
+    if dropped:
+        ctx.logger.info(f"Dropped {dropped} old messages")
+
+def analysis_stages(msg: EmailInput) -> List[Dict]:
+    """The six analysis stages. None of them reads another's output."""
+    return [
+        {
+            "field": "context_analysis",
+            "processing": "Analyzing email context and intent...",
+            "system": "You are an expert at analyzing email context, intent, tone, urgency. Be concise (2-3 sentences).",
+            "prompt": f"Analyze this email:\n\nFrom: {msg.sender_info}\nTo: {msg.recipient_info}\n\nEmail:\n{msg.email_text}",
+            "max_tokens": 250,
+            "result_label": "Context Analysis",
+            "result_chars": 200,
+        },
+        {
+            "field": "relationship_analysis",
+            "processing": "Analyzing relationship dynamics...",
+            "system": "Analyze relationship dynamics and power structures. Be concise (2-3 sentences).",
+            "prompt": f"Analyze relationship:\n\nFrom: {msg.sender_info}\nTo: {msg.recipient_info}\n\nEmail:\n{msg.email_text}",
+            "max_tokens": 250,
+            "result_label": "Relationship",
+            "result_chars": 200,
+        },
+        {
+            "field": "culture_analysis",
+            "processing": "Detecting cultural context...",
+            # Depends only on the sender/recipient pair, so it comes from the shared pair cache
+            "fetch": lambda: culture_profile(msg.sender_info, msg.recipient_info),
+            "result_label": "Culture",
+            "result_chars": 150,
+        },
+        {
+            "field": "recipient_simulation",
+            "processing": "Simulating recipient reaction...",
+            "system": "Simulate how recipient would react. Be brief (2-3 sentences).",
+            "prompt": f"How would {msg.recipient_info} react to:\n{msg.email_text}",
+            "max_tokens": 200,
+            "result_label": "Recipient View",
+            "result_chars": 150,
+        },
+        {
+            "field": "sender_advocacy",
+            "processing": "Defending sender intentions...",
+            "system": "Defend sender's intentions. Be brief.",
+            "prompt": f"What are valid reasons for {msg.sender_info} to write:\n{msg.email_text}",
+            "max_tokens": 150,
+            "result_label": None,
+            "result_chars": 0,
+        },
+        {
+            "field": "devils_advocate",
+            "processing": "Identifying potential risks...",
+            "system": "Identify risks and problems. Be brief.",
+            "prompt": f"What could go wrong with this email:\n{msg.email_text}",
+            "max_tokens": 150,
+            "result_label": None,
+            "result_chars": 0,
+        },
+    ]
+
+async def run_stage(ctx: Context, limiter: asyncio.Semaphore, stage: Dict) -> str:
+    """Run one analysis stage, reporting progress through add_message"""
+    async with limiter:
+        add_message(ctx, "processing", stage["processing"])
+        if "fetch" in stage:
+            output = await stage["fetch"]()
+        else:
+            output = await complete(
+                "asi1",
+                "asi1-mini",
+                stage["system"],
+                stage["prompt"],
+                max_tokens=stage["max_tokens"],
+            )
+    if stage["result_label"]:
+        add_message(ctx, "result", f"{stage['result_label']}: {output[:stage['result_chars']]}...")
+    return output
+
 @analyzer.on_message(EmailInput)
 async def analyze_email(ctx: Context, sender: str, msg: EmailInput):
     """Analyze the email"""
     ctx.logger.info(f"Received email from {sender}")
     add_message(ctx, "status", "Starting email analysis...")
 
+    # Each submission gets its own job id, passed along to the Evaluator and Output agents
+    job_id = msg.job_id or email_job_id(msg.email_text, msg.sender_info, msg.recipient_info)
+    now = time.time()
+    result_store.save_job(
+        job_id, source="agents", sender=msg.sender_info, recipient=msg.recipient_info,
+        email_text=msg.email_text, status="running", submitted=now, started=now,
+    )
+
     try:
-        # 1. Context Analysis
-        add_message(ctx, "processing", "Analyzing email context and intent...")
-        context_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "You are an expert at analyzing email context, intent, tone, urgency. Be concise (2-3 sentences)."},
-                {"role": "user", "content": f"Analyze this email:\n\nFrom: {msg.sender_info}\nTo: {msg.recipient_info}\n\nEmail:\n{msg.email_text}"}
-            ],
-            max_tokens=250,
-        )
-        context_analysis = str(context_response.choices[0].message.content)
-        add_message(ctx, "result", f"Context Analysis: {context_analysis[:200]}...")
-
-        # 2. Relationship Analysis
-        add_message(ctx, "processing", "Analyzing relationship dynamics...")
-        relationship_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Analyze relationship dynamics and power structures. Be concise (2-3 sentences)."},
-                {"role": "user", "content": f"Analyze relationship:\n\nFrom: {msg.sender_info}\nTo: {msg.recipient_info}\n\nEmail:\n{msg.email_text}"}
-            ],
-            max_tokens=250,
-        )
-        relationship_analysis = str(relationship_response.choices[0].message.content)
-        add_message(ctx, "result", f"Relationship: {relationship_analysis[:200]}...")
-
-        # 3. Culture Analysis
-        add_message(ctx, "processing", "Detecting cultural context...")
-        culture_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Detect cultural context and communication styles. Be concise (2-3 sentences)."},
-                {"role": "user", "content": f"Analyze cultural aspects:\n\nFrom: {msg.sender_info}\nTo: {msg.recipient_info}"}
-            ],
-            max_tokens=200,
-        )
-        culture_analysis = str(culture_response.choices[0].message.content)
-        add_message(ctx, "result", f"Culture: {culture_analysis[:150]}...")
-
-        # 4. Recipient Simulation
-        add_message(ctx, "processing", "Simulating recipient reaction...")
-        recipient_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Simulate how recipient would react. Be brief (2-3 sentences)."},
-                {"role": "user", "content": f"How would {msg.recipient_info} react to:\n{msg.email_text}"}
-            ],
-            max_tokens=200,
-        )
-        recipient_simulation = str(recipient_response.choices[0].message.content)
-        add_message(ctx, "result", f"Recipient View: {recipient_simulation[:150]}...")
-
-        # 5. Sender Advocacy
-        add_message(ctx, "processing", "Defending sender intentions...")
-        sender_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Defend sender's intentions. Be brief."},
-                {"role": "user", "content": f"What are valid reasons for {msg.sender_info} to write:\n{msg.email_text}"}
-            ],
-            max_tokens=150,
-        )
-        sender_advocacy = str(sender_response.choices[0].message.content)
-
-        # 6. Devil's Advocate
-        add_message(ctx, "processing", "Identifying potential risks...")
-        devils_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Identify risks and problems. Be brief."},
-                {"role": "user", "content": f"What could go wrong with this email:\n{msg.email_text}"}
-            ],
-            max_tokens=150,
-        )
-        devils_advocate = str(devils_response.choices[0].message.content)
+        # 1-6. Independent stages, run concurrently up to ANALYZER_MAX_CONCURRENCY
+        stages = analysis_stages(msg)
+        limiter = asyncio.Semaphore(ANALYZER_MAX_CONCURRENCY)
+        outputs = await asyncio.gather(*(run_stage(ctx, limiter, stage) for stage in stages))
+        results = {stage["field"]: output for stage, output in zip(stages, outputs)}
+        result_store.save_outputs(job_id, results)
 
         # 7. Mediation
         mediation_synthesis = "Analysis complete with balanced perspective from multiple viewpoints."
 
         # Create analysis result
         analysis = AnalysisResult(
-            context_analysis=context_analysis,
-            relationship_analysis=relationship_analysis,
-            culture_analysis=culture_analysis,
-            recipient_simulation=recipient_simulation,
-            sender_advocacy=sender_advocacy,
-            devils_advocate=devils_advocate,
+            context_analysis=results["context_analysis"],
+            relationship_analysis=results["relationship_analysis"],
+            culture_analysis=results["culture_analysis"],
+            recipient_simulation=results["recipient_simulation"],
+            sender_advocacy=results["sender_advocacy"],
+            devils_advocate=results["devils_advocate"],
             mediation_synthesis=mediation_synthesis,
             original_chat_sender=msg.original_chat_sender,
             email_text=msg.email_text,
             sender_info=msg.sender_info,
-            recipient_info=msg.recipient_info
+            recipient_info=msg.recipient_info,
+            job_id=job_id,
         )
 
         add_message(ctx, "complete", "Analysis complete! Sending to Evaluator...", recipient="Evaluator")
@@ -256,6 +300,7 @@ async def analyze_email(ctx: Context, sender: str, msg: EmailInput):
     except Exception as e:
         ctx.logger.exception(f"Error: {e}")
         add_message(ctx, "error", f"Error during analysis: {str(e)}")
+        result_store.save_job(job_id, status="failed", error=str(e), finished=time.time())
 
 @analyzer.on_message(DialogueQuestion)
 async def handle_dialogue_question(ctx: Context, sender: str, msg: DialogueQuestion):
@@ -275,15 +320,13 @@ async def handle_dialogue_question(ctx: Context, sender: str, msg: DialogueQuest
 
         # Generate response using LLM
         add_message(ctx, "processing", f"Formulating response to Evaluator (Round {msg.round_number})...")
-        response_obj = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "You are the Analyzer defending and clarifying your analysis. Be thoughtful but concise (2-4 sentences)."},
-                {"role": "user", "content": f"Evaluator asks: {msg.question}\n\nYour analysis context: {msg.context}\n\nProvide a clear response."}
-            ],
+        response_text = await complete(
+            "asi1",
+            "asi1-mini",
+            "You are the Analyzer defending and clarifying your analysis. Be thoughtful but concise (2-4 sentences).",
+            f"Evaluator asks: {msg.question}\n\nYour analysis context: {msg.context}\n\nProvide a clear response.",
             max_tokens=250,
         )
-        response_text = str(response_obj.choices[0].message.content)
 
         add_message(ctx, "dialogue", f"Analyzer responds (Round {msg.round_number}): {response_text[:150]}...", recipient="Evaluator")
 
@@ -335,24 +378,21 @@ async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
 
     try:
         # Generate response using LLM
-        r = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": """You are the Analyzer agent, an expert in email analysis. You help users understand:
+        response = await complete(
+            "asi1",
+            "asi1-mini",
+            """You are the Analyzer agent, an expert in email analysis. You help users understand:
 - Email context, intent, tone, and urgency
 - Relationship dynamics and power structures
 - Cultural communication styles
 - Recipient perspectives and reactions
 - Risk assessment and mediation
 
-Provide helpful, concise responses about email analysis topics."""},
-                {"role": "user", "content": text},
-            ],
+Provide helpful, concise responses about email analysis topics.""",
+            text,
             max_tokens=2048,
         )
 
-        response = str(r.choices[0].message.content)
-
         # Store outgoing chat response
         add_message(ctx, "chat", f"Chat to {sender[:16]}...: {response[:100]}", recipient=sender[:16])
 
@@ -2,15 +2,21 @@
 Evaluator Agent - Email Evaluation with Multi-Round Dialogue
 """
 from uagents import Agent, Context, Model
-from openai import OpenAI
 from typing import List
 import re
 import time
-
-# Initialize OpenAI
-client = OpenAI(
-    base_url='https://api.asi1.ai/v1',
-    api_key='sk_a77e3af6ceb240939b2c03ce2d30a9f750fb81f4266d44d192d3a4af763f7b8c',
+import sys
+import os
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.llm import complete
+from src.utils.msglog import MessageLog
+from src.utils.store import email_job_id, results as result_store
+from src.utils.config import (
+    AGENT_LOG_DIR, AGENT_LOG_SEGMENT_SIZE, AGENT_LOG_MAX_MESSAGES, AGENT_LOG_MAX_AGE, AGENT_LOG_MAX_BYTES,
+    AGENT_LOG_COMPACT_SECONDS, AGENT_MESSAGES_PAGE_SIZE,
 )
 
 # Models
@@ -22,6 +28,7 @@ class Response(Model):
 
 class GetMessagesRequest(Model):
     last_index: int = 0
+    limit: int = 0  # 0 = AGENT_MESSAGES_PAGE_SIZE
 
 class AgentMessage(Model):
     timestamp: float
@@ -32,7 +39,10 @@ class AgentMessage(Model):
 
 class MessagesResponse(Model):
     messages: List[AgentMessage]
-    last_index: int
+    last_index: int  # pass back as last_index to continue
+    has_more: bool = False
+    first_index: int = 0  # oldest message still kept; older ones were dropped by retention
+    reset: bool = False  # last_index was past the end (the log was cleared): messages start over at first_index
 
 class AnalysisResult(Model):
     context_analysis: str
@@ -46,6 +56,7 @@ class AnalysisResult(Model):
     email_text: str = ""
     sender_info: str = ""
     recipient_info: str = ""
+    job_id: str = ""
 
 class EvaluationResult(Model):
     analysis_summary: str
@@ -58,6 +69,7 @@ class EvaluationResult(Model):
     email_text: str = ""
     sender_info: str = ""
     recipient_info: str = ""
+    job_id: str = ""
 
 class DialogueQuestion(Model):
     """Evaluator asks Analyzer a question"""
@@ -80,26 +92,27 @@ evaluator = Agent(
     endpoint=["http://localhost:8002/submit"]
 )
 
+# Timeline served to GetMessagesRequest queries: appended to, never rewritten, old segments dropped by retention
+message_log = MessageLog(
+    os.path.join(AGENT_LOG_DIR, "evaluator"), AGENT_LOG_SEGMENT_SIZE,
+    max_records=AGENT_LOG_MAX_MESSAGES, max_age=AGENT_LOG_MAX_AGE, max_bytes=AGENT_LOG_MAX_BYTES,
+)
+
 def add_message(ctx: Context, msg_type: str, content: str, recipient: str = ""):
-    """Add a message to storage"""
-    messages = ctx.storage.get("messages") or []
-    messages.append({
+    """Append a message to the agent's log"""
+    message_log.append({
         "timestamp": time.time(),
         "agent": "Evaluator",
         "type": msg_type,
         "content": content,
         "recipient": recipient
     })
-    ctx.storage.set("messages", messages)
     ctx.logger.info(f"[{msg_type}] {content[:100]}")
 
 @evaluator.on_event("startup")
 async def startup(ctx: Context):
     ctx.logger.info(f"Evaluator Agent started with address: {evaluator.address}")
 
-    # Initialize message storage
-    ctx.storage.set("messages", [])
-
     # Store output address (set this to your output agent's address)
     ctx.storage.set("output_address", "agent1qtdp0gp2v9zlz55q4j09lk8gy63uawz5ygxje4qzcgkvy04d0lwwcr9kcg9")
 
@@ -122,15 +135,28 @@ async def test_query_handler(ctx: Context, sender: str, _query: TestRequest):
 
 @evaluator.on_query(model=GetMessagesRequest, replies={MessagesResponse})
 async def get_messages_handler(ctx: Context, sender: str, msg: GetMessagesRequest):
-    """Query handler to get messages"""
-    messages = ctx.storage.get("messages") or []
-    new_messages = messages[msg.last_index:]
+    """Query handler to get a page of messages from last_index on"""
+    limit = min(msg.limit, AGENT_MESSAGES_PAGE_SIZE) if msg.limit > 0 else AGENT_MESSAGES_PAGE_SIZE
+    first_index = message_log.first
+    start, reset = message_log.resume(msg.last_index)
+    new_messages = message_log.read(start, limit)
+    last_index = start + len(new_messages)
 
     await ctx.send(sender, MessagesResponse(
         messages=new_messages,
-        last_index=len(messages)
+        last_index=last_index,
+        has_more=last_index < len(message_log),
+        first_index=first_index,
+        reset=reset,
     ))
 
+@evaluator.on_interval(period=AGENT_LOG_COMPACT_SECONDS)
+async def compact_messages(ctx: Context):
+    """Apply the message log's retention limits"""
+    dropped = message_log.compact()
+    if dropped:
+        ctx.logger.info(f"Dropped {dropped} old messages")
+
 @evaluator.on_message(AnalysisResult)
 async def evaluate_email(ctx: Context, sender: str, msg: AnalysisResult):
     """Receive analysis and start dialogue"""
@@ -151,7 +177,8 @@ async def evaluate_email(ctx: Context, sender: str, msg: AnalysisResult):
             "email_text": msg.email_text,
             "sender_info": msg.sender_info,
             "recipient_info": msg.recipient_info,
-            "original_chat_sender": msg.original_chat_sender
+            "original_chat_sender": msg.original_chat_sender,
+            "job_id": msg.job_id or email_job_id(msg.email_text, msg.sender_info, msg.recipient_info),
         })
 
         # Initialize dialogue state
@@ -162,15 +189,14 @@ async def evaluate_email(ctx: Context, sender: str, msg: AnalysisResult):
         # Start dialogue - ask first question
         add_message(ctx, "processing", "Reviewing analysis and formulating questions (Round 1)...")
 
-        question_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "You are an evaluator reviewing an email analysis. Ask ONE specific, critical question about the analysis. Be concise (1-2 sentences)."},
-                {"role": "user", "content": f"Review this analysis and ask a critical question:\n\nContext: {msg.context_analysis[:300]}\nRelationship: {msg.relationship_analysis[:300]}\nRisks: {msg.devils_advocate[:300]}"}
-            ],
+        question_text = await complete(
+            "asi1",
+            "asi1-mini",
+            "You are an evaluator reviewing an email analysis. Ask ONE specific, critical question about the analysis. Be concise (1-2 sentences).",
+            f"Review this analysis and ask a critical question:\n\nContext: {msg.context_analysis[:300]}\nRelationship: {msg.relationship_analysis[:300]}\nRisks: {msg.devils_advocate[:300]}",
             max_tokens=150,
+            timeout=15,
         )
-        question_text = str(question_response.choices[0].message.content)
 
         add_message(ctx, "dialogue", f"Evaluator asks (Round 1): {question_text[:150]}...", recipient="Analyzer")
 
@@ -216,15 +242,14 @@ async def handle_dialogue_response(ctx: Context, sender: str, msg: DialogueRespo
             add_message(ctx, "processing", f"Formulating follow-up question (Round {next_round})...")
 
             # Generate next question based on previous response
-            question_response = client.chat.completions.create(
-                model="asi1-mini",
-                messages=[
-                    {"role": "system", "content": f"You are continuing a dialogue. Based on the Analyzer's response, ask ONE follow-up question or challenge. Be specific and concise (1-2 sentences). This is round {next_round} of {max_rounds}."},
-                    {"role": "user", "content": f"Analyzer responded: {msg.response}\n\nAsk a follow-up question or challenge their reasoning."}
-                ],
+            question_text = await complete(
+                "asi1",
+                "asi1-mini",
+                f"You are continuing a dialogue. Based on the Analyzer's response, ask ONE follow-up question or challenge. Be specific and concise (1-2 sentences). This is round {next_round} of {max_rounds}.",
+                f"Analyzer responded: {msg.response}\n\nAsk a follow-up question or challenge their reasoning.",
                 max_tokens=150,
+                timeout=15,
             )
-            question_text = str(question_response.choices[0].message.content)
 
             add_message(ctx, "dialogue", f"Evaluator asks (Round {next_round}): {question_text[:150]}...", recipient="Analyzer")
 
@@ -258,54 +283,46 @@ async def proceed_with_evaluation(ctx: Context, original_chat_sender: str):
 
         # 1. Tone Validation
         add_message(ctx, "processing", "Evaluating tone appropriateness...")
-        tone_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Evaluate tone appropriateness and professionalism. Be concise."},
-                {"role": "user", "content": f"Evaluate tone:\n\nContext: {analysis['context_analysis'][:300]}\nRelationship: {analysis['relationship_analysis'][:300]}"}
-            ],
+        tone_evaluation = await complete(
+            "asi1",
+            "asi1-mini",
+            "Evaluate tone appropriateness and professionalism. Be concise.",
+            f"Evaluate tone:\n\nContext: {analysis['context_analysis'][:300]}\nRelationship: {analysis['relationship_analysis'][:300]}",
             max_tokens=250,
         )
-        tone_evaluation = str(tone_response.choices[0].message.content)
         add_message(ctx, "result", f"Tone Evaluation: {tone_evaluation[:200]}...")
 
         # 2. Goal Alignment
         add_message(ctx, "processing", "Assessing goal achievement...")
-        goal_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Assess whether email achieves its goals. Be concise."},
-                {"role": "user", "content": f"Evaluate goals:\n\nContext: {analysis['context_analysis'][:300]}\nRecipient: {analysis['recipient_simulation'][:300]}"}
-            ],
+        goal_alignment = await complete(
+            "asi1",
+            "asi1-mini",
+            "Assess whether email achieves its goals. Be concise.",
+            f"Evaluate goals:\n\nContext: {analysis['context_analysis'][:300]}\nRecipient: {analysis['recipient_simulation'][:300]}",
             max_tokens=250,
         )
-        goal_alignment = str(goal_response.choices[0].message.content)
         add_message(ctx, "result", f"Goal Alignment: {goal_alignment[:200]}...")
 
         # 3. Risk Assessment
         add_message(ctx, "processing", "Calculating risk score...")
-        risk_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Assess communication risks. Provide a risk score (1-10). Be concise."},
-                {"role": "user", "content": f"Assess risks:\n\nProblems: {analysis['devils_advocate'][:300]}\nRecipient: {analysis['recipient_simulation'][:300]}"}
-            ],
+        risk_assessment = await complete(
+            "asi1",
+            "asi1-mini",
+            "Assess communication risks. Provide a risk score (1-10). Be concise.",
+            f"Assess risks:\n\nProblems: {analysis['devils_advocate'][:300]}\nRecipient: {analysis['recipient_simulation'][:300]}",
             max_tokens=250,
         )
-        risk_assessment = str(risk_response.choices[0].message.content)
         add_message(ctx, "result", f"Risk Assessment: {risk_assessment[:200]}...")
 
         # 4. Overall Score
         add_message(ctx, "processing", "Calculating overall score...")
-        overall_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Provide an overall score (0-10) and brief recommendation."},
-                {"role": "user", "content": f"Score this:\nTone: {tone_evaluation[:200]}\nGoals: {goal_alignment[:200]}\nRisks: {risk_assessment[:200]}"}
-            ],
+        overall_eval = await complete(
+            "asi1",
+            "asi1-mini",
+            "Provide an overall score (0-10) and brief recommendation.",
+            f"Score this:\nTone: {tone_evaluation[:200]}\nGoals: {goal_alignment[:200]}\nRisks: {risk_assessment[:200]}",
             max_tokens=200,
         )
-        overall_eval = str(overall_response.choices[0].message.content)
 
         # Extract score
         score = 7.0
@@ -318,6 +335,17 @@ async def proceed_with_evaluation(ctx: Context, original_chat_sender: str):
 
         add_message(ctx, "result", f"Overall Score: {score}/10")
 
+        job_id = analysis['job_id']
+        dialogue_history = ctx.storage.get("dialogue_history") or []
+        result_store.save_outputs(job_id, {
+            "evaluator_dialogue": "\n\n".join(f"Round {turn['round']}: {turn['content']}" for turn in dialogue_history),
+            "tone_evaluation": tone_evaluation,
+            "goal_alignment": goal_alignment,
+            "risk_assessment": risk_assessment,
+            "overall_evaluation": overall_eval,
+        })
+        result_store.save_job(job_id, score=score)
+
         # Create evaluation result
         evaluation = EvaluationResult(
             analysis_summary=analysis['mediation_synthesis'],
@@ -329,7 +357,8 @@ async def proceed_with_evaluation(ctx: Context, original_chat_sender: str):
             original_chat_sender=original_chat_sender,
             email_text=analysis['email_text'],
             sender_info=analysis['sender_info'],
-            recipient_info=analysis['recipient_info']
+            recipient_info=analysis['recipient_info'],
+            job_id=job_id,
         )
 
         add_message(ctx, "complete", f"Evaluation complete! (Score: {score}/10) Sending to Output...", recipient="Output")
@@ -2,19 +2,26 @@
 Output Agent - Final Feedback and Email Rewrites
 """
 from uagents import Agent, Context, Model
-from openai import OpenAI
 from typing import List
 import time
-
-# Initialize OpenAI
-client = OpenAI(
-    base_url='https://api.asi1.ai/v1',
-    api_key='sk_a77e3af6ceb240939b2c03ce2d30a9f750fb81f4266d44d192d3a4af763f7b8c',
+import sys
+import os
+
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.llm import complete
+from src.utils.msglog import MessageLog
+from src.utils.store import email_job_id, results as result_store
+from src.utils.config import (
+    AGENT_LOG_DIR, AGENT_LOG_SEGMENT_SIZE, AGENT_LOG_MAX_MESSAGES, AGENT_LOG_MAX_AGE, AGENT_LOG_MAX_BYTES,
+    AGENT_LOG_COMPACT_SECONDS, AGENT_MESSAGES_PAGE_SIZE,
 )
 
 # Models
 class GetMessagesRequest(Model):
     last_index: int = 0
+    limit: int = 0  # 0 = AGENT_MESSAGES_PAGE_SIZE
 
 class AgentMessage(Model):
     timestamp: float
@@ -25,7 +32,10 @@ class AgentMessage(Model):
 
 class MessagesResponse(Model):
     messages: List[AgentMessage]
-    last_index: int
+    last_index: int  # pass back as last_index to continue
+    has_more: bool = False
+    first_index: int = 0  # oldest message still kept; older ones were dropped by retention
+    reset: bool = False  # last_index was past the end (the log was cleared): messages start over at first_index
 
 class EvaluationResult(Model):
     analysis_summary: str
@@ -38,6 +48,7 @@ class EvaluationResult(Model):
     email_text: str = ""
     sender_info: str = ""
     recipient_info: str = ""
+    job_id: str = ""
 
 class FinalOutput(Model):
     feedback: str
@@ -53,26 +64,27 @@ output_agent = Agent(
     endpoint=["http://localhost:8003/submit"]
 )
 
+# Timeline served to GetMessagesRequest queries: appended to, never rewritten, old segments dropped by retention
+message_log = MessageLog(
+    os.path.join(AGENT_LOG_DIR, "output"), AGENT_LOG_SEGMENT_SIZE,
+    max_records=AGENT_LOG_MAX_MESSAGES, max_age=AGENT_LOG_MAX_AGE, max_bytes=AGENT_LOG_MAX_BYTES,
+)
+
 def add_message(ctx: Context, msg_type: str, content: str, recipient: str = ""):
-    """Add a message to storage"""
-    messages = ctx.storage.get("messages") or []
-    messages.append({
+    """Append a message to the agent's log"""
+    message_log.append({
         "timestamp": time.time(),
         "agent": "Output",
         "type": msg_type,
         "content": content,
         "recipient": recipient
     })
-    ctx.storage.set("messages", messages)
     ctx.logger.info(f"[{msg_type}] {content[:100]}")
 
 @output_agent.on_event("startup")
 async def startup(ctx: Context):
     ctx.logger.info(f"Output Agent started with address: {output_agent.address}")
 
-    # Initialize message storage
-    ctx.storage.set("messages", [])
-
     print(f"\n{'='*60}")
     print(f"📝 OUTPUT AGENT")
     print(f"Address: {output_agent.address}")
@@ -81,47 +93,59 @@ async def startup(ctx: Context):
 
 @output_agent.on_query(model=GetMessagesRequest, replies={MessagesResponse})
 async def get_messages_handler(ctx: Context, sender: str, msg: GetMessagesRequest):
-    """Query handler to get messages"""
-    messages = ctx.storage.get("messages") or []
-    new_messages = messages[msg.last_index:]
+    """Query handler to get a page of messages from last_index on"""
+    limit = min(msg.limit, AGENT_MESSAGES_PAGE_SIZE) if msg.limit > 0 else AGENT_MESSAGES_PAGE_SIZE
+    first_index = message_log.first
+    start, reset = message_log.resume(msg.last_index)
+    new_messages = message_log.read(start, limit)
+    last_index = start + len(new_messages)
 
     await ctx.send(sender, MessagesResponse(
         messages=new_messages,
-        last_index=len(messages)
+        last_index=last_index,
+        has_more=last_index < len(message_log),
+        first_index=first_index,
+        reset=reset,
     ))
 
+@output_agent.on_interval(period=AGENT_LOG_COMPACT_SECONDS)
+async def compact_messages(ctx: Context):
+    """Apply the message log's retention limits"""
+    dropped = message_log.compact()
+    if dropped:
+        ctx.logger.info(f"Dropped {dropped} old messages")
+
 @output_agent.on_message(EvaluationResult)
 async def generate_output(ctx: Context, sender: str, msg: EvaluationResult):
     """Generate final output"""
     ctx.logger.info(f"Received evaluation from {sender}")
     add_message(ctx, "status", "Received evaluation from Evaluator", recipient="Evaluator")
     add_message(ctx, "processing", "Starting output generation...")
+    job_id = msg.job_id or email_job_id(msg.email_text, msg.sender_info, msg.recipient_info)
 
     try:
         # 1. Generate Feedback
         add_message(ctx, "processing", "Synthesizing feedback...")
-        feedback_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Synthesize evaluation into actionable feedback. Be concise but helpful. Include: summary, strengths, issues, action items."},
-                {"role": "user", "content": f"Score: {msg.overall_score}/10\n\nTone: {msg.tone_evaluation[:200]}\nGoals: {msg.goal_alignment[:200]}\nRisks: {msg.risk_assessment[:200]}"}
-            ],
+        feedback = await complete(
+            "asi1",
+            "asi1-mini",
+            "Synthesize evaluation into actionable feedback. Be concise but helpful. Include: summary, strengths, issues, action items.",
+            f"Score: {msg.overall_score}/10\n\nTone: {msg.tone_evaluation[:200]}\nGoals: {msg.goal_alignment[:200]}\nRisks: {msg.risk_assessment[:200]}",
             max_tokens=600,
+            timeout=45,
         )
-        feedback = str(feedback_response.choices[0].message.content)
         add_message(ctx, "result", "Feedback generated")
 
         # 2. Generate Rewrites
         add_message(ctx, "processing", "Generating rewritten versions...")
-        rewrite_response = client.chat.completions.create(
-            model="asi1-mini",
-            messages=[
-                {"role": "system", "content": "Generate THREE versions: 1) CONSERVATIVE (minimal changes), 2) RECOMMENDED (balanced), 3) BOLD (major revisions). Explain each briefly."},
-                {"role": "user", "content": f"Rewrite:\n\nORIGINAL:\n{msg.email_text}\n\nEVALUATION:\nScore: {msg.overall_score}/10\nTone Issues: {msg.tone_evaluation[:200]}\nGoal Issues: {msg.goal_alignment[:200]}"}
-            ],
+        rewritten_email = await complete(
+            "asi1",
+            "asi1-mini",
+            "Generate THREE versions: 1) CONSERVATIVE (minimal changes), 2) RECOMMENDED (balanced), 3) BOLD (major revisions). Explain each briefly.",
+            f"Rewrite:\n\nORIGINAL:\n{msg.email_text}\n\nEVALUATION:\nScore: {msg.overall_score}/10\nTone Issues: {msg.tone_evaluation[:200]}\nGoal Issues: {msg.goal_alignment[:200]}",
             max_tokens=1200,
+            timeout=60,
         )
-        rewritten_email = str(rewrite_response.choices[0].message.content)
         add_message(ctx, "result", "Rewrites generated")
 
         # Create final output
@@ -132,6 +156,9 @@ async def generate_output(ctx: Context, sender: str, msg: EvaluationResult):
             original_chat_sender=msg.original_chat_sender
         )
 
+        result_store.save_outputs(job_id, {"feedback": feedback, "rewritten_email": rewritten_email})
+        result_store.save_job(job_id, status="done", finished=time.time())
+
         add_message(ctx, "complete", f"Output generation complete! (Score: {msg.overall_score}/10)")
         add_message(ctx, "result", f"FEEDBACK: {feedback[:200]}...")
         add_message(ctx, "result", f"REWRITES: {rewritten_email[:200]}...")
@@ -155,6 +182,7 @@ async def generate_output(ctx: Context, sender: str, msg: EvaluationResult):
     except Exception as e:
         ctx.logger.exception(f"Error: {e}")
         add_message(ctx, "error", f"Error during output generation: {str(e)}")
+        result_store.save_job(job_id, status="failed", error=str(e), finished=time.time())
 
 if __name__ == "__main__":
     print("Starting Output Agent...")
@@ -2,225 +2,506 @@
 12-Agent Email Analysis System
 4 Layers with 2 rounds of dialogue between each agent
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from anthropic import Anthropic
-import time
+import asyncio
 import threading
-from typing import List, Dict
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+import sys
 import os
 
-# Initialize Anthropic
-client = Anthropic(
-    api_key='sk-ant-REDACTED',
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.llm import complete, complete_sync, llm_stats, ProviderUnavailable
+from src.utils.cancel import Cancelled
+from src.utils.budget import LadderStep, TimeBudget
+from src.utils.pair_profiles import culture_profile, culture_profile_sync, culture_profiles
+from src.utils.events import MessageFeed, sse_stream
+from src.utils.jobs import DEFAULT_TENANT, Job, JobQueue, QueueFull, QUEUED, RUNNING
+from src.utils.store import JOB_COLUMNS, results
+from src.utils.pipeline import DialogueGraph, DialogueNode
+from src.utils.similarity import jaccard, token_set
+from src.utils.compaction import SUMMARY_PROMPT, ContextCompactor
+from src.utils.config import (
+    JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, JOB_TENANT_WEIGHTS, JOB_TENANT_MAX_RUNNING, JOB_INTERACTIVE_RESERVED,
+    JOB_BUDGET_SECONDS, LONG_POLL_MAX_WAIT, DIALOGUE_CONVERGENCE_THRESHOLD, CONTEXT_TOKEN_BUDGET, CONTEXT_DIGEST,
 )
 
 # Initialize Flask
 app = Flask(__name__, static_folder='.')
 CORS(app)
 
-# In-memory storage for messages
-messages_store: List[Dict] = []
-analysis_in_progress = False
+# Job being run on this thread or task (set per job, inherited by pipeline threads and tasks)
+current_job: ContextVar[Job] = ContextVar("current_job")
+
+# Latency budget of the run on this thread or task (unbounded unless the run sets one)
+current_budget: ContextVar[TimeBudget] = ContextVar("current_budget", default=TimeBudget(None))
 
-def add_message(agent: str, msg_type: str, content: str):
-    """Add a message to the store"""
+def add_message(agent: str, msg_type: str, content: str, turn_id: Optional[str] = None):
+    """Add a message to the current job's timeline and stored transcript (turn_id: the draft it replaces)"""
     message = {
         "timestamp": time.time(),
         "agent": agent,
         "type": msg_type,
         "content": content
     }
-    messages_store.append(message)
+    if turn_id:
+        message["turn_id"] = turn_id
+    job = current_job.get()
+    job.feed.append(message)
+    results.save_message(job.id, message)
     print(f"[{agent}] [{msg_type}] {content[:100]}")
     return message
 
-def agent_response(agent_name: str, system_prompt: str, user_prompt: str, context: str = "") -> str:
-    """Get a single response from an agent"""
+def ladder_step() -> LadderStep:
+    """Current degradation step of the run's time budget, announced on the timeline when it is reached"""
+    budget = current_budget.get()
+    return budget.step(on_change=lambda step: add_message("System", "status", f"⏱️ Time budget: {budget.describe()}"))
+
+def agent_response(agent_name: str, system_prompt: str, user_prompt: str, context: str = "",
+                   turn_id: Optional[str] = None) -> str:
+    """Get a single response from an agent, streaming its text to the timeline (as turn_id's draft) as it arrives"""
     full_prompt = f"{context}\n\n{user_prompt}" if context else user_prompt
+    job = current_job.get()
+    budget = current_budget.get()
 
-    response = client.messages.create(
-        model="claude-3-5-haiku-20241022",
-        max_tokens=300,
-        system=system_prompt,
-        messages=[
-            {"role": "user", "content": full_prompt}
-        ]
-    )
-    content = str(response.content[0].text)
-    add_message(agent_name, "message", content)
-    time.sleep(0.3)
+    try:
+        content = complete_sync(
+            "anthropic",
+            "claude-3-5-haiku-20241022",
+            system_prompt,
+            full_prompt,
+            max_tokens=ladder_step().max_tokens(300),
+            on_partial=lambda text: job.feed.draft(agent_name, text, turn_id),
+            cancel=job.cancel_token,
+            total_timeout=budget.call_timeout(),
+        )
+    except ProviderUnavailable as e:
+        # Circuit is open: keep the pipeline moving with a placeholder turn instead of waiting
+        content = f"[{agent_name} is unavailable right now: {e}]"
+    except TimeoutError:
+        if budget.seconds is None:
+            raise
+        content = f"[{agent_name} ran out of time]"
+    add_message(agent_name, "message", content, turn_id)
+    return content
+
+async def agent_response_async(agent_name: str, system_prompt: str, user_prompt: str, context: str = "",
+                               turn_id: Optional[str] = None) -> str:
+    """agent_response() for the async server: awaits the gateway (cancelling the job's task aborts the request)"""
+    full_prompt = f"{context}\n\n{user_prompt}" if context else user_prompt
+    job = current_job.get()
+    budget = current_budget.get()
+
+    try:
+        content = await complete(
+            "anthropic",
+            "claude-3-5-haiku-20241022",
+            system_prompt,
+            full_prompt,
+            max_tokens=ladder_step().max_tokens(300),
+            on_partial=lambda text: job.feed.draft(agent_name, text, turn_id),
+            total_timeout=budget.call_timeout(),
+        )
+    except ProviderUnavailable as e:
+        content = f"[{agent_name} is unavailable right now: {e}]"
+    except TimeoutError:
+        if budget.seconds is None:
+            raise
+        content = f"[{agent_name} ran out of time]"
+    add_message(agent_name, "message", content, turn_id)
     return content
 
-def two_agent_dialogue(agent1_name: str, agent1_prompt: str, agent2_name: str, agent2_prompt: str, topic: str, context: str = "") -> tuple:
-    """Have 2 rounds of dialogue between two agents about the email"""
+# Turns of a two-agent dialogue: who speaks, and what they are asked after the other agent's last reply
+DIALOGUE_TURNS = [
+    (1, None),  # Round 1: Agent 1 speaks about the email
+    (2, "Respond to their point while analyzing the email:"),  # Round 1: Agent 2 responds
+    (1, "Respond to their point while continuing to analyze the email:"),  # Round 2: Agent 1 responds back
+    (2, "Provide your final analysis of the email, building on this dialogue:"),  # Round 2: Agent 2 final response
+]
+
+def turn_prompt(ask: Optional[str], topic: str, other_name: str, responses: List[str]) -> str:
+    """Prompt for one dialogue turn - every turn keeps the email in context"""
+    if ask is None:
+        return topic
+    return f"{topic}\n\n{other_name} said: {responses[-1]}\n\n{ask}"
+
+# Dialogue turns made and left out, reported under "dialogues" in /api/stats
+dialogue_counts = {"dialogues": 0, "calls": 0, "converged": 0, "calls_saved": 0, "cut_for_time": 0}
+dialogue_counts_lock = threading.Lock()
+
+def converged(responses: List[str]) -> bool:
+    """Whether the latest turn mostly restates one of the two before it (token-set overlap)"""
+    if DIALOGUE_CONVERGENCE_THRESHOLD <= 0 or len(responses) < 2:
+        return False
+    latest = token_set(responses[-1])
+    return max(jaccard(latest, token_set(earlier)) for earlier in responses[-3:-1]) >= DIALOGUE_CONVERGENCE_THRESHOLD
+
+def dialogue_stop(turn: int, responses: List[str]) -> Optional[str]:
+    """Why a dialogue ends before this turn: "time" (the budget allows no more rounds), "converged" or None"""
+    if turn > 2 * ladder_step().rounds:
+        return "time"
+    if converged(responses):
+        return "converged"
+    return None
+
+def finish_dialogue(responses: List[str], agents: Dict[int, Tuple[str, str]], on_turn: Callable[[int, str], None],
+                    stop: Optional[str]) -> tuple:
+    """Count a dialogue's calls and complete it to four turns if it ended early
+
+    Each missing turn repeats its own speaker's last word (the keys downstream read are per speaker);
+    a speaker with none gets a placeholder saying why the dialogue ended.
+    """
+    real = len(responses)
+    missing = len(DIALOGUE_TURNS) - real
+    with dialogue_counts_lock:
+        dialogue_counts["dialogues"] += 1
+        dialogue_counts["calls"] += real
+        if stop == "converged":
+            dialogue_counts["converged"] += 1
+            dialogue_counts["calls_saved"] += missing
+        elif stop == "time":
+            dialogue_counts["cut_for_time"] += missing
+    if stop == "converged":
+        add_message("System", "status", f"🤝 {agents[1][0]} and {agents[2][0]} converged after {real} turns")
+
+    for turn in range(real + 1, len(DIALOGUE_TURNS) + 1):
+        speaker = DIALOGUE_TURNS[turn - 1][0]
+        said = [response for (s, _), response in zip(DIALOGUE_TURNS, responses) if s == speaker]
+        if said:
+            responses.append(said[-1])
+        elif stop == "converged":
+            responses.append("(no response — dialogue converged)")
+        else:
+            responses.append(f"[{agents[speaker][0]} ran out of time]")
+        on_turn(turn, responses[-1])
+    return tuple(responses)
+
+def two_agent_dialogue(agent1_name: str, agent1_prompt: str, agent2_name: str, agent2_prompt: str, topic: str, context: str = "", on_turn: Optional[Callable[[int, str], None]] = None, node: str = "") -> tuple:
+    """Have 2 rounds of dialogue between two agents about the email
+
+    on_turn(turn_number, text), if given, is called as each of the four turns finishes.
+    Each turn streams under the turn id "<node>:<turn>", so an agent in two concurrent dialogues has two drafts.
+    Stops with Cancelled between turns (or mid-turn) once the current job is cancelled.
+    Ends early once a turn restates an earlier one (the agents have converged) or the time
+    budget runs low; the four turns are then completed from the ones that were made.
+    """
+    on_turn = on_turn or (lambda turn, text: None)
+    cancel = current_job.get().cancel_token
+    agents = {1: (agent1_name, agent1_prompt), 2: (agent2_name, agent2_prompt)}
+
+    responses, stop = [], None
+    for turn, (speaker, ask) in enumerate(DIALOGUE_TURNS, 1):
+        if turn > 1:
+            cancel.check()
+            stop = dialogue_stop(turn, responses)
+            if stop:
+                break
+        name, system_prompt = agents[speaker]
+        response = agent_response(name, system_prompt, turn_prompt(ask, topic, agents[3 - speaker][0], responses), context,
+                                  f"{node}:{turn}" if node else None)
+        responses.append(response)
+        on_turn(turn, response)
+
+    return finish_dialogue(responses, agents, on_turn, stop)
+
+async def two_agent_dialogue_async(agent1_name: str, agent1_prompt: str, agent2_name: str, agent2_prompt: str, topic: str, context: str = "", on_turn: Optional[Callable[[int, str], None]] = None, node: str = "") -> tuple:
+    """two_agent_dialogue() for the async server; cancelling the job's task stops it mid-turn"""
+    on_turn = on_turn or (lambda turn, text: None)
+    agents = {1: (agent1_name, agent1_prompt), 2: (agent2_name, agent2_prompt)}
+
+    responses, stop = [], None
+    for turn, (speaker, ask) in enumerate(DIALOGUE_TURNS, 1):
+        if turn > 1:
+            stop = dialogue_stop(turn, responses)
+            if stop:
+                break
+        name, system_prompt = agents[speaker]
+        response = await agent_response_async(name, system_prompt, turn_prompt(ask, topic, agents[3 - speaker][0], responses), context,
+                                              f"{node}:{turn}" if node else None)
+        responses.append(response)
+        on_turn(turn, response)
+
+    return finish_dialogue(responses, agents, on_turn, stop)
+
+def pair_culture_profile(agent_name: str, sender_info: str, recipient_info: str) -> str:
+    """Culture analysis for a sender/recipient pair, reused across emails"""
+    try:
+        profile = culture_profile_sync(sender_info, recipient_info, "anthropic", "claude-3-5-haiku-20241022")
+    except ProviderUnavailable as e:
+        profile = f"[{agent_name} is unavailable right now: {e}]"
+    add_message(agent_name, "message", profile)
+    return profile
+
+async def pair_culture_profile_async(agent_name: str, sender_info: str, recipient_info: str) -> str:
+    """pair_culture_profile() for the async server"""
+    try:
+        profile = await culture_profile(sender_info, recipient_info, "anthropic", "claude-3-5-haiku-20241022")
+    except ProviderUnavailable as e:
+        profile = f"[{agent_name} is unavailable right now: {e}]"
+    add_message(agent_name, "message", profile)
+    return profile
+
+def skip_for_budget(agents: str, outputs: Dict[str, int], optional: bool, on_turn: Callable[[int, str], None]) -> bool:
+    """Publish placeholders instead of running a stage the time budget no longer allows"""
+    step = ladder_step()
+    if not (step.stop or (optional and step.skip_optional)):
+        return False
+    add_message("System", "status", f"⏭️ Skipping {agents} ({step.name})")
+    for turn in sorted(set(outputs.values())):
+        on_turn(turn, f"[{agents} skipped: {step.name}]")
+    return True
+
+def dialogue_node(name: str, layer: str, status: str, agent1: Tuple[str, str], agent2: Tuple[str, str],
+                  topic: Callable[[Dict], str], context: Callable[[Dict], str],
+                  needs: List[str], outputs: Dict[str, int], optional: bool = False) -> DialogueNode:
+    """Declare a two-agent dialogue as a pipeline node (optional ones are the first dropped when time runs low)"""
+    agents = f"{agent1[0]} and {agent2[0]}"
+
+    def run(values: Dict[str, str], on_turn: Callable[[int, str], None]):
+        if skip_for_budget(agents, outputs, optional, on_turn):
+            return
+        add_message("System", "status", status)
+        two_agent_dialogue(agent1[0], agent1[1], agent2[0], agent2[1], topic(values), context(values), on_turn=on_turn, node=name)
+
+    async def arun(values: Dict[str, str], on_turn: Callable[[int, str], None]):
+        if skip_for_budget(agents, outputs, optional, on_turn):
+            return
+        add_message("System", "status", status)
+        # A summary digest is a blocking call, so make it off the event loop
+        text = await asyncio.to_thread(context, values) if context_compactor.calls_llm else context(values)
+        await two_agent_dialogue_async(agent1[0], agent1[1], agent2[0], agent2[1], topic(values), text, on_turn=on_turn, node=name)
+    return DialogueNode(name, run, needs=needs, outputs=outputs, layer=layer, arun=arun)
+
+def culture_node(name: str, layer: str, agent_name: str) -> DialogueNode:
+    """Declare the sender/recipient culture lookup as a single-turn pipeline node"""
+    outputs = {"culture_analysis": 1}
+
+    def run(values: Dict[str, str], on_turn: Callable[[int, str], None]):
+        if not skip_for_budget(agent_name, outputs, False, on_turn):
+            on_turn(1, pair_culture_profile(agent_name, values["sender_info"], values["recipient_info"]))
+
+    async def arun(values: Dict[str, str], on_turn: Callable[[int, str], None]):
+        if not skip_for_budget(agent_name, outputs, False, on_turn):
+            on_turn(1, await pair_culture_profile_async(agent_name, values["sender_info"], values["recipient_info"]))
+    return DialogueNode(name, run, outputs=outputs, layer=layer, arun=arun)
+
+LAYER1_KEYS = ["context_analysis", "relationship_analysis", "culture_analysis"]
+LAYER2_KEYS = LAYER1_KEYS + ["recipient_response", "sender_advocacy", "devils_advocacy", "mediation"]
+LAYER3_KEYS = LAYER2_KEYS + ["tone_validation", "goal_check", "risk_analysis"]
+
+def summarize_context(text: str, max_tokens: int) -> str:
+    """Digest a layer context with one call (CONTEXT_DIGEST=summary)"""
+    return complete_sync("anthropic", "claude-3-5-haiku-20241022", SUMMARY_PROMPT, text, max_tokens=max_tokens)
+
+# Layer contexts over CONTEXT_TOKEN_BUDGET are replaced by one cached digest shared by every downstream agent
+context_compactor = ContextCompactor(
+    CONTEXT_TOKEN_BUDGET, summarize=summarize_context if CONTEXT_DIGEST == "summary" else None
+)
 
-    # Round 1: Agent 1 speaks about the email
-    response1 = agent_response(agent1_name, agent1_prompt, topic, context)
-    time.sleep(0.3)
+def layer1_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Context", v['context_analysis']), ("Relationship", v['relationship_analysis']), ("Culture", v['culture_analysis'])]
+
+def layer2_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Recipient", v['recipient_response']), ("Advocacy", v['sender_advocacy']),
+            ("Challenges", v['devils_advocacy']), ("Mediation", v['mediation'])]
+
+def layer3_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Tone", v['tone_validation']), ("Goal Check", v['goal_check']), ("Risks", v['risk_analysis'])]
+
+def layer1_context(v: Dict) -> str:
+    return context_compactor.compact([layer1_sections(v)])
+
+def layer2_context(v: Dict) -> str:
+    return context_compactor.compact([layer1_sections(v), layer2_sections(v)])
+
+def layer3_context(v: Dict) -> str:
+    return context_compactor.compact([layer1_sections(v), layer2_sections(v), layer3_sections(v)])
+
+# Each node lists the values it needs and which dialogue turn produces each of its outputs
+# (turn 2 is agent 2's first reply, turn 4 is agent 2's final word).
+PIPELINE = DialogueGraph([
+    # LAYER 1: CONTEXT EXTRACTION (3 agents)
+    dialogue_node(
+        "Dialogue 1", "🔍 CONTEXT EXTRACTION LAYER",
+        "Context Analyzer discussing with Relationship Mapper...",
+        ("Context Analyzer", "You are a context extraction expert. Analyze the goal, tone, and urgency of emails. Engage in dialogue with the Relationship Mapper."),
+        ("Relationship Mapper", "You are a relationship dynamics expert. Infer power structures, rapport, and communication history. Engage in dialogue with the Context Analyzer."),
+        topic=lambda v: f"Discuss this email:\n\nFrom: {v['sender_info']}\nTo: {v['recipient_info']}\n\nEmail:\n{v['email_text']}",
+        context=lambda v: "",
+        needs=[],
+        outputs={"relationship_analysis": 2, "context_analysis": 4},
+    ),
+    culture_node("Culture Profile", "🔍 CONTEXT EXTRACTION LAYER", "Culture Detector"),
+    # LAYER 2: SIMULATION LAYER (4 agents)
+    dialogue_node(
+        "Dialogue 3", "🎭 SIMULATION LAYER",
+        "Recipient Persona discussing with Sender Advocate...",
+        ("Recipient Persona", "You are role-playing as the email recipient. React authentically and discuss your perspective."),
+        ("Sender Advocate", "You represent the sender's goals and interests. Advocate for what they're trying to achieve."),
+        topic=lambda v: f"Discuss this email:\n{v['email_text']}",
+        context=layer1_context,
+        needs=LAYER1_KEYS,
+        outputs={"recipient_response": 3, "sender_advocacy": 4},
+    ),
+    dialogue_node(
+        "Dialogue 4", "🎭 SIMULATION LAYER",
+        "Devil's Advocate discussing with Mediator...",
+        ("Devil's Advocate", "You challenge assumptions and identify potential blind spots. Be skeptical and probe weaknesses."),
+        ("Mediator", "You facilitate productive dialogue between perspectives. Find common ground and identify actionable insights."),
+        topic=lambda v: f"Discuss what could go wrong:\n\nEmail: {v['email_text']}\nRecipient says: {v['recipient_response']}\nSender position: {v['sender_advocacy']}",
+        context=layer1_context,
+        needs=LAYER1_KEYS + ["recipient_response", "sender_advocacy"],
+        outputs={"devils_advocacy": 3, "mediation": 4},
+        optional=True,
+    ),
+    # LAYER 3: EVALUATION LAYER (3 agents)
+    dialogue_node(
+        "Dialogue 5", "⚖️ EVALUATION LAYER",
+        "Tone Validator discussing with Goal Alignment...",
+        ("Tone Validator", "You validate emotional tone and appropriateness. Check if the tone matches intent and context."),
+        ("Goal Alignment", "You verify if the email achieves its stated or implied objectives. Check for goal-message alignment."),
+        topic=lambda v: f"Evaluate this email:\n{v['email_text']}",
+        context=layer2_context,
+        needs=LAYER2_KEYS,
+        outputs={"tone_validation": 3, "goal_check": 4},
+    ),
+    dialogue_node(
+        "Dialogue 6", "⚖️ EVALUATION LAYER",
+        "Goal Alignment discussing with Risk Assessment...",
+        ("Goal Alignment", "You verify if objectives are met. Discuss potential alignment issues."),
+        ("Risk Assessment", "You identify risks, misunderstandings, or negative consequences. Be specific about what could go wrong."),
+        topic=lambda v: f"Discuss risks and goal achievement:\n\nEmail: {v['email_text']}\nTone assessment: {v['tone_validation']}",
+        context=layer2_context,
+        needs=LAYER2_KEYS + ["tone_validation"],
+        outputs={"risk_analysis": 4},
+        optional=True,
+    ),
+    # LAYER 4: OUTPUT LAYER (2 agents)
+    dialogue_node(
+        "Dialogue 7", "📝 OUTPUT LAYER",
+        "Feedback Synthesizer discussing with Email Rewriter...",
+        ("Feedback Synthesizer", "You synthesize all analysis into clear, actionable feedback. Provide specific improvements."),
+        ("Email Rewriter", "You rewrite emails to be more effective. Create an improved version incorporating all feedback."),
+        topic=lambda v: f"Collaborate on improving this email:\n\nOriginal:\n{v['email_text']}",
+        context=layer3_context,
+        needs=LAYER3_KEYS,
+        outputs={"feedback_synthesis": 3, "rewritten_email": 4},
+    ),
+], inputs=["email_text", "sender_info", "recipient_info"])
+
+def pipeline_hooks(job: Job) -> Dict[str, Callable]:
+    """on_start/on_value callbacks for a pipeline run: announce each layer once, store each output"""
+    announced_layers = set()
+
+    def announce_layer(node: DialogueNode):
+        if node.layer not in announced_layers:
+            announced_layers.add(node.layer)
+            add_message("System", "status", node.layer)
+
+    return {"on_start": announce_layer, "on_value": lambda key, text: results.save_output(job.id, key, text)}
+
+def report_run(run, budget: TimeBudget):
+    """Close a pipeline run's timeline: critical path, then complete (or partial, if the budget ran out)"""
+    add_message("System", "status", f"⏱️ Critical path: {run.describe_critical_path()}")
+    if budget.exhausted:
+        add_message("System", "complete", f"⚠️ Partial analysis returned: {budget.describe()}")
+    else:
+        add_message("System", "complete", "✅ 12-Agent Analysis Complete!")
 
-    # Round 1: Agent 2 responds - keeping email in context
-    response2 = agent_response(
-        agent2_name,
-        agent2_prompt,
-        f"{topic}\n\n{agent1_name} said: {response1}\n\nRespond to their point while analyzing the email:",
-        context
-    )
-    time.sleep(0.3)
-
-    # Round 2: Agent 1 responds back - keeping email in context
-    response3 = agent_response(
-        agent1_name,
-        agent1_prompt,
-        f"{topic}\n\n{agent2_name} said: {response2}\n\nRespond to their point while continuing to analyze the email:",
-        context
+def run_analysis(email_text: str, sender_info: str, recipient_info: str, budget_seconds: Optional[float] = None):
+    """Run the 12-agent analysis pipeline, posting to the current job's timeline and stored outputs
+
+    budget_seconds, counted from the job's submission, degrades the run as it runs low (see src/utils/budget.py).
+    """
+    job = current_job.get()
+    budget = TimeBudget(budget_seconds, started=job.submitted)
+    current_budget.set(budget)
+    run = PIPELINE.run(
+        {"email_text": email_text, "sender_info": sender_info, "recipient_info": recipient_info},
+        cancel=job.cancel_token,
+        **pipeline_hooks(job),
     )
-    time.sleep(0.3)
-
-    # Round 2: Agent 2 final response - keeping email in context
-    response4 = agent_response(
-        agent2_name,
-        agent2_prompt,
-        f"{topic}\n\n{agent1_name} said: {response3}\n\nProvide your final analysis of the email, building on this dialogue:",
-        context
+    report_run(run, budget)
+
+async def run_analysis_async(email_text: str, sender_info: str, recipient_info: str, budget_seconds: Optional[float] = None):
+    """run_analysis() as event-loop tasks instead of threads"""
+    job = current_job.get()
+    budget = TimeBudget(budget_seconds, started=job.submitted)
+    current_budget.set(budget)
+    run = await PIPELINE.run_async(
+        {"email_text": email_text, "sender_info": sender_info, "recipient_info": recipient_info},
+        **pipeline_hooks(job),
     )
-    time.sleep(0.3)
+    report_run(run, budget)
 
-    return response1, response2, response3, response4
-
-def run_analysis(email_text: str, sender_info: str, recipient_info: str):
-    """Run the 12-agent analysis pipeline"""
-    global analysis_in_progress
-    analysis_in_progress = True
+def run_job(job: Job):
+    """Worker-thread entry point: run one queued analysis against its own timeline"""
+    current_job.set(job)
+    try:
+        job.cancel_token.check()
+        run_analysis(**job.params)
+    except Cancelled as e:
+        add_message("System", "status", f"🛑 Analysis cancelled: {e}")
+        raise
+    except Exception as e:
+        add_message("System", "error", f"❌ Analysis failed: {e}")
+        raise
 
+async def run_job_async(job: Job):
+    """Worker-task entry point for the async server (see app_async.py)"""
+    current_job.set(job)
     try:
-        messages_store.clear()
-
-        # ========================================
-        # LAYER 1: CONTEXT EXTRACTION (3 agents)
-        # ========================================
-        add_message("System", "status", "🔍 CONTEXT EXTRACTION LAYER")
-
-        # Dialogue 1: Context Analyzer <-> Relationship Mapper
-        add_message("System", "status", "Context Analyzer discussing with Relationship Mapper...")
-        ctx1, ctx2, ctx3, ctx4 = two_agent_dialogue(
-            "Context Analyzer",
-            "You are a context extraction expert. Analyze the goal, tone, and urgency of emails. Engage in dialogue with the Relationship Mapper.",
-            "Relationship Mapper",
-            "You are a relationship dynamics expert. Infer power structures, rapport, and communication history. Engage in dialogue with the Context Analyzer.",
-            f"Discuss this email:\n\nFrom: {sender_info}\nTo: {recipient_info}\n\nEmail:\n{email_text}"
-        )
-        context_analysis = ctx4
-        relationship_analysis = ctx2
-        time.sleep(0.5)
-
-        # Dialogue 2: Relationship Mapper <-> Culture Detector
-        add_message("System", "status", "Relationship Mapper discussing with Culture Detector...")
-        rel1, cul1, rel2, cul2 = two_agent_dialogue(
-            "Relationship Mapper",
-            "You are a relationship dynamics expert. Discuss how relationship dynamics affect communication.",
-            "Culture Detector",
-            "You are a cultural communication expert. Identify cultural, regional, or professional norms that matter.",
-            f"Building on previous context, discuss cultural aspects:\n\nEmail:\n{email_text}\n\nFrom: {sender_info}\nTo: {recipient_info}",
-            f"Previous context: {context_analysis}"
-        )
-        culture_analysis = cul2
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 2: SIMULATION LAYER (4 agents)
-        # ========================================
-        add_message("System", "status", "🎭 SIMULATION LAYER")
-
-        layer1_context = f"Context: {context_analysis}\nRelationship: {relationship_analysis}\nCulture: {culture_analysis}"
-
-        # Dialogue 3: Recipient Persona <-> Sender Advocate
-        add_message("System", "status", "Recipient Persona discussing with Sender Advocate...")
-        rec1, sen1, rec2, sen2 = two_agent_dialogue(
-            "Recipient Persona",
-            "You are role-playing as the email recipient. React authentically and discuss your perspective.",
-            "Sender Advocate",
-            "You represent the sender's goals and interests. Advocate for what they're trying to achieve.",
-            f"Discuss this email:\n{email_text}",
-            layer1_context
-        )
-        recipient_response = rec2
-        sender_advocacy = sen2
-        time.sleep(0.5)
-
-        # Dialogue 4: Devil's Advocate <-> Mediator
-        add_message("System", "status", "Devil's Advocate discussing with Mediator...")
-        dev1, med1, dev2, med2 = two_agent_dialogue(
-            "Devil's Advocate",
-            "You challenge assumptions and identify potential blind spots. Be skeptical and probe weaknesses.",
-            "Mediator",
-            "You facilitate productive dialogue between perspectives. Find common ground and identify actionable insights.",
-            f"Discuss what could go wrong:\n\nEmail: {email_text}\nRecipient says: {recipient_response}\nSender position: {sender_advocacy}",
-            layer1_context
-        )
-        devils_advocacy = dev2
-        mediation = med2
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 3: EVALUATION LAYER (3 agents)
-        # ========================================
-        add_message("System", "status", "⚖️ EVALUATION LAYER")
-
-        layer2_context = f"{layer1_context}\n\nRecipient: {recipient_response}\nAdvocacy: {sender_advocacy}\nChallenges: {devils_advocacy}\nMediation: {mediation}"
-
-        # Dialogue 5: Tone Validator <-> Goal Alignment
-        add_message("System", "status", "Tone Validator discussing with Goal Alignment...")
-        tone1, goal1, tone2, goal2 = two_agent_dialogue(
-            "Tone Validator",
-            "You validate emotional tone and appropriateness. Check if the tone matches intent and context.",
-            "Goal Alignment",
-            "You verify if the email achieves its stated or implied objectives. Check for goal-message alignment.",
-            f"Evaluate this email:\n{email_text}",
-            layer2_context
-        )
-        tone_validation = tone2
-        goal_check = goal2
-        time.sleep(0.5)
-
-        # Dialogue 6: Goal Alignment <-> Risk Assessment
-        add_message("System", "status", "Goal Alignment discussing with Risk Assessment...")
-        goal3, risk1, goal4, risk2 = two_agent_dialogue(
-            "Goal Alignment",
-            "You verify if objectives are met. Discuss potential alignment issues.",
-            "Risk Assessment",
-            "You identify risks, misunderstandings, or negative consequences. Be specific about what could go wrong.",
-            f"Discuss risks and goal achievement:\n\nEmail: {email_text}\nTone assessment: {tone_validation}",
-            layer2_context
-        )
-        risk_analysis = risk2
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 4: OUTPUT LAYER (2 agents)
-        # ========================================
-        add_message("System", "status", "📝 OUTPUT LAYER")
-
-        layer3_context = f"{layer2_context}\n\nTone: {tone_validation}\nGoal Check: {goal_check}\nRisks: {risk_analysis}"
-
-        # Dialogue 7: Feedback Synthesizer <-> Email Rewriter
-        add_message("System", "status", "Feedback Synthesizer discussing with Email Rewriter...")
-        feed1, rew1, feed2, rew2 = two_agent_dialogue(
-            "Feedback Synthesizer",
-            "You synthesize all analysis into clear, actionable feedback. Provide specific improvements.",
-            "Email Rewriter",
-            "You rewrite emails to be more effective. Create an improved version incorporating all feedback.",
-            f"Collaborate on improving this email:\n\nOriginal:\n{email_text}",
-            layer3_context
+        await run_analysis_async(**job.params)
+    except asyncio.CancelledError:
+        if job.cancel_token.cancelled:
+            add_message("System", "status", f"🛑 Analysis cancelled: {job.cancel_token.reason}")
+        raise
+    except Exception as e:
+        add_message("System", "error", f"❌ Analysis failed: {e}")
+        raise
+
+def store_job(job: Job):
+    """Persist a job's status (and, when first queued, what it analyses)"""
+    fields = {k: v for k, v in job.to_dict().items() if k in JOB_COLUMNS}
+    if job.status == QUEUED:
+        fields.update(
+            source="app",
+            sender=job.params["sender_info"],
+            recipient=job.params["recipient_info"],
+            email_text=job.params["email_text"],
         )
-        feedback_synthesis = feed2
-        rewritten_email = rew2
-        time.sleep(0.5)
+    results.save_job(job.id, **fields)
 
-        add_message("System", "complete", "✅ 12-Agent Analysis Complete!")
+# Bounded pool of analysis workers shared fairly across tenants; submissions beyond
+# JOB_QUEUE_SIZE waiting jobs get a 429
+jobs = JobQueue(
+    run_job, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, on_change=store_job,
+    tenant_weights=JOB_TENANT_WEIGHTS, tenant_cap=JOB_TENANT_MAX_RUNNING, interactive_reserved=JOB_INTERACTIVE_RESERVED,
+)
 
-    finally:
-        analysis_in_progress = False
+def requested_job() -> Optional[Job]:
+    """The job named by the ?job= parameter (none if it is missing: a timeline is only shown to whoever submitted it)"""
+    job_id = request.args.get('job')
+    return jobs.get(job_id) if job_id else None
+
+def stored_feed(job_id: str) -> Optional[MessageFeed]:
+    """Replay a job from an earlier process out of the result store, as a finished timeline"""
+    if results.get_job(job_id) is None:
+        return None
+    feed = MessageFeed()
+    feed.start()
+    for message in results.get_messages(job_id):
+        feed.append(message)
+    feed.finish()
+    return feed
+
+def long_poll_wait() -> float:
+    """Seconds a message request may be held open (?wait=<seconds>, capped)"""
+    return max(0.0, min(request.args.get('wait', 0.0, type=float), LONG_POLL_MAX_WAIT))
 
 @app.route('/')
 def home():
@@ -229,29 +510,128 @@ def home():
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_email():
-    """Submit email for analysis"""
+    """
+    Submit email for analysis. The tenant comes from the X-Tenant header or "tenant"; "priority" is
+    interactive or bulk; "budget_seconds" (default by priority) is the latency budget the run degrades to meet.
+    """
     try:
         data = request.get_json()
         email_text = data.get('email_text', '')
         sender_info = data.get('sender_info', 'Unknown')
         recipient_info = data.get('recipient_info', 'Unknown')
-
-        thread = threading.Thread(
-            target=run_analysis,
-            args=(email_text, sender_info, recipient_info)
+        priority = data.get('priority', 'interactive')
+
+        job = jobs.submit(
+            session=data.get('session_id'),
+            tenant=request.headers.get('X-Tenant') or data.get('tenant') or request.remote_addr or DEFAULT_TENANT,
+            priority=priority,
+            budget_seconds=float(data.get('budget_seconds', JOB_BUDGET_SECONDS.get(priority, 0)) or 0),
+            email_text=email_text,
+            sender_info=sender_info,
+            recipient_info=recipient_info,
         )
-        thread.start()
 
-        return jsonify({"status": "submitted"})
+        return jsonify({"status": "submitted", "job_id": job.id, "position": jobs.position(job)})
+    except QueueFull as e:
+        return (
+            jsonify({"status": "busy", "message": str(e), "retry_after": e.retry_after}),
+            429,
+            {"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id: str):
+    """Get a job's status and queue position (jobs of earlier processes come from the result store)"""
+    job = jobs.get(job_id)
+    if job is not None:
+        return jsonify({**job.to_dict(), "position": jobs.position(job)})
+    stored = results.get_job(job_id)
+    if stored is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    if stored["status"] in (QUEUED, RUNNING):
+        stored["status"] = "interrupted"  # the process running it stopped
+    fields = ("status", "error", "submitted", "started", "finished")
+    return jsonify({"job_id": job_id, **{field: stored[field] for field in fields}, "position": 0})
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    if jobs.cancel(job_id):
+        return jsonify({"status": "cancelling", "job_id": job_id})
+    if jobs.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify({"status": "error", "message": "Job already finished"}), 409
+
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
-    """Get all messages"""
+    """
+    Get a job's messages (?job=<id>; an empty timeline without one), only those after ?since=<cursor> if given.
+    With ?wait=<seconds> the request is held until something new arrives; an unchanged
+    response is answered with 304 when the client sends its ETag in If-None-Match.
+    """
+    job = requested_job()
+    job_id = job.id if job else request.args.get('job')
+    feed = job.feed if job else (stored_feed(job_id) if job_id else None)
+    if feed is None:
+        if job_id:
+            return jsonify({"status": "error", "message": "Unknown job"}), 404
+        return jsonify({"messages": [], "cursor": None, "reset": False, "analysis_in_progress": False})
+    page = feed.since(request.args.get('since'), wait=long_poll_wait())
+    response = jsonify({"job_id": job_id, **page})
+    response.set_etag(f"{job_id}-{page['cursor']}")
+    return response.make_conditional(request)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_messages():
+    """Push each message of a job (?job=<id>) as it is added (Server-Sent Events)"""
+    job_id = request.args.get('job')
+    if not job_id:
+        return jsonify({"status": "error", "message": "Missing ?job=<id>"}), 400
+    job = requested_job()
+    feed = job.feed if job else (stored_feed(job_id) if job_id else None)
+    if feed is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return Response(
+        sse_stream(feed, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/results', methods=['GET'])
+def find_results():
+    """Search stored analyses by ?sender, ?recipient, ?min_score/?max_score, ?since/?until (epoch seconds) and ?limit"""
+    return jsonify({"results": results.find_jobs(
+        sender=request.args.get('sender'),
+        recipient=request.args.get('recipient'),
+        min_score=request.args.get('min_score', type=float),
+        max_score=request.args.get('max_score', type=float),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        limit=request.args.get('limit', 50, type=int),
+    )})
+
+@app.route('/api/results/<job_id>', methods=['GET'])
+def get_result(job_id: str):
+    """Get a stored analysis with its stage outputs and transcript"""
+    result = results.get_result(job_id)
+    if result is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(result)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get LLM gateway, culture profile cache, dialogue, context compaction, job queue and result store counters"""
     return jsonify({
-        "messages": messages_store,
-        "analysis_in_progress": analysis_in_progress
+        **llm_stats(),
+        "culture_profiles": culture_profiles.stats(),
+        "dialogues": dict(dialogue_counts),
+        "context_compaction": context_compactor.stats(),
+        "jobs": jobs.stats(),
+        "results": results.stats(),
     })
 
 if __name__ == '__main__':
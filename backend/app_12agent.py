@@ -2,224 +2,512 @@
 12-Agent Email Analysis System
 4 Layers with 2 rounds of dialogue between each agent
 """
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
-from openai import OpenAI
+import asyncio
+import contextvars
+import functools
 import time
-import threading
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Callable, List, Dict, Optional, Tuple
+import sys
 import os
 
-# Initialize OpenAI
-client = OpenAI(
-    base_url='https://api.asi1.ai/v1',
-    api_key='sk_a77e3af6ceb240939b2c03ce2d30a9f750fb81f4266d44d192d3a4af763f7b8c',
+# Add parent directory to path so we can import from src
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.llm import complete, complete_sync, llm_stats, ProviderUnavailable
+from src.utils.cancel import CancelToken, Cancelled
+from src.utils.budget import LadderStep, TimeBudget
+from src.utils.pair_profiles import culture_profile, culture_profile_sync, culture_profiles
+from src.utils.events import sse_stream
+from src.utils.jobs import DEFAULT_TENANT, Job, JobQueue, QueueFull, QUEUED
+from src.utils.store import JOB_COLUMNS, results
+from src.utils.compaction import SUMMARY_PROMPT, ContextCompactor
+from src.utils.config import (
+    JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, JOB_TENANT_WEIGHTS, JOB_TENANT_MAX_RUNNING, JOB_INTERACTIVE_RESERVED,
+    JOB_BUDGET_SECONDS, LONG_POLL_MAX_WAIT, CONTEXT_TOKEN_BUDGET, CONTEXT_DIGEST,
 )
 
 # Initialize Flask
 app = Flask(__name__, static_folder='.')
 CORS(app)
 
-# In-memory storage for messages
-messages_store: List[Dict] = []
-analysis_in_progress = False
+# Job being run on this thread or task, whose timeline and stored rows its messages go to (set when the run
+# starts; its wave tasks run in a copy of its context, so a superseded run never writes to a newer one)
+current_job: ContextVar[Job] = ContextVar("current_job")
+
+def summarize_context(text: str, max_tokens: int) -> str:
+    """Digest a layer context with one call (CONTEXT_DIGEST=summary)"""
+    return complete_sync("asi1", "asi1-mini", SUMMARY_PROMPT, text, max_tokens=max_tokens)
+
+# Layer contexts over CONTEXT_TOKEN_BUDGET are replaced by one cached digest shared by every downstream agent
+context_compactor = ContextCompactor(
+    CONTEXT_TOKEN_BUDGET, summarize=summarize_context if CONTEXT_DIGEST == "summary" else None
+)
+
+# Worker threads for running the agents of each running job's wave concurrently (widest wave has 3 agents)
+wave_pool = ThreadPoolExecutor(max_workers=3 * JOB_WORKERS, thread_name_prefix="agent-wave")
 
 def add_message(agent: str, msg_type: str, content: str):
-    """Add a message to the store"""
+    """Add a message to the current job's timeline and stored transcript
+
+    Once the job is cancelled only System notices are kept: output of agents still finishing is dropped.
+    """
+    job = current_job.get()
+    if job.cancel_token.cancelled and agent != "System":
+        return None
     message = {
         "timestamp": time.time(),
         "agent": agent,
         "type": msg_type,
         "content": content
     }
-    messages_store.append(message)
+    job.feed.append(message)
+    results.save_message(job.id, message)
     print(f"[{agent}] [{msg_type}] {content[:100]}")
     return message
 
-def agent_dialogue(agent_name: str, system_prompt: str, user_prompt: str, context: str = "") -> str:
-    """Have two rounds of internal dialogue for an agent"""
-    # First pass
-    response1 = client.chat.completions.create(
-        model="asi1-mini",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"{context}\n\n{user_prompt}"}
-        ],
-        max_tokens=250,
-    )
-    first_thought = str(response1.choices[0].message.content)
-    add_message(agent_name, "thinking", first_thought)
-    time.sleep(0.3)
-
-    # Second pass - refine
-    response2 = client.chat.completions.create(
-        model="asi1-mini",
-        messages=[
-            {"role": "system", "content": f"{system_prompt}\n\nNow refine your initial analysis and provide deeper insight."},
-            {"role": "user", "content": f"Initial thought: {first_thought}\n\nProvide a refined, more nuanced perspective."}
-        ],
-        max_tokens=250,
-    )
-    refined_thought = str(response2.choices[0].message.content)
+def ladder_step(budget: TimeBudget) -> LadderStep:
+    """Current degradation step of a run's time budget, announced on the timeline when it is reached"""
+    return budget.step(on_change=lambda step: add_message("System", "status", f"⏱️ Time budget: {budget.describe()}"))
+
+def agent_dialogue(agent_name: str, system_prompt: str, user_prompt: str, context: str = "",
+                   cancel: Optional[CancelToken] = None, budget: Optional[TimeBudget] = None) -> str:
+    """Have two rounds of internal dialogue for an agent, streaming each pass to the timeline
+
+    Raises Cancelled before or during either pass once cancel is cancelled. As the time budget
+    runs low, the passes get shorter and the refining pass is dropped.
+    """
+    budget = budget or TimeBudget(None)
+    try:
+        # First pass
+        first_thought = complete_sync(
+            "asi1",
+            "asi1-mini",
+            system_prompt,
+            f"{context}\n\n{user_prompt}",
+            max_tokens=ladder_step(budget).max_tokens(250),
+            on_partial=lambda text: current_job.get().feed.draft(agent_name, text),
+            cancel=cancel,
+            total_timeout=budget.call_timeout(),
+        )
+        add_message(agent_name, "thinking", first_thought)
+
+        # Second pass - refine (unless the budget only allows one)
+        step = ladder_step(budget)
+        if step.rounds < 2:
+            refined_thought = first_thought
+        else:
+            refined_thought = complete_sync(
+                "asi1",
+                "asi1-mini",
+                f"{system_prompt}\n\nNow refine your initial analysis and provide deeper insight.",
+                f"Initial thought: {first_thought}\n\nProvide a refined, more nuanced perspective.",
+                max_tokens=step.max_tokens(250),
+                on_partial=lambda text: current_job.get().feed.draft(agent_name, text),
+                cancel=cancel,
+                total_timeout=budget.call_timeout(),
+            )
+    except ProviderUnavailable as e:
+        # Circuit is open: keep the pipeline moving with a placeholder instead of waiting
+        refined_thought = f"[{agent_name} is unavailable right now: {e}]"
+    except TimeoutError:
+        if budget.seconds is None:
+            raise
+        refined_thought = f"[{agent_name} ran out of time]"
     add_message(agent_name, "result", refined_thought)
-    time.sleep(0.3)
 
     return refined_thought
 
-def run_analysis(email_text: str, sender_info: str, recipient_info: str):
-    """Run the 12-agent analysis pipeline"""
-    global analysis_in_progress
-    analysis_in_progress = True
-
+async def agent_dialogue_async(agent_name: str, system_prompt: str, user_prompt: str, context: str = "",
+                               budget: Optional[TimeBudget] = None) -> str:
+    """agent_dialogue() for the async server: awaits the gateway (cancelling the job's task aborts the request)"""
+    budget = budget or TimeBudget(None)
     try:
-        messages_store.clear()
-
-        # ========================================
-        # LAYER 1: CONTEXT EXTRACTION (3 agents)
-        # ========================================
-        add_message("System", "status", "🔍 CONTEXT EXTRACTION LAYER")
-
-        # Agent 1: Context Analyzer
-        add_message("Context Analyzer", "processing", "Extracting goal, tone, urgency...")
-        context_analysis = agent_dialogue(
-            "Context Analyzer",
-            "You are a context extraction expert. Analyze the goal, tone, and urgency of emails. Be concise.",
-            f"Analyze this email:\n\nFrom: {sender_info}\nTo: {recipient_info}\n\nEmail:\n{email_text}",
-        )
-        time.sleep(0.5)
-
-        # Agent 2: Relationship Mapper
-        add_message("Relationship Mapper", "processing", "Inferring sender-recipient dynamics...")
-        relationship_analysis = agent_dialogue(
-            "Relationship Mapper",
-            "You are a relationship dynamics expert. Infer power structures, rapport, and communication history.",
-            f"Analyze the relationship:\n\nFrom: {sender_info}\nTo: {recipient_info}\n\nEmail:\n{email_text}",
-        )
-        time.sleep(0.5)
-
-        # Agent 3: Culture Detector
-        add_message("Culture Detector", "processing", "Identifying cultural considerations...")
-        culture_analysis = agent_dialogue(
-            "Culture Detector",
-            "You are a cultural communication expert. Identify cultural, regional, or professional norms that matter.",
-            f"Detect cultural considerations:\n\nFrom: {sender_info}\nTo: {recipient_info}\n\nEmail:\n{email_text}",
-        )
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 2: SIMULATION LAYER (4 agents)
-        # ========================================
-        add_message("System", "status", "🎭 SIMULATION LAYER")
-
-        layer1_context = f"Context: {context_analysis}\nRelationship: {relationship_analysis}\nCulture: {culture_analysis}"
-
-        # Agent 4: Recipient Persona
-        add_message("Recipient Persona", "processing", "Simulating recipient's perspective...")
-        recipient_response = agent_dialogue(
-            "Recipient Persona",
-            "You are role-playing as the email recipient. React authentically based on the analysis provided.",
-            f"How would you react to this email:\n{email_text}",
-            layer1_context
-        )
-        time.sleep(0.5)
-
-        # Agent 5: Sender Advocate
-        add_message("Sender Advocate", "processing", "Representing sender's goals...")
-        sender_advocacy = agent_dialogue(
-            "Sender Advocate",
-            "You represent the sender's goals and interests. Explain what they're trying to achieve and why it matters.",
-            f"Advocate for the sender's position in this email:\n{email_text}",
-            layer1_context
-        )
-        time.sleep(0.5)
-
-        # Agent 6: Devil's Advocate
-        add_message("Devil's Advocate", "processing", "Challenging assumptions...")
-        devils_advocacy = agent_dialogue(
-            "Devil's Advocate",
-            "You challenge assumptions and identify potential blind spots. Be skeptical and probe weaknesses.",
-            f"What could go wrong? What's being overlooked?\n\nEmail: {email_text}\nRecipient reaction: {recipient_response}\nSender position: {sender_advocacy}",
-            layer1_context
-        )
-        time.sleep(0.5)
-
-        # Agent 7: Mediator
-        add_message("Mediator", "processing", "Facilitating productive discussion...")
-        mediation = agent_dialogue(
-            "Mediator",
-            "You facilitate productive dialogue between perspectives. Find common ground and identify actionable insights.",
-            f"Mediate between:\n\nRecipient: {recipient_response}\nSender Advocate: {sender_advocacy}\nDevil's Advocate: {devils_advocacy}",
-            layer1_context
-        )
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 3: EVALUATION LAYER (3 agents)
-        # ========================================
-        add_message("System", "status", "⚖️ EVALUATION LAYER")
-
-        layer2_context = f"{layer1_context}\n\nRecipient: {recipient_response}\nAdvocacy: {sender_advocacy}\nChallenges: {devils_advocacy}\nMediation: {mediation}"
-
-        # Agent 8: Tone Validator
-        add_message("Tone Validator", "processing", "Checking emotional appropriateness...")
-        tone_validation = agent_dialogue(
-            "Tone Validator",
-            "You validate emotional tone and appropriateness. Check if the tone matches intent and context.",
-            f"Validate the tone of this email:\n{email_text}",
-            layer2_context
-        )
-        time.sleep(0.5)
-
-        # Agent 9: Goal Alignment
-        add_message("Goal Alignment", "processing", "Verifying objectives are met...")
-        goal_check = agent_dialogue(
-            "Goal Alignment",
-            "You verify if the email achieves its stated or implied objectives. Check for goal-message alignment.",
-            f"Does this email achieve its goals?\n{email_text}",
-            layer2_context
-        )
-        time.sleep(0.5)
-
-        # Agent 10: Risk Assessment
-        add_message("Risk Assessment", "processing", "Flagging potential issues...")
-        risk_analysis = agent_dialogue(
-            "Risk Assessment",
-            "You identify risks, misunderstandings, or negative consequences. Be specific about what could go wrong.",
-            f"What are the risks of sending this email:\n{email_text}",
-            layer2_context
-        )
-        time.sleep(0.5)
-
-        # ========================================
-        # LAYER 4: OUTPUT LAYER (2 agents)
-        # ========================================
-        add_message("System", "status", "📝 OUTPUT LAYER")
-
-        layer3_context = f"{layer2_context}\n\nTone: {tone_validation}\nGoal Check: {goal_check}\nRisks: {risk_analysis}"
-
-        # Agent 11: Feedback Synthesizer
-        add_message("Feedback Synthesizer", "processing", "Creating actionable advice...")
-        feedback_synthesis = agent_dialogue(
-            "Feedback Synthesizer",
-            "You synthesize all analysis into clear, actionable feedback. Provide specific improvements.",
-            f"Synthesize actionable feedback for this email:\n{email_text}",
-            layer3_context
-        )
-        time.sleep(0.5)
-
-        # Agent 12: Email Rewriter
-        add_message("Email Rewriter", "processing", "Generating improved versions...")
-        rewritten_email = agent_dialogue(
-            "Email Rewriter",
-            "You rewrite emails to be more effective. Create an improved version incorporating all feedback.",
-            f"Rewrite this email to address all concerns:\n\nOriginal:\n{email_text}\n\nFeedback: {feedback_synthesis}",
-            layer3_context
+        first_thought = await complete(
+            "asi1",
+            "asi1-mini",
+            system_prompt,
+            f"{context}\n\n{user_prompt}",
+            max_tokens=ladder_step(budget).max_tokens(250),
+            on_partial=lambda text: current_job.get().feed.draft(agent_name, text),
+            total_timeout=budget.call_timeout(),
         )
+        add_message(agent_name, "thinking", first_thought)
+
+        step = ladder_step(budget)
+        if step.rounds < 2:
+            refined_thought = first_thought
+        else:
+            refined_thought = await complete(
+                "asi1",
+                "asi1-mini",
+                f"{system_prompt}\n\nNow refine your initial analysis and provide deeper insight.",
+                f"Initial thought: {first_thought}\n\nProvide a refined, more nuanced perspective.",
+                max_tokens=step.max_tokens(250),
+                on_partial=lambda text: current_job.get().feed.draft(agent_name, text),
+                total_timeout=budget.call_timeout(),
+            )
+    except ProviderUnavailable as e:
+        refined_thought = f"[{agent_name} is unavailable right now: {e}]"
+    except TimeoutError:
+        if budget.seconds is None:
+            raise
+        refined_thought = f"[{agent_name} ran out of time]"
+    add_message(agent_name, "result", refined_thought)
+
+    return refined_thought
 
+def pair_culture_profile(agent_name: str, sender_info: str, recipient_info: str) -> str:
+    """Culture analysis for a sender/recipient pair, reused across emails"""
+    try:
+        profile = culture_profile_sync(sender_info, recipient_info)
+    except ProviderUnavailable as e:
+        profile = f"[{agent_name} is unavailable right now: {e}]"
+    add_message(agent_name, "result", profile)
+    return profile
+
+async def pair_culture_profile_async(agent_name: str, sender_info: str, recipient_info: str) -> str:
+    """pair_culture_profile() for the async server"""
+    try:
+        profile = await culture_profile(sender_info, recipient_info)
+    except ProviderUnavailable as e:
+        profile = f"[{agent_name} is unavailable right now: {e}]"
+    add_message(agent_name, "result", profile)
+    return profile
+
+def start_wave(agents: List[Dict], budget: TimeBudget) -> Tuple[Dict[str, str], List[Dict]]:
+    """Announce a wave: placeholder outputs for the agents the time budget no longer allows, and the agents to run
+
+    All agents are skipped once the budget has run out, "optional" ones once it runs low.
+    """
+    step = ladder_step(budget)
+    skipped = {
+        agent["key"]: f"[{agent['name']} skipped: {step.name}]"
+        for agent in agents
+        if step.stop or (agent.get("optional") and step.skip_optional)
+    }
+    for agent in agents:
+        if agent["key"] in skipped:
+            add_message("System", "status", f"⏭️ Skipping {agent['name']} ({step.name})")
+    agents = [agent for agent in agents if agent["key"] not in skipped]
+    for agent in agents:
+        add_message(agent["name"], "processing", agent["processing"])
+    return skipped, agents
+
+def run_wave(agents: List[Dict], cancel: Optional[CancelToken] = None,
+             budget: Optional[TimeBudget] = None) -> Dict[str, str]:
+    """Run one wave of independent agents concurrently and collect their outputs by key"""
+    if cancel:
+        cancel.check()
+    budget = budget or TimeBudget(None)
+    skipped, agents = start_wave(agents, budget)
+
+    def task(agent: Dict) -> str:
+        # A task still waiting for a worker when the run is cancelled never starts
+        if cancel:
+            cancel.check()
+        if "fetch" in agent:
+            return agent["fetch"]()
+        return agent_dialogue(agent["name"], agent["system"], agent["prompt"], agent.get("context", ""), cancel, budget)
+
+    # Each task runs in a copy of the run's context, so it writes to the run's own timeline and rows
+    futures = {agent["key"]: wave_pool.submit(contextvars.copy_context().run, task, agent) for agent in agents}
+    try:
+        outputs = {**skipped, **{key: future.result() for key, future in futures.items()}}
+    except BaseException:
+        # Don't leave the rest of the wave running behind the failed or cancelled run
+        for future in futures.values():
+            future.cancel()
+        wait(futures.values())
+        raise
+    if cancel:
+        cancel.check()  # a task that ignores the token (the culture lookup) may outlive the cancel
+    results.save_outputs(current_job.get().id, outputs)
+    return outputs
+
+async def run_wave_async(agents: List[Dict], budget: Optional[TimeBudget] = None) -> Dict[str, str]:
+    """run_wave() for the async server: the wave's requests are gathered on the event loop"""
+    budget = budget or TimeBudget(None)
+    skipped, agents = start_wave(agents, budget)
+
+    async def task(agent: Dict) -> str:
+        if "fetch" in agent:
+            return await agent["fetch"]()
+        return await agent_dialogue_async(agent["name"], agent["system"], agent["prompt"], agent.get("context", ""), budget)
+
+    # Tasks copy the run's context, so they write to the run's own timeline and rows
+    tasks = [asyncio.ensure_future(task(agent)) for agent in agents]
+    try:
+        texts = await asyncio.gather(*tasks)
+    except BaseException:
+        for pending in tasks:
+            pending.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    outputs = {**skipped, **{agent["key"]: text for agent, text in zip(agents, texts)}}
+    results.save_outputs(current_job.get().id, outputs)
+    return outputs
+
+def layer1_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Context", v["context_analysis"]), ("Relationship", v["relationship_analysis"]), ("Culture", v["culture_analysis"])]
+
+def layer2_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Recipient", v["recipient_response"]), ("Advocacy", v["sender_advocacy"]),
+            ("Challenges", v["devils_advocacy"]), ("Mediation", v["mediation"])]
+
+def layer3_sections(v: Dict) -> List[Tuple[str, str]]:
+    return [("Tone", v["tone_validation"]), ("Goal Check", v["goal_check"]), ("Risks", v["risk_analysis"])]
+
+def layer1_context(v: Dict) -> List[List[Tuple[str, str]]]:
+    return [layer1_sections(v)]
+
+def layer2_context(v: Dict) -> List[List[Tuple[str, str]]]:
+    return [layer1_sections(v), layer2_sections(v)]
+
+def layer3_context(v: Dict) -> List[List[Tuple[str, str]]]:
+    return [layer1_sections(v), layer2_sections(v), layer3_sections(v)]
+
+# The analysis as waves of independent agents, each wave reading the outputs of the ones before it.
+# "layer" is announced when a wave starts a layer, "context" picks the (compacted) layer context its
+# agents share, prompts are built from the values so far, and "pair" agents come from the pair cache.
+WAVES = [
+    # ========================================
+    # LAYER 1: CONTEXT EXTRACTION (3 agents)
+    # ========================================
+    # Wave 1: Context Analyzer, Relationship Mapper, Culture Detector
+    {"layer": "🔍 CONTEXT EXTRACTION LAYER", "agents": [
+        {
+            "key": "context_analysis",
+            "name": "Context Analyzer",
+            "processing": "Extracting goal, tone, urgency...",
+            "system": "You are a context extraction expert. Analyze the goal, tone, and urgency of emails. Be concise.",
+            "prompt": lambda v: f"Analyze this email:\n\nFrom: {v['sender_info']}\nTo: {v['recipient_info']}\n\nEmail:\n{v['email_text']}",
+        },
+        {
+            "key": "relationship_analysis",
+            "name": "Relationship Mapper",
+            "processing": "Inferring sender-recipient dynamics...",
+            "system": "You are a relationship dynamics expert. Infer power structures, rapport, and communication history.",
+            "prompt": lambda v: f"Analyze the relationship:\n\nFrom: {v['sender_info']}\nTo: {v['recipient_info']}\n\nEmail:\n{v['email_text']}",
+        },
+        {
+            "key": "culture_analysis",
+            "name": "Culture Detector",
+            "processing": "Identifying cultural considerations...",
+            # Depends only on the sender/recipient pair, so it comes from the shared pair cache
+            "pair": True,
+        },
+    ]},
+    # ========================================
+    # LAYER 2: SIMULATION LAYER (4 agents)
+    # ========================================
+    # Wave 2: Recipient Persona, Sender Advocate
+    {"layer": "🎭 SIMULATION LAYER", "context": layer1_context, "agents": [
+        {
+            "key": "recipient_response",
+            "name": "Recipient Persona",
+            "processing": "Simulating recipient's perspective...",
+            "system": "You are role-playing as the email recipient. React authentically based on the analysis provided.",
+            "prompt": lambda v: f"How would you react to this email:\n{v['email_text']}",
+        },
+        {
+            "key": "sender_advocacy",
+            "name": "Sender Advocate",
+            "processing": "Representing sender's goals...",
+            "system": "You represent the sender's goals and interests. Explain what they're trying to achieve and why it matters.",
+            "prompt": lambda v: f"Advocate for the sender's position in this email:\n{v['email_text']}",
+        },
+    ]},
+    # Wave 3: Devil's Advocate (reads both simulations)
+    {"context": layer1_context, "agents": [
+        {
+            "key": "devils_advocacy",
+            "name": "Devil's Advocate",
+            "optional": True,
+            "processing": "Challenging assumptions...",
+            "system": "You challenge assumptions and identify potential blind spots. Be skeptical and probe weaknesses.",
+            "prompt": lambda v: f"What could go wrong? What's being overlooked?\n\nEmail: {v['email_text']}\nRecipient reaction: {v['recipient_response']}\nSender position: {v['sender_advocacy']}",
+        },
+    ]},
+    # Wave 4: Mediator (reads all three perspectives)
+    {"context": layer1_context, "agents": [
+        {
+            "key": "mediation",
+            "name": "Mediator",
+            "optional": True,
+            "processing": "Facilitating productive discussion...",
+            "system": "You facilitate productive dialogue between perspectives. Find common ground and identify actionable insights.",
+            "prompt": lambda v: f"Mediate between:\n\nRecipient: {v['recipient_response']}\nSender Advocate: {v['sender_advocacy']}\nDevil's Advocate: {v['devils_advocacy']}",
+        },
+    ]},
+    # ========================================
+    # LAYER 3: EVALUATION LAYER (3 agents)
+    # ========================================
+    # Wave 5: Tone Validator, Goal Alignment, Risk Assessment
+    {"layer": "⚖️ EVALUATION LAYER", "context": layer2_context, "agents": [
+        {
+            "key": "tone_validation",
+            "name": "Tone Validator",
+            "processing": "Checking emotional appropriateness...",
+            "system": "You validate emotional tone and appropriateness. Check if the tone matches intent and context.",
+            "prompt": lambda v: f"Validate the tone of this email:\n{v['email_text']}",
+        },
+        {
+            "key": "goal_check",
+            "name": "Goal Alignment",
+            "processing": "Verifying objectives are met...",
+            "system": "You verify if the email achieves its stated or implied objectives. Check for goal-message alignment.",
+            "prompt": lambda v: f"Does this email achieve its goals?\n{v['email_text']}",
+        },
+        {
+            "key": "risk_analysis",
+            "name": "Risk Assessment",
+            "optional": True,
+            "processing": "Flagging potential issues...",
+            "system": "You identify risks, misunderstandings, or negative consequences. Be specific about what could go wrong.",
+            "prompt": lambda v: f"What are the risks of sending this email:\n{v['email_text']}",
+        },
+    ]},
+    # ========================================
+    # LAYER 4: OUTPUT LAYER (2 agents)
+    # ========================================
+    # Wave 6: Feedback Synthesizer
+    {"layer": "📝 OUTPUT LAYER", "context": layer3_context, "agents": [
+        {
+            "key": "feedback_synthesis",
+            "name": "Feedback Synthesizer",
+            "processing": "Creating actionable advice...",
+            "system": "You synthesize all analysis into clear, actionable feedback. Provide specific improvements.",
+            "prompt": lambda v: f"Synthesize actionable feedback for this email:\n{v['email_text']}",
+        },
+    ]},
+    # Wave 7: Email Rewriter (reads the synthesized feedback)
+    {"context": layer3_context, "agents": [
+        {
+            "key": "rewritten_email",
+            "name": "Email Rewriter",
+            "processing": "Generating improved versions...",
+            "system": "You rewrite emails to be more effective. Create an improved version incorporating all feedback.",
+            "prompt": lambda v: f"Rewrite this email to address all concerns:\n\nOriginal:\n{v['email_text']}\n\nFeedback: {v['feedback_synthesis']}",
+        },
+    ]},
+]
+
+def wave_agents(wave: Dict, values: Dict[str, str], context: str, culture: Callable) -> List[Dict]:
+    """A wave's agents with their prompts and context filled in (pair agents fetch through culture)"""
+    agents = []
+    for agent in wave["agents"]:
+        agent = dict(agent)
+        if agent.pop("pair", False):
+            agent["fetch"] = functools.partial(culture, agent["name"], values["sender_info"], values["recipient_info"])
+        else:
+            agent.update(prompt=agent["prompt"](values), context=context)
+        agents.append(agent)
+    return agents
+
+def report_run(budget: TimeBudget):
+    """Close a run's timeline: complete, or partial if the budget ran out"""
+    if budget.exhausted:
+        add_message("System", "complete", f"⚠️ Partial analysis returned: {budget.describe()}")
+    else:
         add_message("System", "complete", "✅ 12-Agent Analysis Complete!")
 
-    finally:
-        analysis_in_progress = False
+def run_analysis(email_text: str, sender_info: str, recipient_info: str, budget_seconds: Optional[float] = None):
+    """Run the 12-agent analysis pipeline as waves of concurrent agents, posting to the current job's timeline
+
+    budget_seconds, counted from the job's submission, degrades the run as it runs low (see src/utils/budget.py).
+    """
+    job = current_job.get()
+    cancel = job.cancel_token
+    budget = TimeBudget(budget_seconds, started=job.submitted)
+    values = {"email_text": email_text, "sender_info": sender_info, "recipient_info": recipient_info}
+    contexts = {}  # compacted once per layer, shared by its waves
+
+    for wave in WAVES:
+        if "layer" in wave:
+            add_message("System", "status", wave["layer"])
+        layer_context = wave.get("context")
+        if layer_context and layer_context not in contexts:
+            contexts[layer_context] = context_compactor.compact(layer_context(values))
+        agents = wave_agents(wave, values, contexts.get(layer_context, ""), pair_culture_profile)
+        values.update(run_wave(agents, cancel, budget))
+    report_run(budget)
+
+async def run_analysis_async(email_text: str, sender_info: str, recipient_info: str, budget_seconds: Optional[float] = None):
+    """run_analysis() as event-loop tasks instead of threads"""
+    job = current_job.get()
+    budget = TimeBudget(budget_seconds, started=job.submitted)
+    values = {"email_text": email_text, "sender_info": sender_info, "recipient_info": recipient_info}
+    contexts = {}
+
+    for wave in WAVES:
+        if "layer" in wave:
+            add_message("System", "status", wave["layer"])
+        layer_context = wave.get("context")
+        if layer_context and layer_context not in contexts:
+            groups = layer_context(values)
+            # A summary digest is a blocking call, so make it off the event loop
+            contexts[layer_context] = (
+                await asyncio.to_thread(context_compactor.compact, groups) if context_compactor.calls_llm
+                else context_compactor.compact(groups)
+            )
+        agents = wave_agents(wave, values, contexts.get(layer_context, ""), pair_culture_profile_async)
+        values.update(await run_wave_async(agents, budget))
+    report_run(budget)
+
+def run_job(job: Job):
+    """Worker-thread entry point: run one queued analysis against its own timeline"""
+    current_job.set(job)
+    try:
+        job.cancel_token.check()
+        run_analysis(**job.params)
+    except Cancelled as e:
+        add_message("System", "status", f"🛑 Analysis cancelled: {e}")
+        raise
+    except Exception as e:
+        add_message("System", "error", f"❌ Analysis failed: {e}")
+        raise
+
+async def run_job_async(job: Job):
+    """Worker-task entry point for the async server (see app_async.py)"""
+    current_job.set(job)
+    try:
+        await run_analysis_async(**job.params)
+    except asyncio.CancelledError:
+        if job.cancel_token.cancelled:
+            add_message("System", "status", f"🛑 Analysis cancelled: {job.cancel_token.reason}")
+        raise
+    except Exception as e:
+        add_message("System", "error", f"❌ Analysis failed: {e}")
+        raise
+
+def store_job(job: Job):
+    """Persist a job's status (and, when first queued, what it analyses)"""
+    fields = {k: v for k, v in job.to_dict().items() if k in JOB_COLUMNS}
+    if job.status == QUEUED:
+        fields.update(
+            source="app_12agent",
+            sender=job.params["sender_info"],
+            recipient=job.params["recipient_info"],
+            email_text=job.params["email_text"],
+        )
+    results.save_job(job.id, **fields)
+
+# Bounded pool of analysis workers shared fairly across tenants, each run with its own timeline; a new
+# submission supersedes only the same session's earlier run, and submissions beyond JOB_QUEUE_SIZE
+# waiting jobs get a 429
+jobs = JobQueue(
+    run_job, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, on_change=store_job,
+    tenant_weights=JOB_TENANT_WEIGHTS, tenant_cap=JOB_TENANT_MAX_RUNNING, interactive_reserved=JOB_INTERACTIVE_RESERVED,
+)
+
+def requested_job() -> Optional[Job]:
+    """The job named by the ?job= parameter (none if it is missing: a timeline is only shown to whoever submitted it)"""
+    job_id = request.args.get('job')
+    return jobs.get(job_id) if job_id else None
 
 @app.route('/')
 def home():
@@ -228,29 +516,110 @@ def home():
 
 @app.route('/api/analyze', methods=['POST'])
 def analyze_email():
-    """Submit email for analysis"""
+    """
+    Submit email for analysis. The tenant comes from the X-Tenant header or "tenant"; "priority" is
+    interactive or bulk; "budget_seconds" (default by priority) is the latency budget the run degrades to meet.
+    """
     try:
         data = request.get_json()
         email_text = data.get('email_text', '')
         sender_info = data.get('sender_info', 'Unknown')
         recipient_info = data.get('recipient_info', 'Unknown')
-
-        thread = threading.Thread(
-            target=run_analysis,
-            args=(email_text, sender_info, recipient_info)
+        priority = data.get('priority', 'interactive')
+
+        job = jobs.submit(
+            session=data.get('session_id'),
+            tenant=request.headers.get('X-Tenant') or data.get('tenant') or request.remote_addr or DEFAULT_TENANT,
+            priority=priority,
+            budget_seconds=float(data.get('budget_seconds', JOB_BUDGET_SECONDS.get(priority, 0)) or 0),
+            email_text=email_text,
+            sender_info=sender_info,
+            recipient_info=recipient_info,
         )
-        thread.start()
 
-        return jsonify({"status": "submitted"})
+        return jsonify({"status": "submitted", "job_id": job.id, "position": jobs.position(job)})
+    except QueueFull as e:
+        return (
+            jsonify({"status": "busy", "message": str(e), "retry_after": e.retry_after}),
+            429,
+            {"Retry-After": str(e.retry_after)},
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id: str):
+    """Cancel a queued or running analysis"""
+    if jobs.cancel(job_id):
+        return jsonify({"status": "cancelling", "job_id": job_id})
+    if jobs.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify({"status": "error", "message": "Job already finished"}), 409
+
 @app.route('/api/messages', methods=['GET'])
 def get_messages():
-    """Get all messages"""
+    """
+    Get a run's messages (?job=<id>; an empty timeline without one), only those after ?since=<cursor> if given.
+    With ?wait=<seconds> the request is held until something new arrives; an unchanged
+    response is answered with 304 when the client sends its ETag in If-None-Match.
+    """
+    job = requested_job()
+    if job is None:
+        if request.args.get('job'):
+            return jsonify({"status": "error", "message": "Unknown job"}), 404
+        return jsonify({"messages": [], "cursor": None, "reset": False, "analysis_in_progress": False})
+    wait = max(0.0, min(request.args.get('wait', 0.0, type=float), LONG_POLL_MAX_WAIT))
+    page = job.feed.since(request.args.get('since'), wait=wait)
+    response = jsonify({"job_id": job.id, **page})
+    response.set_etag(f"{job.id}-{page['cursor']}")
+    return response.make_conditional(request)
+
+@app.route('/api/stream', methods=['GET'])
+def stream_messages():
+    """Push each message of a run (?job=<id>) as it is added (Server-Sent Events)"""
+    if not request.args.get('job'):
+        return jsonify({"status": "error", "message": "Missing ?job=<id>"}), 400
+    job = requested_job()
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return Response(
+        sse_stream(job.feed, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/results', methods=['GET'])
+def find_results():
+    """Search stored analyses by ?sender, ?recipient, ?min_score/?max_score, ?since/?until (epoch seconds) and ?limit"""
+    return jsonify({"results": results.find_jobs(
+        sender=request.args.get('sender'),
+        recipient=request.args.get('recipient'),
+        min_score=request.args.get('min_score', type=float),
+        max_score=request.args.get('max_score', type=float),
+        since=request.args.get('since', type=float),
+        until=request.args.get('until', type=float),
+        limit=request.args.get('limit', 50, type=int),
+    )})
+
+@app.route('/api/results/<job_id>', methods=['GET'])
+def get_result(job_id: str):
+    """Get a stored analysis with its stage outputs and transcript"""
+    result = results.get_result(job_id)
+    if result is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(result)
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get LLM gateway, culture profile cache, context compaction, job queue and result store counters"""
     return jsonify({
-        "messages": messages_store,
-        "analysis_in_progress": analysis_in_progress
+        **llm_stats(),
+        "culture_profiles": culture_profiles.stats(),
+        "context_compaction": context_compactor.stats(),
+        "jobs": jobs.stats(),
+        "results": results.stats(),
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,217 @@
+"""
+12-Agent Email Analysis System - async server
+
+Serves the same routes and index.html as app.py, but every analysis runs as
+tasks on one event loop (FastAPI + uvicorn) and streams and long-polls wait
+on the loop too, so hundreds of concurrent pipelines need no thread each.
+The waves of app_12agent.py are served the same way under /12agent/, each
+wave's requests gathered on the loop.
+
+    python app_async.py
+"""
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+import uvicorn
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+# Add parent directory to path so we can import the backends (and src) wherever this is started from
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend import app as pipeline, app_12agent as waves
+from backend.app import stored_feed
+from src.utils.events import asse_stream
+from src.utils.jobs import DEFAULT_TENANT, AsyncJobQueue, Job, QueueFull, QUEUED, RUNNING
+from src.utils.llm import llm_stats
+from src.utils.pair_profiles import culture_profiles
+from src.utils.store import results
+from src.utils.config import (
+    ASYNC_JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, JOB_TENANT_WEIGHTS, JOB_TENANT_MAX_RUNNING, JOB_INTERACTIVE_RESERVED,
+    JOB_BUDGET_SECONDS, LONG_POLL_MAX_WAIT,
+)
+
+def error(message: str, status_code: int) -> JSONResponse:
+    return JSONResponse({"status": "error", "message": message}, status_code=status_code)
+
+def analysis_routes(run_job_async: Callable, store_job: Callable,
+                    counters: Callable[[], Dict]) -> Tuple[APIRouter, AsyncJobQueue]:
+    """The page and API of one analysis backend, with its own queue of jobs run by run_job_async
+
+    counters() adds the backend's own counters to /api/stats.
+    """
+    router = APIRouter()
+
+    # Analyses run as tasks shared fairly across tenants; submissions beyond JOB_QUEUE_SIZE waiting jobs get a 429
+    jobs = AsyncJobQueue(
+        run_job_async, ASYNC_JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, on_change=store_job,
+        tenant_weights=JOB_TENANT_WEIGHTS, tenant_cap=JOB_TENANT_MAX_RUNNING, interactive_reserved=JOB_INTERACTIVE_RESERVED,
+    )
+
+    def requested_job(job_id: Optional[str]) -> Optional[Job]:
+        """The job named by the ?job= parameter (none if it is missing: a timeline is only shown to whoever submitted it)"""
+        return jobs.get(job_id) if job_id else None
+
+    @router.get('/')
+    async def home():
+        """Serve the main HTML page"""
+        return FileResponse(os.path.join(os.path.dirname(__file__), 'index.html'))
+
+    @router.post('/api/analyze')
+    async def analyze_email(request: Request):
+        """
+        Submit email for analysis. The tenant comes from the X-Tenant header or "tenant"; "priority" is
+        interactive or bulk; "budget_seconds" (default by priority) is the latency budget the run degrades to meet.
+        """
+        try:
+            data = await request.json()
+            priority = data.get('priority', 'interactive')
+            job = jobs.submit(
+                session=data.get('session_id'),
+                tenant=request.headers.get('x-tenant') or data.get('tenant') or (request.client and request.client.host) or DEFAULT_TENANT,
+                priority=priority,
+                budget_seconds=float(data.get('budget_seconds', JOB_BUDGET_SECONDS.get(priority, 0)) or 0),
+                email_text=data.get('email_text', ''),
+                sender_info=data.get('sender_info', 'Unknown'),
+                recipient_info=data.get('recipient_info', 'Unknown'),
+            )
+            return {"status": "submitted", "job_id": job.id, "position": jobs.position(job)}
+        except QueueFull as e:
+            return JSONResponse(
+                {"status": "busy", "message": str(e), "retry_after": e.retry_after},
+                status_code=429,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        except ValueError as e:
+            return error(str(e), 400)
+        except Exception as e:
+            return error(str(e), 500)
+
+    @router.get('/api/jobs/{job_id}')
+    async def get_job(job_id: str):
+        """Get a job's status and queue position (jobs of earlier processes come from the result store)"""
+        job = jobs.get(job_id)
+        if job is not None:
+            return {**job.to_dict(), "position": jobs.position(job)}
+        stored = await asyncio.to_thread(results.get_job, job_id)
+        if stored is None:
+            return error("Unknown job", 404)
+        if stored["status"] in (QUEUED, RUNNING):
+            stored["status"] = "interrupted"  # the process running it stopped
+        fields = ("status", "error", "submitted", "started", "finished")
+        return {"job_id": job_id, **{field: stored[field] for field in fields}, "position": 0}
+
+    @router.post('/api/jobs/{job_id}/cancel')
+    async def cancel_job(job_id: str):
+        """Cancel a queued or running job"""
+        if jobs.cancel(job_id):
+            return {"status": "cancelling", "job_id": job_id}
+        if jobs.get(job_id) is None:
+            return error("Unknown job", 404)
+        return error("Job already finished", 409)
+
+    @router.get('/api/messages')
+    async def get_messages(request: Request, job: Optional[str] = None, since: Optional[str] = None, wait: float = 0.0):
+        """
+        Get a job's messages (?job=<id>; an empty timeline without one), only those after ?since=<cursor> if given.
+        With ?wait=<seconds> the request is held until something new arrives; an unchanged
+        response is answered with 304 when the client sends its ETag in If-None-Match.
+        """
+        current = requested_job(job)
+        job_id = current.id if current else job
+        feed = current.feed if current else (await asyncio.to_thread(stored_feed, job_id) if job_id else None)
+        if feed is None:
+            if job_id:
+                return error("Unknown job", 404)
+            return {"messages": [], "cursor": None, "reset": False, "analysis_in_progress": False}
+        page = await feed.asince(since, wait=max(0.0, min(wait, LONG_POLL_MAX_WAIT)))
+        etag = f'"{job_id}-{page["cursor"]}"'
+        if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+            return Response(status_code=304, headers={"ETag": etag})
+        return JSONResponse({"job_id": job_id, **page}, headers={"ETag": etag})
+
+    @router.get('/api/stream')
+    async def stream_messages(request: Request, job: Optional[str] = None):
+        """Push each message of a job (?job=<id>) as it is added (Server-Sent Events)"""
+        if not job:
+            return error("Missing ?job=<id>", 400)
+        current = requested_job(job)
+        feed = current.feed if current else (await asyncio.to_thread(stored_feed, job) if job else None)
+        if feed is None:
+            return error("Unknown job", 404)
+        return StreamingResponse(
+            asse_stream(feed, request.headers.get('last-event-id')),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    @router.get('/api/results')
+    async def find_results(
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+    ):
+        """Search stored analyses by ?sender, ?recipient, ?min_score/?max_score, ?since/?until (epoch seconds) and ?limit"""
+        return {"results": await asyncio.to_thread(
+            results.find_jobs, sender, recipient, min_score, max_score, since, until, limit
+        )}
+
+    @router.get('/api/results/{job_id}')
+    async def get_result(job_id: str):
+        """Get a stored analysis with its stage outputs and transcript"""
+        result = await asyncio.to_thread(results.get_result, job_id)
+        if result is None:
+            return error("Unknown job", 404)
+        return result
+
+    @router.get('/api/stats')
+    async def get_stats():
+        """Get LLM gateway, culture profile cache, backend, job queue and result store counters"""
+        return {
+            **llm_stats(),
+            "culture_profiles": culture_profiles.stats(),
+            **counters(),
+            "jobs": jobs.stats(),
+            "results": results.stats(),
+        }
+
+    return router, jobs
+
+# app.py's dialogue pipeline at /, app_12agent.py's waves at /12agent/
+pipeline_routes, jobs = analysis_routes(
+    pipeline.run_job_async, pipeline.store_job,
+    lambda: {"dialogues": dict(pipeline.dialogue_counts), "context_compaction": pipeline.context_compactor.stats()},
+)
+wave_routes, wave_jobs = analysis_routes(
+    waves.run_job_async, waves.store_job,
+    lambda: {"context_compaction": waves.context_compactor.stats()},
+)
+
+@asynccontextmanager
+async def lifespan(api: FastAPI):
+    jobs.start()
+    wave_jobs.start()
+    yield
+
+api = FastAPI(title="12-Agent Email Analysis System", lifespan=lifespan)
+api.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+api.include_router(pipeline_routes)
+api.include_router(wave_routes, prefix="/12agent")
+
+if __name__ == '__main__':
+    print("\n" + "="*70)
+    print("🚀 Starting 12-Agent Email Analysis System (async)")
+    print("="*70)
+    print(f"\nUp to {ASYNC_JOB_WORKERS} analyses of each backend run at once on one event loop")
+    print("\nOpen http://localhost:5001 in your browser (12-agent waves: http://localhost:5001/12agent/)")
+    print("="*70 + "\n")
+
+    uvicorn.run(api, host='0.0.0.0', port=5001)
@@ -1,14 +1,17 @@
 """
 FastAPI Proxy - Queries all three agents for messages
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from uagents import Model
 from uagents.query import query
 import asyncio
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 
+from src.utils.feed_cursor import cursor_etag, etag_matches, format_cursor, long_poll, parse_cursor
+
 app = FastAPI(title="Email Analysis Agent Proxy")
 
 # Enable CORS
@@ -23,6 +26,7 @@ app.add_middleware(
 # Models (matching agent definitions)
 class GetMessagesRequest(Model):
     last_index: int = 0
+    limit: int = 0
 
 class AgentMessage(BaseModel):
     timestamp: float
@@ -34,6 +38,9 @@ class AgentMessage(BaseModel):
 class MessagesResponse(Model):
     messages: List[AgentMessage]
     last_index: int
+    has_more: bool = False
+    first_index: int = 0
+    reset: bool = False
 
 # Agent addresses and endpoints
 AGENTS = {
@@ -51,31 +58,44 @@ AGENTS = {
     }
 }
 
+# While a long-poll of /messages sees no new message, the agents are asked for their tails this often (seconds)
+LONG_POLL_INTERVAL = 1.0
+
 @app.get("/")
 async def root():
     return {
         "service": "Email Analysis Agent Proxy",
         "agents": list(AGENTS.keys()),
         "endpoints": {
-            "/messages": "Get messages from all agents",
+            "/messages": "Get messages from all agents (?since=<cursor> for only newer ones, ?wait=<seconds> to long-poll)",
             "/messages/{agent_name}": "Get messages from specific agent"
         }
     }
 
-@app.get("/messages")
-async def get_all_messages(last_index: int = 0):
-    """Get messages from all agents"""
+async def collect_messages(since: Optional[str] = None) -> dict:
+    """
+    Query every agent for the messages after its position in a cursor and merge them in timestamp order.
+
+    Returns the messages and the cursor to pass next time; an agent that fails to answer keeps its position.
+    "reset" lists the agents whose log was cleared since the cursor: their messages start over.
+    """
     all_messages = []
+    positions = parse_cursor(since, AGENTS)
+    reset = []
 
     for agent_name, agent_info in AGENTS.items():
         try:
-            response = await query(
-                destination=agent_info["address"],
-                message=GetMessagesRequest(last_index=0),
-                timeout=5.0
-            )
+            # Agents answer a page at a time; follow last_index until they have no more
+            last_index, has_more = positions[agent_name], True
+            while has_more:
+                response = await query(
+                    destination=agent_info["address"],
+                    message=GetMessagesRequest(last_index=last_index),
+                    timeout=5.0
+                )
+                if not response:
+                    break
 
-            if response:
                 messages = response.decode_payload()
                 all_messages.extend([
                     {
@@ -87,6 +107,10 @@ async def get_all_messages(last_index: int = 0):
                     }
                     for msg in messages.messages
                 ])
+                if messages.reset and agent_name not in reset:
+                    reset.append(agent_name)
+                last_index, has_more = messages.last_index, messages.has_more
+                positions[agent_name] = last_index
         except Exception as e:
             print(f"Error querying {agent_name}: {e}")
             all_messages.append({
@@ -102,12 +126,30 @@ async def get_all_messages(last_index: int = 0):
 
     return {
         "messages": all_messages,
-        "total": len(all_messages)
+        "total": len(all_messages),
+        "cursor": format_cursor(positions),
+        "reset": reset
     }
 
+@app.get("/messages")
+async def get_all_messages(request: Request, since: Optional[str] = None, wait: float = 0):
+    """
+    Get messages from all agents, only those after ?since=<cursor> (the "cursor" of an earlier response) if given.
+
+    Supports long-polling: with ?wait=<seconds> the agents are asked for the messages after the
+    cursor every LONG_POLL_INTERVAL seconds until one has something new or the wait is over.
+    The ETag is the returned cursor, so a client that sends it in If-None-Match gets a 304
+    while no agent has moved past it.
+    """
+    body = await long_poll(collect_messages, since, AGENTS, wait, LONG_POLL_INTERVAL)
+    etag = cursor_etag(body["cursor"])
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
 @app.get("/messages/{agent_name}")
-async def get_agent_messages(agent_name: str, last_index: int = 0):
-    """Get messages from a specific agent"""
+async def get_agent_messages(agent_name: str, last_index: int = 0, limit: int = 0):
+    """Get a page of messages from a specific agent (continue from the returned last_index while has_more)"""
     if agent_name not in AGENTS:
         return {"error": f"Unknown agent: {agent_name}"}
 
@@ -116,7 +158,7 @@ async def get_agent_messages(agent_name: str, last_index: int = 0):
     try:
         response = await query(
             destination=agent_info["address"],
-            message=GetMessagesRequest(last_index=last_index),
+            message=GetMessagesRequest(last_index=last_index, limit=limit),
             timeout=5.0
         )
 
@@ -133,7 +175,10 @@ async def get_agent_messages(agent_name: str, last_index: int = 0):
                     }
                     for msg in messages.messages
                 ],
-                "last_index": messages.last_index
+                "last_index": messages.last_index,
+                "has_more": messages.has_more,
+                "first_index": messages.first_index,
+                "reset": messages.reset
             }
         else:
             return {"error": "No response from agent"}
@@ -161,6 +206,7 @@ async def analyze_email(
         sender_info: str
         recipient_info: str
         original_chat_sender: str = ""
+        job_id: str = ""  # left to the Analyzer, which assigns each submission its own
 
     email_input = EmailInput(
         email_text=email_text,
@@ -1,8 +1,9 @@
 """
 FastAPI Proxy - Queries agents on Agentverse (or local)
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from uagents import Model
 from uagents.query import query
 import asyncio
@@ -11,6 +12,8 @@ import os
 import ssl
 import certifi
 
+from src.utils.feed_cursor import cursor_etag, etag_matches, format_cursor, long_poll, parse_cursor
+
 # Configure SSL to use certifi certificates
 os.environ['SSL_CERT_FILE'] = certifi.where()
 os.environ['REQUESTS_CA_BUNDLE'] = certifi.where()
@@ -29,6 +32,7 @@ app.add_middleware(
 # Models (matching agent definitions)
 class GetMessagesRequest(Model):
     last_index: int = 0
+    limit: int = 0
 
 class AgentMessage(Model):
     timestamp: float
@@ -40,12 +44,16 @@ class AgentMessage(Model):
 class MessagesResponse(Model):
     messages: List[Dict[str, Any]]
     last_index: int
+    has_more: bool = False
+    first_index: int = 0
+    reset: bool = False
 
 class EmailInput(Model):
     email_text: str
     sender_info: str
     recipient_info: str
     original_chat_sender: str = ""
+    job_id: str = ""  # left to the Analyzer, which assigns each submission its own
 
 # ============================================
 # CONFIGURE YOUR AGENT ADDRESSES HERE
@@ -57,6 +65,9 @@ AGENT_ADDRESSES = {
     "output": os.getenv("OUTPUT_ADDRESS", "agent1qgwf37l6sq7xe7nvjgx2679rj7asw3lka5df5k5guqf2xm7ksruz536eeet")
 }
 
+# While a long-poll of /messages sees no new message, the agents are asked for their tails this often (seconds)
+LONG_POLL_INTERVAL = 2.0
+
 @app.get("/")
 async def root():
     return {
@@ -64,66 +75,81 @@ async def root():
         "mode": "Agentverse",
         "agents": AGENT_ADDRESSES,
         "endpoints": {
-            "/messages": "Get messages from all agents",
+            "/messages": "Get messages from all agents (?since=<cursor> for only newer ones, ?wait=<seconds> to long-poll)",
             "/messages/{agent_name}": "Get messages from specific agent",
             "/analyze": "Submit email for analysis"
         }
     }
 
-@app.get("/messages")
-async def get_all_messages(last_index: int = 0):
-    """Get messages from all agents on Agentverse"""
+async def collect_messages(since: Optional[str] = None) -> dict:
+    """
+    Query every agent on Agentverse for the messages after its position in a cursor and merge them in
+    timestamp order.
+
+    Returns the messages and the cursor to pass next time; an agent that fails to answer keeps its position.
+    "reset" lists the agents whose log was cleared since the cursor: their messages start over.
+    """
     all_messages = []
+    positions = parse_cursor(since, AGENT_ADDRESSES)
+    reset = []
 
     for agent_name, agent_address in AGENT_ADDRESSES.items():
         try:
-            print(f"Querying {agent_name} at {agent_address}...")
-            response = await query(
-                destination=agent_address,
-                message=GetMessagesRequest(last_index=0),
-                timeout=10.0
-            )
-
-            if response:
-                print(f"✓ Got response from {agent_name}, type: {type(response)}")
-
-                # Check if it's a MsgStatus or actual response
-                if hasattr(response, 'decode_payload'):
-                    payload = response.decode_payload()
-                    print(f"Decoded payload: {type(payload)}")
-
-                    # Handle the messages - they come as dicts
-                    if hasattr(payload, 'messages'):
-                        for msg in payload.messages:
-                            if isinstance(msg, dict):
-                                all_messages.append(msg)
-                            else:
-                                all_messages.append({
-                                    "timestamp": msg.timestamp,
-                                    "agent": msg.agent,
-                                    "type": msg.type,
-                                    "content": msg.content,
-                                    "recipient": msg.recipient if hasattr(msg, 'recipient') else ""
-                                })
+            # Agents answer a page at a time; follow last_index until they have no more
+            last_index, has_more = positions[agent_name], True
+            while has_more:
+                has_more = False
+                print(f"Querying {agent_name} at {agent_address}...")
+                response = await query(
+                    destination=agent_address,
+                    message=GetMessagesRequest(last_index=last_index),
+                    timeout=10.0
+                )
+
+                if response:
+                    print(f"✓ Got response from {agent_name}, type: {type(response)}")
+
+                    # Check if it's a MsgStatus or actual response
+                    if hasattr(response, 'decode_payload'):
+                        payload = response.decode_payload()
+                        print(f"Decoded payload: {type(payload)}")
+
+                        # Handle the messages - they come as dicts
+                        if hasattr(payload, 'messages'):
+                            if getattr(payload, 'reset', False) and agent_name not in reset:
+                                reset.append(agent_name)
+                            last_index, has_more = payload.last_index, getattr(payload, 'has_more', False)
+                            positions[agent_name] = last_index
+                            for msg in payload.messages:
+                                if isinstance(msg, dict):
+                                    all_messages.append(msg)
+                                else:
+                                    all_messages.append({
+                                        "timestamp": msg.timestamp,
+                                        "agent": msg.agent,
+                                        "type": msg.type,
+                                        "content": msg.content,
+                                        "recipient": msg.recipient if hasattr(msg, 'recipient') else ""
+                                    })
+                    else:
+                        # It's a MsgStatus, agent responded but no query handler
+                        print(f"Got MsgStatus from {agent_name}: {response}")
+                        all_messages.append({
+                            "timestamp": 0,
+                            "agent": agent_name.title(),
+                            "type": "info",
+                            "content": f"Agent {agent_name} responded but query handler may not be deployed",
+                            "recipient": ""
+                        })
                 else:
-                    # It's a MsgStatus, agent responded but no query handler
-                    print(f"Got MsgStatus from {agent_name}: {response}")
+                    print(f"✗ No response from {agent_name}")
                     all_messages.append({
                         "timestamp": 0,
                         "agent": agent_name.title(),
                         "type": "info",
-                        "content": f"Agent {agent_name} responded but query handler may not be deployed",
+                        "content": f"No messages yet from {agent_name}",
                         "recipient": ""
                     })
-            else:
-                print(f"✗ No response from {agent_name}")
-                all_messages.append({
-                    "timestamp": 0,
-                    "agent": agent_name.title(),
-                    "type": "info",
-                    "content": f"No messages yet from {agent_name}",
-                    "recipient": ""
-                })
         except Exception as e:
             print(f"✗ Error querying {agent_name}: {e}")
             import traceback
@@ -141,12 +167,31 @@ async def get_all_messages(last_index: int = 0):
 
     return {
         "messages": all_messages,
-        "total": len(all_messages)
+        "total": len(all_messages),
+        "cursor": format_cursor(positions),
+        "reset": reset
     }
 
+@app.get("/messages")
+async def get_all_messages(request: Request, since: Optional[str] = None, wait: float = 0):
+    """
+    Get messages from all agents on Agentverse, only those after ?since=<cursor> (the "cursor" of an
+    earlier response) if given.
+
+    Supports long-polling: with ?wait=<seconds> the agents are asked for the messages after the
+    cursor every LONG_POLL_INTERVAL seconds until one has something new or the wait is over.
+    The ETag is the returned cursor, so a client that sends it in If-None-Match gets a 304
+    while no agent has moved past it.
+    """
+    body = await long_poll(collect_messages, since, AGENT_ADDRESSES, wait, LONG_POLL_INTERVAL)
+    etag = cursor_etag(body["cursor"])
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
 @app.get("/messages/{agent_name}")
-async def get_agent_messages(agent_name: str, last_index: int = 0):
-    """Get messages from a specific agent on Agentverse"""
+async def get_agent_messages(agent_name: str, last_index: int = 0, limit: int = 0):
+    """Get a page of messages from a specific agent on Agentverse (continue from the returned last_index while has_more)"""
     if agent_name not in AGENT_ADDRESSES:
         return {"error": f"Unknown agent: {agent_name}"}
 
@@ -156,7 +201,7 @@ async def get_agent_messages(agent_name: str, last_index: int = 0):
         print(f"Querying {agent_name} at {agent_address}...")
         response = await query(
             destination=agent_address,
-            message=GetMessagesRequest(last_index=last_index),
+            message=GetMessagesRequest(last_index=last_index, limit=limit),
             timeout=10.0
         )
 
@@ -180,7 +225,10 @@ async def get_agent_messages(agent_name: str, last_index: int = 0):
 
             return {
                 "messages": messages_list,
-                "last_index": payload.last_index if hasattr(payload, 'last_index') else len(messages_list)
+                "last_index": payload.last_index if hasattr(payload, 'last_index') else len(messages_list),
+                "has_more": getattr(payload, 'has_more', False),
+                "first_index": getattr(payload, 'first_index', 0),
+                "reset": getattr(payload, 'reset', False)
             }
         else:
             return {
@@ -2,7 +2,6 @@
 Coach Agent - Analyzes emails and provides expert feedback.
 """
 from uagents import Agent, Context
-from openai import OpenAI
 import json
 import sys
 import os
@@ -11,8 +10,8 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.models.messages import CoachFeedbackRequest, CoachFeedback
+from src.utils.llm import complete
 from src.utils.config import (
-    OPENAI_API_KEY,
     AGENT_HOST,
     COACH_AGENT_PORT,
     COACH_SYSTEM_PROMPT
@@ -33,9 +32,6 @@ class CoachAgent:
             endpoint=[f"http://{AGENT_HOST}:{COACH_AGENT_PORT}/submit"]
         )
 
-        # OpenAI client
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-
         # Set up message handlers
         self._setup_handlers()
 
@@ -110,19 +106,17 @@ Provide comprehensive coaching feedback in JSON format:
 """
 
         try:
-            # Call OpenAI API
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
-                messages=[
-                    {"role": "system", "content": COACH_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
+            # Call OpenAI API through the shared gateway
+            response_text = await complete(
+                "openai",
+                "gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
+                COACH_SYSTEM_PROMPT,
+                user_prompt,
                 temperature=0.7,
-                response_format={"type": "json_object"}
+                json_mode=True,
             )
 
             # Parse response
-            response_text = completion.choices[0].message.content
             feedback_data = json.loads(response_text)
 
             return feedback_data
@@ -2,7 +2,6 @@
 Persona Agent - Simulates different personality types responding to emails.
 """
 from uagents import Agent, Context, Model
-from openai import OpenAI
 import json
 import sys
 import os
@@ -12,8 +11,8 @@ from typing import Dict, Optional
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 from src.models.messages import EmailDraftRequest, PersonaResponse, PersonalityUpdate
+from src.utils.llm import complete
 from src.utils.config import (
-    OPENAI_API_KEY,
     AGENT_HOST,
     PERSONA_AGENT_PORT,
     get_personality_prompt
@@ -38,9 +37,6 @@ class PersonaAgent:
         # Store personality states (not persisted between sessions)
         self.personalities: Dict[str, Dict] = {}
 
-        # OpenAI client
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-
         # Set up message handlers
         self._setup_handlers()
 
@@ -140,19 +136,17 @@ Respond in JSON format:
 """
 
         try:
-            # Call OpenAI API
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Draft email from {sender_name}:\n\n{draft_email}"}
-                ],
+            # Call OpenAI API through the shared gateway
+            response_text = await complete(
+                "openai",
+                "gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
+                system_prompt,
+                f"Draft email from {sender_name}:\n\n{draft_email}",
                 temperature=0.8,
-                response_format={"type": "json_object"}
+                json_mode=True,
             )
 
             # Parse response
-            response_text = completion.choices[0].message.content
             response_data = json.loads(response_text)
 
             return response_data
@@ -1,5 +1,9 @@
 """
 Auto-detecting orchestrator that switches between real and demo mode.
+
+The choice is made once, at import time. Runtime provider outages are handled
+by the LLM gateway's circuit breaker: while it is open, the real orchestrator
+answers with the demo responses instead of waiting on timeouts.
 """
 import os
 import sys
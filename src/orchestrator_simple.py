@@ -1,7 +1,6 @@
 """
 Simplified Orchestrator - Directly uses OpenAI without agent queries.
 """
-from openai import OpenAI
 import json
 import sys
 import os
@@ -10,8 +9,9 @@ from typing import Optional, Dict
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from src.utils.llm import complete, ProviderUnavailable
+from src.orchestrator_demo import demo_persona_response, demo_coach_feedback
 from src.utils.config import (
-    OPENAI_API_KEY,
     get_personality_prompt,
     COACH_SYSTEM_PROMPT
 )
@@ -24,7 +24,6 @@ class EmailEvaluationOrchestrator:
 
     def __init__(self):
         """Initialize the orchestrator."""
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
 
     async def evaluate_email(
         self,
@@ -127,23 +126,25 @@ Respond in JSON format:
 """
 
         try:
-            # Call OpenAI API
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Draft email from {sender_name}:\n\n{draft_email}"}
-                ],
+            # Call OpenAI API through the shared gateway
+            response_text = await complete(
+                "openai",
+                "gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
+                system_prompt,
+                f"Draft email from {sender_name}:\n\n{draft_email}",
                 temperature=0.8,
-                response_format={"type": "json_object"}
+                json_mode=True,
             )
 
             # Parse response
-            response_text = completion.choices[0].message.content
             response_data = json.loads(response_text)
 
             return response_data
 
+        except ProviderUnavailable:
+            # OpenAI circuit is open: answer instantly with the demo persona instead of waiting
+            return demo_persona_response(personality_type, draft_email)
+
         except Exception as e:
             # Fallback response
             return {
@@ -192,23 +193,24 @@ Provide comprehensive coaching feedback in JSON format:
 """
 
         try:
-            # Call OpenAI API
-            completion = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
-                messages=[
-                    {"role": "system", "content": COACH_SYSTEM_PROMPT},
-                    {"role": "user", "content": user_prompt}
-                ],
+            # Call OpenAI API through the shared gateway
+            response_text = await complete(
+                "openai",
+                "gpt-4o-mini",  # Using gpt-4o-mini - widely available and cost-effective
+                COACH_SYSTEM_PROMPT,
+                user_prompt,
                 temperature=0.7,
-                response_format={"type": "json_object"}
+                json_mode=True,
             )
 
             # Parse response
-            response_text = completion.choices[0].message.content
             feedback_data = json.loads(response_text)
 
             return feedback_data
 
+        except ProviderUnavailable:
+            return demo_coach_feedback(personality_type, draft_email)
+
         except Exception as e:
             # Fallback response
             return {
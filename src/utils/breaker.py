@@ -0,0 +1,81 @@
+"""
+Circuit breaker for LLM providers.
+
+closed     requests flow; a run of failures or latency-SLO violations opens it
+open       requests are refused immediately until the cooldown has passed
+half_open  one probe request is let through; success closes the circuit,
+           failure opens it again for another cooldown
+
+Only used from the gateway event loop, so it needs no locks.
+"""
+import time
+from typing import Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Per-provider breaker driven by consecutive bad outcomes."""
+
+    def __init__(self, name: str, failure_threshold: int, slo_seconds: float, cooldown: float):
+        """
+        Args:
+            name: Provider name, for reporting
+            failure_threshold: Consecutive failures/SLO violations that open the circuit
+            slo_seconds: A successful call slower than this counts as a violation (0 disables)
+            cooldown: Seconds the circuit stays open before a probe is allowed
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.slo_seconds = slo_seconds
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._bad_run = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._counts = {"opened": 0, "short_circuited": 0}
+
+    def allow(self) -> bool:
+        """Whether a request may go to the provider now."""
+        if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self._probing = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self._counts["short_circuited"] += 1
+        return False
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self._opened_at))
+
+    def record_success(self, latency: float):
+        if self.slo_seconds and latency > self.slo_seconds:
+            self.record_failure()
+            return
+        self._bad_run = 0
+        self._probing = False
+        self.state = CLOSED
+
+    def record_failure(self):
+        self._bad_run += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self._bad_run >= self.failure_threshold:
+            if self.state != OPEN:
+                self._counts["opened"] += 1
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+
+    def record_neutral(self):
+        """A request ended without telling us anything (cancelled, caller error)."""
+        self._probing = False
+
+    def stats(self) -> Dict:
+        return dict(self._counts, state=self.state, retry_in=round(self.retry_in(), 1))
@@ -0,0 +1,131 @@
+"""
+Latency budgets and the degradation ladder for analysis runs.
+
+A run carries a TimeBudget: the seconds its caller is willing to wait,
+counted from submission, so time spent queued counts too. Before each LLM
+call and each stage the pipeline asks the budget for the current step of
+DEGRADATION_LADDER, which tightens as more of the budget is spent: shorter
+completions, then a single dialogue round and no optional agents, and
+finally no further stages at all, so the caller gets a partial result inside
+the budget instead of an unbounded wait.
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class LadderStep:
+    """One rung of the degradation ladder."""
+
+    def __init__(
+        self,
+        spent: float,
+        name: str,
+        rounds: int = 2,
+        token_scale: float = 1.0,
+        skip_optional: bool = False,
+        stop: bool = False,
+    ):
+        """
+        Args:
+            spent: Share of the budget (0-1) spent before this step applies
+            name: Shown in the timeline when the run reaches this step
+            rounds: Dialogue rounds allowed (each round is one turn per agent)
+            token_scale: Factor applied to every call's max_tokens
+            skip_optional: Skip stages marked optional
+            stop: Start no more stages or calls; return what has been produced
+        """
+        self.spent = spent
+        self.name = name
+        self.rounds = rounds
+        self.token_scale = token_scale
+        self.skip_optional = skip_optional
+        self.stop = stop
+
+    def max_tokens(self, full: int) -> int:
+        return max(32, int(full * self.token_scale))
+
+
+DEGRADATION_LADDER: List[LadderStep] = [
+    LadderStep(0.0, "full analysis"),
+    LadderStep(0.5, "concise answers", token_scale=0.5),
+    LadderStep(0.7, "one dialogue round, optional agents skipped", rounds=1, token_scale=0.5, skip_optional=True),
+    LadderStep(0.9, "wrapping up", rounds=1, token_scale=0.25, skip_optional=True),
+    LadderStep(1.0, "out of time, partial result", rounds=0, skip_optional=True, stop=True),
+]
+
+# Least time given to an LLM call started under a budget, so a call made just before the end can still finish
+MIN_CALL_SECONDS = 2.0
+
+
+class TimeBudget:
+    """A run's latency budget and the ladder step it has reached."""
+
+    def __init__(
+        self,
+        seconds: Optional[float],
+        started: Optional[float] = None,
+        ladder: Optional[List[LadderStep]] = None,
+    ):
+        """
+        Args:
+            seconds: Budget in seconds (None or 0 = unbounded: always the first step)
+            started: Wall-clock time the budget started (default: now)
+            ladder: Steps in order of their spent share (default DEGRADATION_LADDER)
+        """
+        self.seconds = seconds or None
+        self.started = started if started is not None else time.time()
+        self.ladder = ladder or DEGRADATION_LADDER
+        self.deepest = 0  # index of the furthest step reached
+        self.reached_at: Optional[float] = None  # seconds into the budget when it was reached
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None if unbounded)."""
+        if self.seconds is None:
+            return None
+        return self.seconds - self.elapsed
+
+    def call_timeout(self) -> Optional[float]:
+        """Total seconds the next LLM call may take, retries included (None if unbounded)."""
+        remaining = self.remaining()
+        return None if remaining is None else max(MIN_CALL_SECONDS, remaining)
+
+    def step(self, on_change: Optional[Callable[[LadderStep], None]] = None) -> LadderStep:
+        """
+        The ladder step for the share of the budget spent so far.
+
+        Args:
+            on_change: Called with the step when this call is the first to reach it
+        """
+        if self.seconds is None:
+            return self.ladder[0]
+        elapsed = self.elapsed
+        index = max(i for i, step in enumerate(self.ladder) if step.spent * self.seconds <= elapsed)
+        with self._lock:
+            advanced = index > self.deepest
+            if advanced:
+                self.deepest, self.reached_at = index, elapsed
+        if advanced and on_change:
+            on_change(self.ladder[index])
+        return self.ladder[index]
+
+    @property
+    def degraded(self) -> bool:
+        return self.deepest > 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.ladder[self.deepest].stop
+
+    def describe(self) -> str:
+        """Summary for the timeline, e.g. "concise answers after 31s of a 60s budget"."""
+        if self.seconds is None:
+            return "no time budget"
+        if not self.degraded:
+            return f"{self.elapsed:.0f}s of a {self.seconds:.0f}s budget"
+        return f"{self.ladder[self.deepest].name} after {self.reached_at:.0f}s of a {self.seconds:.0f}s budget"
@@ -0,0 +1,158 @@
+"""
+Content-addressed cache for LLM responses.
+
+Two tiers:
+- an in-process LRU with size and TTL eviction (hits cost microseconds)
+- an optional SQLite file shared by every process on the machine
+  (agents, backends), so repeat prompts survive restarts
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def cache_key(*parts) -> str:
+    """Stable content hash of everything that determines a completion."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a maximum size and per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, stale_ok: bool = False) -> Optional[str]:
+        """Return a live entry (or, with stale_ok, an expired one that has not been evicted yet)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, value = entry
+            if self.ttl and time.time() - created > self.ttl and not stale_ok:
+                # Left in place (until LRU eviction) as a fallback for get_stale()
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, created: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (created or time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """Persistent cache tier backed by a SQLite file in WAL mode."""
+
+    # Purge expired rows once every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str, ttl: float, table: str = "llm_cache"):
+        self.path = path
+        self.ttl = ttl
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, stale_ok: bool = False) -> Optional[Tuple[float, str]]:
+        """Return (created, value) for a live entry (or, with stale_ok, an unpurged expired one), else None."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT created, value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl and time.time() - row[0] > self.ttl and not stale_ok):
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            if self.ttl and self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE created < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+
+
+class ResponseCache:
+    """Memory tier in front of an optional disk tier, with hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl: float, path: str = "", table: str = "llm_cache"):
+        """
+        Args:
+            max_entries: Maximum entries kept in memory
+            ttl: Seconds an entry stays valid in either tier (0 = forever)
+            path: SQLite file for the disk tier ("" disables it)
+            table: Table used in the SQLite file
+        """
+        self.memory = LRUCache(max_entries, ttl)
+        self.disk = None
+        if path:
+            try:
+                self.disk = SQLiteCache(path, ttl, table)
+            except sqlite3.Error as e:
+                print(f"LLM cache: disk tier disabled ({path}: {e})")
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """Memory-tier lookup only. A miss here is not counted (the disk tier may still hit)."""
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+        return value
+
+    def get_disk(self, key: str) -> Optional[str]:
+        """Disk-tier lookup, promoting hits into memory. Counts a miss if both tiers missed."""
+        entry = self.disk.get(key) if self.disk else None
+        if entry is None:
+            self._count("misses")
+            return None
+        created, value = entry
+        self.memory.set(key, value, created)
+        self._count("disk_hits")
+        return value
+
+    def get_stale(self, key: str) -> Optional[str]:
+        """Last known value for a key, ignoring TTL. For fallbacks only; not counted in stats."""
+        value = self.memory.get(key, stale_ok=True)
+        if value is None and self.disk:
+            entry = self.disk.get(key, stale_ok=True)
+            value = entry[1] if entry else None
+        return value
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk:
+            self.disk.set(key, value)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = sum(counts.values())
+        counts["hit_rate"] = round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 3) if lookups else 0.0
+        counts["memory_entries"] = len(self.memory)
+        return counts
@@ -0,0 +1,65 @@
+"""
+Cooperative cancellation for analysis runs.
+
+Threads cannot be killed, so a run carries a CancelToken instead. Code
+checks it between steps (check() raises Cancelled), and blocking waits
+register a callback that fires on cancel() to abort them early: the LLM
+gateway uses this to cancel an in-flight (possibly streaming) request, which
+releases its rate-limit slot at once.
+"""
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+
+class Cancelled(Exception):
+    """Raised inside a run whose token was cancelled."""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with abort callbacks."""
+
+    def __init__(self):
+        self.reason = ""
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled"):
+        """Flag the run as cancelled and fire every registered abort callback (once)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def check(self):
+        """Raise Cancelled if the run was cancelled."""
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+        """Call callback if the token is cancelled while the block runs (at once if it already is)."""
+        with self._lock:
+            registered = not self._event.is_set()
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
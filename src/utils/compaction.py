@@ -0,0 +1,148 @@
+"""
+Token-budgeted compaction of the context passed between pipeline layers.
+
+Each layer's agents read every earlier output as context, and that prefix is
+re-sent with every downstream call, so input tokens grow with depth. A
+ContextCompactor estimates the size of a layer's context locally and, when
+it is over budget, replaces it with a digest that fits:
+
+- extractive (default): every section keeps its label and its leading
+  sentences, with the budget shared so short sections stay whole
+- summary: one LLM call condenses the whole context
+
+Digests are cached by content, so all the agents of a layer (and every
+turn of their dialogues) share one digest and a summary is made only once.
+"""
+import re
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.utils.cache import cache_key
+
+# Rough size of a token in characters, for estimates without a tokenizer
+CHARS_PER_TOKEN = 4
+
+# A context: groups of (label, text) sections. Sections render as "label: text" lines, groups are
+# separated by a blank line
+ContextGroups = List[List[Tuple[str, str]]]
+
+# summarize(text, max_tokens) -> digest of at most about max_tokens tokens
+Summarizer = Callable[[str, int], str]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# System prompt for summary digests (the context is the user prompt)
+SUMMARY_PROMPT = (
+    "Condense these analysis notes for the agents of the next stage. Keep every section label and, under it, "
+    "the key findings, risks and recommendations. Be brief and do not add anything new."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def render(groups: ContextGroups) -> str:
+    return "\n\n".join("\n".join(f"{label}: {text}" for label, text in group) for group in groups)
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """The leading whole sentences of text that fit in max_tokens (cut at a word if even the first does not)."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens - 1) * CHARS_PER_TOKEN  # leave room for the ellipsis
+    kept = ""
+    for sentence in _SENTENCE_END.split(text.strip()):
+        candidate = f"{kept} {sentence}".strip()
+        if len(candidate) > limit:
+            break
+        kept = candidate
+    if not kept:
+        kept = text[:limit].rsplit(" ", 1)[0]
+    return f"{kept} …"
+
+
+def _shares(sizes: List[int], budget: int) -> List[int]:
+    """Split a token budget across sections: sections under an equal share stay whole, the rest split what is left."""
+    shares = [0] * len(sizes)
+    remaining = budget
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i])
+    for position, i in enumerate(order):
+        share = min(sizes[i], remaining // (len(order) - position))
+        shares[i] = share
+        remaining -= share
+    return shares
+
+
+def extractive_digest(groups: ContextGroups, max_tokens: int) -> str:
+    """Trim every section to its share of max_tokens, keeping all labels."""
+    overhead = estimate_tokens(render([[(label, "") for label, _ in group] for group in groups]))
+    texts = [text for group in groups for _, text in group]
+    shares = iter(_shares([estimate_tokens(text) for text in texts], max(0, max_tokens - overhead)))
+    return render([[(label, trim_text(text, next(shares))) for label, text in group] for group in groups])
+
+
+class ContextCompactor:
+    """Fits layer contexts into a token budget, caching one digest per distinct context."""
+
+    def __init__(self, max_tokens: int, summarize: Optional[Summarizer] = None, max_entries: int = 256):
+        """
+        Args:
+            max_tokens: Estimated tokens a context may have before it is compacted (0 = never compact)
+            summarize: Make digests with this call instead of extractively
+                (falls back to the extractive digest if it fails)
+            max_entries: Digests kept in memory
+        """
+        self.max_tokens = max_tokens
+        self.summarize = summarize
+        self.max_entries = max_entries
+        self._digests: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"contexts": 0, "compacted": 0, "hits": 0, "summary_failures": 0, "tokens_in": 0, "tokens_out": 0}
+
+    @property
+    def calls_llm(self) -> bool:
+        """Whether compact() may block on an LLM call."""
+        return self.max_tokens > 0 and self.summarize is not None
+
+    def compact(self, groups: ContextGroups) -> str:
+        """The rendered context, or a digest of it that fits max_tokens."""
+        text = render(groups)
+        tokens = estimate_tokens(text)
+        with self._lock:
+            self._counts["contexts"] += 1
+        if self.max_tokens <= 0 or tokens <= self.max_tokens:
+            return text
+
+        key = cache_key("context-digest", text, self.max_tokens, self.summarize is not None)
+        with self._lock:
+            digest = self._digests.get(key)
+            if digest is not None:
+                self._digests.move_to_end(key)
+                self._counts["hits"] += 1
+                return digest
+
+        digest = None
+        if self.summarize is not None:
+            try:
+                digest = self.summarize(text, self.max_tokens)
+            except Exception as e:
+                print(f"Context summary failed, trimming instead: {e}")
+                with self._lock:
+                    self._counts["summary_failures"] += 1
+        if digest is None:
+            digest = extractive_digest(groups, self.max_tokens)
+
+        with self._lock:
+            self._digests[key] = digest
+            while len(self._digests) > self.max_entries:
+                self._digests.popitem(last=False)
+            self._counts["compacted"] += 1
+            self._counts["tokens_in"] += tokens
+            self._counts["tokens_out"] += estimate_tokens(digest)
+        return digest
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counts, max_tokens=self.max_tokens, mode="summary" if self.summarize else "extractive")
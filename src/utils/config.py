@@ -10,6 +10,119 @@ load_dotenv()
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# ASI:One and Anthropic Configuration (used by agents/ and backend/)
+ASI1_API_KEY = os.getenv("ASI1_API_KEY", "sk_a77e3af6ceb240939b2c03ce2d30a9f750fb81f4266d44d192d3a4af763f7b8c")
+ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "sk-ant-REDACTED")
+
+# LLM gateway configuration (see src/utils/llm.py)
+LLM_PROVIDERS: Dict[str, Dict[str, str]] = {
+    "asi1": {"base_url": "https://api.asi1.ai/v1", "api_key": ASI1_API_KEY},
+    "openai": {"base_url": "https://api.openai.com/v1", "api_key": OPENAI_API_KEY},
+    "anthropic": {"api_key": ANTHROPIC_API_KEY},
+}
+
+# Per-provider budgets enforced by the gateway's adaptive rate limiter (see src/utils/ratelimit.py).
+# max_concurrency is the ceiling of the AIMD window, which halves on 429/5xx and creeps back on success.
+LLM_RATE_LIMITS: Dict[str, Dict[str, int]] = {
+    provider: {
+        "rpm": int(os.getenv(f"{provider.upper()}_RPM", rpm)),
+        "tpm": int(os.getenv(f"{provider.upper()}_TPM", tpm)),
+        "max_concurrency": int(os.getenv(f"{provider.upper()}_MAX_CONCURRENCY", concurrency)),
+    }
+    for provider, rpm, tpm, concurrency in [
+        ("asi1", "120", "200000", "8"),
+        ("openai", "500", "200000", "16"),
+        ("anthropic", "50", "50000", "8"),
+    ]
+}
+
+# Resilience policy: per-attempt timeout (callers may pass a per-stage timeout instead),
+# bounded retries with jittered exponential backoff, and optional hedging past the observed p95
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # seconds
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))  # seconds
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))  # seconds
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+
+# Circuit breaker: this many consecutive failures or calls slower than LLM_BREAKER_SLO open a
+# provider's circuit; after LLM_BREAKER_COOLDOWN seconds a single probe request is let through
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_SLO = float(os.getenv("LLM_BREAKER_SLO", "20"))  # seconds, 0 = ignore latency
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))  # seconds
+
+# LLM response cache: in-memory LRU plus a SQLite file shared by all local processes
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))  # seconds, 0 = never expire
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'llm_cache.sqlite3'))
+)  # empty string disables the disk tier
+
+# Result store: jobs, stage outputs and transcripts, kept across restarts (see src/utils/store.py)
+RESULTS_DB_PATH = os.getenv(
+    "RESULTS_DB_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'results.sqlite3'))
+)  # empty string disables the store
+RESULTS_FLUSH_SECONDS = float(os.getenv("RESULTS_FLUSH_SECONDS", "0.5"))  # batching window for writes
+
+# Agent timelines (agents/*.py): one directory of append-only log segments per agent (see src/utils/msglog.py)
+AGENT_LOG_DIR = os.getenv(
+    "AGENT_LOG_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '../..', 'agent_logs'))
+)
+AGENT_LOG_SEGMENT_SIZE = int(os.getenv("AGENT_LOG_SEGMENT_SIZE", "1000"))  # messages per segment file
+# Retention: older segments are dropped once this many newer messages, this many seconds or this many bytes are
+# kept (0 = no limit), checked every AGENT_LOG_COMPACT_SECONDS
+AGENT_LOG_MAX_MESSAGES = int(os.getenv("AGENT_LOG_MAX_MESSAGES", "50000"))
+AGENT_LOG_MAX_AGE = float(os.getenv("AGENT_LOG_MAX_AGE", "604800"))
+AGENT_LOG_MAX_BYTES = int(os.getenv("AGENT_LOG_MAX_BYTES", "0"))
+AGENT_LOG_COMPACT_SECONDS = float(os.getenv("AGENT_LOG_COMPACT_SECONDS", "60"))
+# Most messages one GetMessagesRequest returns; clients page on with the returned last_index
+AGENT_MESSAGES_PAGE_SIZE = int(os.getenv("AGENT_MESSAGES_PAGE_SIZE", "200"))
+
+# Culture analysis depends only on who is writing to whom, so it is cached per sender/recipient pair
+CULTURE_PROFILE_TTL = float(os.getenv("CULTURE_PROFILE_TTL", "604800"))  # seconds, 0 = never expire
+CULTURE_PROFILE_MAX_ENTRIES = int(os.getenv("CULTURE_PROFILE_MAX_ENTRIES", "1024"))
+
+# Analyzer agent: how many of its six independent LLM stages run at once (1 = sequential)
+ANALYZER_MAX_CONCURRENCY = int(os.getenv("ANALYZER_MAX_CONCURRENCY", "6"))
+
+# Two-agent dialogues (backend/app.py) end early once a turn shares this share of its words with one of
+# the two turns before it (token-set Jaccard overlap); 0 = always run all four turns
+DIALOGUE_CONVERGENCE_THRESHOLD = float(os.getenv("DIALOGUE_CONVERGENCE_THRESHOLD", "0.6"))
+
+# Context passed between pipeline layers (backend/app.py, backend/app_12agent.py): estimated tokens it may
+# have before it is compacted (0 = never), and how: "extractive" (trim each section to its leading sentences)
+# or "summary" (one LLM call per distinct context, shared by every downstream agent)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+CONTEXT_DIGEST = os.getenv("CONTEXT_DIGEST", "extractive").lower()
+
+# Backend job queue (backend/app.py): concurrent analyses, waiting jobs before 429, finished jobs kept
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "8"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "100"))
+# Fair sharing of the workers: "team-a:2,team-b:1" weights (unlisted tenants weigh 1), jobs one
+# tenant may run at once (0 = no cap) and workers bulk-priority jobs may not use
+JOB_TENANT_WEIGHTS: Dict[str, float] = {
+    tenant.strip(): float(weight)
+    for tenant, _, weight in (item.partition(":") for item in os.getenv("JOB_TENANT_WEIGHTS", "").split(","))
+    if tenant.strip() and weight
+}
+JOB_TENANT_MAX_RUNNING = int(os.getenv("JOB_TENANT_MAX_RUNNING", "0"))
+JOB_INTERACTIVE_RESERVED = int(os.getenv("JOB_INTERACTIVE_RESERVED", "1"))
+# Latency budget per request (seconds from submission, 0 = none) by priority class; requests may send
+# their own "budget_seconds". Runs degrade along src/utils/budget.py's ladder as the budget runs low
+JOB_BUDGET_SECONDS: Dict[str, float] = {
+    "interactive": float(os.getenv("INTERACTIVE_BUDGET_SECONDS", "90")),
+    "bulk": float(os.getenv("BULK_BUDGET_SECONDS", "0")),
+}
+# Async server (backend/app_async.py): analyses run as event-loop tasks, so far more can run at once
+ASYNC_JOB_WORKERS = int(os.getenv("ASYNC_JOB_WORKERS", "200"))
+
+# Long-polling: upper bound on ?wait=<seconds> for the message endpoints
+LONG_POLL_MAX_WAIT = float(os.getenv("LONG_POLL_MAX_WAIT", "30"))  # seconds
+
 # Agent Configuration
 AGENT_HOST = os.getenv("AGENT_HOST", "localhost")
 PERSONA_AGENT_PORT = int(os.getenv("PERSONA_AGENT_PORT", "8001"))
@@ -0,0 +1,293 @@
+"""
+Message timelines that browsers can follow over Server-Sent Events.
+
+A MessageFeed is the backends' message store: an append-only list of
+message dicts for the current run plus a condition variable, so any number
+of SSE clients can wait for new messages instead of polling for the whole
+list. Each run gets a new generation number; event ids are
+"<generation>:<index>" (plus ":done" once the run's end was sent), so a
+reconnecting EventSource, which sends the last id it saw as Last-Event-ID,
+resumes exactly where it left off. Pollers use the same ids as cursors:
+since() returns only the messages after one, plus the cursor to send next,
+and can long-poll, holding the call until there is something new.
+
+Turns whose completion is still streaming have a draft: the text so far,
+pushed to followers as "draft" events (only the new suffix when possible)
+and dropped once the turn's finished message is appended. Drafts are keyed
+by turn id, so one agent speaking in two concurrent dialogues has two; a
+turn without an id is keyed by its agent name.
+
+Feeds may be written from any thread. Followers either block a thread
+(follow, since, sse_stream) or await on an event loop (afollow, asince,
+asse_stream), so the async server holds no thread per client.
+"""
+import asyncio
+import json
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_SECONDS = 15.0
+
+
+class _FollowState:
+    """What one follower has seen so far."""
+
+    def __init__(self, generation: int, cursor: int, done_sent: bool):
+        self.generation = generation
+        self.cursor = cursor
+        self.done_sent = done_sent
+        self.sent_drafts: Dict[str, str] = {}
+        self.version = -1
+
+
+class MessageFeed:
+    """Append-only message list for one run, with blocking or awaiting followers."""
+
+    def __init__(self):
+        self.messages: List[Dict] = []
+        self.drafts: Dict[str, Tuple[str, str]] = {}  # turn id -> (agent, text so far)
+        self.running = False
+        self.generation = 0
+        self._version = 0
+        self._cond = threading.Condition()
+        # Futures of followers awaiting a change on an event loop
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future"]] = []
+
+    def _changed(self):
+        """Wake every follower. Caller holds the lock."""
+        self._version += 1
+        self._cond.notify_all()
+        for loop, future in self._waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+        self._waiters = []
+
+    async def _wait_async(self, predicate, timeout: float):
+        """Await until predicate() holds (checked under the lock after every change) or timeout passes."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            future = loop.create_future()
+            with self._cond:
+                if predicate():
+                    return
+                self._waiters.append((loop, future))
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return
+            finally:
+                with self._cond:
+                    if (loop, future) in self._waiters:
+                        self._waiters.remove((loop, future))
+
+    def start(self):
+        """Begin a new run: clear the messages and tell followers to reset."""
+        with self._cond:
+            self.generation += 1
+            self.messages = []
+            self.drafts = {}
+            self.running = True
+            self._changed()
+
+    def append(self, message: Dict):
+        """Add a finished message, replacing its turn's draft if there is one."""
+        with self._cond:
+            self.drafts.pop(draft_key(message), None)
+            self.messages.append(message)
+            self._changed()
+
+    def draft(self, agent: str, text: str, turn_id: Optional[str] = None):
+        """Publish the text streamed so far for a turn's message (turn_id defaults to the agent name)."""
+        with self._cond:
+            self.drafts[turn_id or agent] = (agent, text)
+            self._changed()
+
+    def finish(self, generation: Optional[int] = None):
+        """End the run; with a generation, only if no newer run has started since."""
+        with self._cond:
+            if generation is not None and generation != self.generation:
+                return
+            self.drafts = {}
+            self.running = False
+            self._changed()
+
+    # ---- polling ----
+
+    def _has_news(self, generation: Optional[int], index: int, done_sent: bool) -> bool:
+        """Whether a poller at this cursor has something to fetch. Caller holds the lock."""
+        return (
+            generation is None
+            or self.generation != generation
+            or len(self.messages) > index
+            or (not self.running and not done_sent)
+        )
+
+    def _page(self, generation: Optional[int], index: int) -> Dict:
+        """The since() result for a cursor. Caller holds the lock."""
+        reset = generation is not None and generation != self.generation
+        if generation is None or reset:
+            index = 0
+        messages = self.messages[index:]
+        cursor = f"{self.generation}:{index + len(messages)}"
+        return {
+            "messages": messages,
+            "cursor": cursor if self.running else f"{cursor}:done",
+            "reset": reset,
+            "analysis_in_progress": self.running,
+        }
+
+    def since(self, cursor: Optional[str] = None, wait: float = 0) -> Dict:
+        """
+        Messages added after a cursor, for clients that poll instead of streaming.
+
+        Args:
+            cursor: "<generation>:<index>[:done]" from a previous call or event id
+                (None = the whole current run)
+            wait: Seconds to hold the call while there is nothing new after the cursor:
+                no new message, no new run and no run end the caller hasn't seen
+
+        Returns:
+            Dict with the new "messages", the "cursor" to pass next time, "reset"
+            (True when the cursor belongs to an earlier run, so the caller must drop
+            what it has) and "analysis_in_progress"
+        """
+        generation, index, done_sent = parse_event_id(cursor)
+        with self._cond:
+            if wait:
+                self._cond.wait_for(lambda: self._has_news(generation, index, done_sent), timeout=wait)
+            return self._page(generation, index)
+
+    async def asince(self, cursor: Optional[str] = None, wait: float = 0) -> Dict:
+        """since() for event-loop callers: awaits instead of blocking the thread."""
+        generation, index, done_sent = parse_event_id(cursor)
+        if wait:
+            await self._wait_async(lambda: self._has_news(generation, index, done_sent), wait)
+        with self._cond:
+            return self._page(generation, index)
+
+    # ---- following ----
+
+    def _collect(self, state: _FollowState) -> List[Tuple[str, str, Dict]]:
+        """Events a follower hasn't seen yet, advancing its state. Caller holds the lock."""
+        events: List[Tuple[str, str, Dict]] = []
+        state.version = self._version
+        if self.generation != state.generation:
+            state.generation, state.cursor, state.done_sent = self.generation, 0, False
+            state.sent_drafts = {}
+            events.append(("reset", f"{state.generation}:0", {}))
+        for message in self.messages[state.cursor:]:
+            state.cursor += 1
+            state.sent_drafts.pop(draft_key(message), None)
+            events.append(("message", f"{state.generation}:{state.cursor}", message))
+        for turn_id, (agent, text) in self.drafts.items():
+            sent = state.sent_drafts.get(turn_id)
+            if sent == text:
+                continue
+            if sent is not None and text.startswith(sent):
+                events.append(("draft", "", {"agent": agent, "turn_id": turn_id, "delta": text[len(sent):]}))
+            else:
+                events.append(("draft", "", {"agent": agent, "turn_id": turn_id, "text": text}))
+            state.sent_drafts[turn_id] = text
+        if not self.running and not state.done_sent:
+            state.done_sent = True
+            events.append(("done", f"{state.generation}:{state.cursor}:done", {}))
+        return events
+
+    def _follow_state(self, generation: Optional[int], cursor: int, done_sent: bool) -> _FollowState:
+        with self._cond:
+            return _FollowState(self.generation if generation is None else generation, cursor, done_sent)
+
+    def follow(
+        self,
+        generation: Optional[int] = None,
+        cursor: int = 0,
+        done_sent: bool = False,
+        heartbeat: float = HEARTBEAT_SECONDS,
+    ) -> Iterator[Tuple[str, str, Dict]]:
+        """
+        Yield (event, id, data) for every change, blocking between them.
+
+        Events are "message" (data is the message), "draft" (data has "agent", "turn_id"
+        and either "delta" to append or "text" to replace), "reset" (a new run started),
+        "done" (the run finished) and "heartbeat" (nothing happened for a while).
+        Draft events carry no id: a reconnecting caller simply gets whole drafts again.
+        Once the run has finished and its "done" event was yielded, the generator ends.
+
+        Args:
+            generation: Run the caller last saw (None = the current one, from the start)
+            cursor: Number of that run's messages the caller already has
+            done_sent: Whether the caller already saw that run's "done" event
+            heartbeat: Seconds of silence before a heartbeat is yielded
+        """
+        state = self._follow_state(generation, cursor, done_sent)
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._version != state.version, timeout=heartbeat)
+                events = self._collect(state)
+                finished = state.done_sent and not self.running
+            yield from events or ([] if finished else [("heartbeat", "", {})])
+            if finished:
+                return
+
+    async def afollow(
+        self,
+        generation: Optional[int] = None,
+        cursor: int = 0,
+        done_sent: bool = False,
+        heartbeat: float = HEARTBEAT_SECONDS,
+    ) -> AsyncIterator[Tuple[str, str, Dict]]:
+        """follow() for event-loop callers: awaits between events instead of blocking the thread."""
+        state = self._follow_state(generation, cursor, done_sent)
+        while True:
+            await self._wait_async(lambda: self._version != state.version, heartbeat)
+            with self._cond:
+                events = self._collect(state)
+                finished = state.done_sent and not self.running
+            for event in events or ([] if finished else [("heartbeat", "", {})]):
+                yield event
+            if finished:
+                return
+
+
+def draft_key(message: Dict) -> str:
+    """Key of the draft a finished message replaces: its "turn_id", or its agent name."""
+    return message.get("turn_id") or message["agent"]
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+def parse_event_id(event_id: Optional[str]) -> Tuple[Optional[int], int, bool]:
+    """Turn a Last-Event-ID header back into (generation, cursor, done_sent)."""
+    parts = (event_id or "").split(":")
+    try:
+        return int(parts[0]), int(parts[1]), parts[2:] == ["done"]
+    except (IndexError, ValueError):
+        return None, 0, False
+
+
+def format_event(event: str, event_id: str, data: Dict) -> str:
+    """One text/event-stream frame."""
+    if event == "heartbeat":
+        return ": keep-alive\n\n"
+    if event_id:
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_stream(feed: MessageFeed, last_event_id: Optional[str] = None) -> Iterator[str]:
+    """Format a feed as a text/event-stream body."""
+    for event in feed.follow(*parse_event_id(last_event_id)):
+        yield format_event(*event)
+
+
+async def asse_stream(feed: MessageFeed, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+    """sse_stream() for ASGI servers."""
+    async for event in feed.afollow(*parse_event_id(last_event_id)):
+        yield format_event(*event)
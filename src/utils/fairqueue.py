@@ -0,0 +1,145 @@
+"""
+Priority classes and weighted fair queuing for the job queue.
+
+Waiting jobs are kept in one FIFO per (class, tenant) flow. Classes are
+served in strict priority order: a bulk job only starts when no interactive
+job can. Within a class, tenants share the workers in proportion to their
+weights by start-time fair queuing: a job's virtual start tag is the later of
+the class's virtual time and its tenant's previous finish tag, its finish tag
+adds 1/weight, and the startable job with the smallest start tag goes next.
+A tenant who queues 50 emails therefore takes turns with everyone else
+instead of going first with all of them.
+
+A job cannot start while its tenant already runs its cap of jobs, or while
+its class already holds its share of the workers; it keeps its place until
+then. FairQueue is not thread-safe: JobQueue calls it under its own lock.
+"""
+from collections import Counter, deque
+from typing import Deque, Dict, Optional, Tuple
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = [INTERACTIVE, BULK]  # highest first
+
+
+class FairQueue:
+    """Waiting jobs ordered by priority class, then weighted fair share across tenants."""
+
+    def __init__(
+        self,
+        tenant_weights: Optional[Dict[str, float]] = None,
+        tenant_cap: int = 0,
+        class_caps: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Args:
+            tenant_weights: Share of each tenant within a class (unlisted tenants weigh 1)
+            tenant_cap: Jobs one tenant may run at once (0 = no cap)
+            class_caps: Jobs each class may run at once (missing = no cap)
+        """
+        self.tenant_weights = dict(tenant_weights or {})
+        self.tenant_cap = tenant_cap
+        self.class_caps = dict(class_caps or {})
+        self._flows: Dict[Tuple[str, str], Deque] = {}
+        self._finish_tags: Dict[Tuple[str, str], float] = {}
+        self._tags: Dict[object, Tuple[float, float]] = {}  # job -> (start tag, finish tag)
+        self._vtime: Dict[str, float] = {priority: 0.0 for priority in PRIORITIES}
+        self.running_tenants: Counter = Counter()
+        self.running_classes: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._tags)
+
+    def __contains__(self, job) -> bool:
+        return job in self._tags
+
+    def push(self, job):
+        """Queue a job; it needs .priority (one of PRIORITIES) and .tenant."""
+        flow = (job.priority, job.tenant)
+        start = max(self._vtime[job.priority], self._finish_tags.get(flow, 0.0))
+        finish = start + 1.0 / self.tenant_weights.get(job.tenant, 1.0)
+        self._finish_tags[flow] = finish
+        self._tags[job] = (start, finish)
+        self._flows.setdefault(flow, deque()).append(job)
+
+    def pop(self):
+        """Remove and return the next job allowed to start (counted as running), or None."""
+        for priority in PRIORITIES:
+            cap = self.class_caps.get(priority)
+            if cap is not None and self.running_classes[priority] >= cap:
+                continue
+            heads = [
+                flow[0] for (flow_priority, tenant), flow in self._flows.items()
+                if flow_priority == priority and flow
+                and not (self.tenant_cap and self.running_tenants[tenant] >= self.tenant_cap)
+            ]
+            if heads:
+                job = min(heads, key=lambda head: (self._tags[head][0], head.submitted))
+                self._vtime[priority] = self._tags[job][0]
+                self._discard(job)
+                self._forget_idle(priority)
+                self.running_tenants[job.tenant] += 1
+                self.running_classes[job.priority] += 1
+                return job
+        return None
+
+    def remove(self, job):
+        """Drop a waiting job (cancelled before it started)."""
+        start, finish = self._tags[job]
+        flow_key = (job.priority, job.tenant)
+        if self._finish_tags.get(flow_key) == finish:
+            # It was the tenant's last queued job: the tenant's next one takes its turn
+            self._finish_tags[flow_key] = start
+        self._discard(job)
+
+    def release(self, job):
+        """Note that a job popped earlier has finished."""
+        self.running_tenants[job.tenant] -= 1
+        self.running_classes[job.priority] -= 1
+        for counter, key in ((self.running_tenants, job.tenant), (self.running_classes, job.priority)):
+            if counter[key] <= 0:
+                del counter[key]
+
+    def position(self, job) -> int:
+        """Waiting jobs that would start before this one if no caps applied."""
+        if job not in self._tags:
+            return 0
+        rank = PRIORITIES.index(job.priority)
+        start = self._tags[job][0]
+        return sum(
+            1 for other, (other_start, _) in self._tags.items()
+            if other is not job and (
+                PRIORITIES.index(other.priority) < rank
+                or (other.priority == job.priority and (other_start, other.submitted) < (start, job.submitted))
+            )
+        )
+
+    def queued(self) -> Dict[str, int]:
+        """Waiting jobs per class."""
+        counts = Counter(job.priority for job in self._tags)
+        return {priority: counts[priority] for priority in PRIORITIES}
+
+    def tenants(self) -> Dict[str, Dict[str, int]]:
+        """Waiting and running jobs per tenant."""
+        queued = Counter(job.tenant for job in self._tags)
+        return {
+            tenant: {"queued": queued[tenant], "running": self.running_tenants[tenant]}
+            for tenant in sorted(set(queued) | set(self.running_tenants))
+        }
+
+    def _discard(self, job):
+        del self._tags[job]
+        flow_key = (job.priority, job.tenant)
+        flow = self._flows[flow_key]
+        flow.remove(job)
+        if not flow:
+            del self._flows[flow_key]
+
+    def _forget_idle(self, priority: str):
+        """Drop finish tags of idle tenants the class's virtual time has caught up with: they add nothing."""
+        vtime = self._vtime[priority]
+        for flow_key in [
+            key for key, finish in self._finish_tags.items()
+            if key[0] == priority and key not in self._flows and finish <= vtime
+        ]:
+            del self._finish_tags[flow_key]
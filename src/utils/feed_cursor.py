@@ -0,0 +1,55 @@
+"""
+Cursors and long-polling for the proxies' merged agent timeline.
+
+A client reads /messages with the cursor of its last response, e.g.
+"analyzer:12,evaluator:4,output:3": each agent's position in its own
+message log. The proxy asks every agent for what lies past its position
+and, when a long-poll finds nothing new, asks again after an interval until
+the wait is over. The cursor doubles as the response's ETag.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from src.utils.config import LONG_POLL_MAX_WAIT
+
+
+def parse_cursor(cursor: Optional[str], agents: Iterable[str]) -> Dict[str, int]:
+    """Per-agent log positions from a "analyzer:12,evaluator:4,output:3" cursor (missing agents start at 0)"""
+    positions = {agent_name: 0 for agent_name in agents}
+    for part in (cursor or "").split(","):
+        agent_name, _, index = part.strip().partition(":")
+        if agent_name in positions and index.isdigit():
+            positions[agent_name] = int(index)
+    return positions
+
+
+def format_cursor(positions: Dict[str, int]) -> str:
+    """The cursor a client sends back as ?since= to get only newer messages"""
+    return ",".join(f"{agent_name}:{index}" for agent_name, index in positions.items())
+
+
+def cursor_etag(cursor: str) -> str:
+    """ETag of a response ending at cursor (If-None-Match lists ETags separated by commas, so none in it)"""
+    return '"%s"' % cursor.replace(",", "/")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names this ETag"""
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+async def long_poll(collect: Callable[[Optional[str]], Awaitable[Dict]], since: Optional[str],
+                    agents: Iterable[str], wait: float, interval: float) -> Dict:
+    """
+    collect(since) once, then again every interval seconds while its "cursor" hasn't moved past since,
+    for up to wait seconds (capped at LONG_POLL_MAX_WAIT). Returns the last body collected.
+    """
+    deadline = time.monotonic() + max(0.0, min(wait, LONG_POLL_MAX_WAIT))
+    start = format_cursor(parse_cursor(since, agents))
+    while True:
+        body = await collect(since)
+        if body["cursor"] != start or time.monotonic() + interval > deadline:
+            return body
+        await asyncio.sleep(interval)
@@ -0,0 +1,368 @@
+"""
+Job queue for the backends.
+
+Each submission becomes a Job with its own id, status and MessageFeed, so
+concurrent users never share (or wipe) a timeline. A fixed pool of worker
+threads takes jobs from a bounded queue; when the queue is full, submit()
+raises QueueFull with a Retry-After estimate for the HTTP layer.
+
+Jobs carry a tenant and a priority class. Waiting jobs are started in
+priority order and shared fairly across tenants (see fairqueue.py), with
+optional per-tenant caps and workers held back for interactive jobs, so a
+batch from one user neither starves other users nor interactive requests.
+
+Jobs are cancelled cooperatively: a queued job is simply dropped, a running
+one has its CancelToken cancelled and stops at its next check or in-flight
+LLM request. A new submission from the same session cancels the session's
+unfinished jobs, so an edited draft doesn't compete with its stale version.
+
+AsyncJobQueue is the same queue served by tasks on an event loop instead of
+threads, for the async server: there a running job is cancelled by
+cancelling its task, which also aborts whatever it is awaiting.
+"""
+import asyncio
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.utils.cancel import CancelToken, Cancelled
+from src.utils.events import MessageFeed
+from src.utils.fairqueue import BULK, INTERACTIVE, PRIORITIES, FairQueue
+from src.utils.resilience import LatencyTracker
+
+DEFAULT_TENANT = "default"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit() when no more jobs can be queued."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    """One submitted analysis: parameters, status and message timeline."""
+
+    def __init__(
+        self,
+        params: Dict[str, Any],
+        session: Optional[str] = None,
+        tenant: str = DEFAULT_TENANT,
+        priority: str = INTERACTIVE,
+    ):
+        self.id = uuid.uuid4().hex[:12]
+        self.params = params
+        self.session = session
+        self.tenant = tenant
+        self.priority = priority
+        self.cancel_token = CancelToken()
+        self.status = QUEUED
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.feed = MessageFeed()
+        self.feed.start()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class JobQueue:
+    """Bounded fair queue of jobs served by a fixed pool of worker threads."""
+
+    def __init__(
+        self,
+        run: Callable[[Job], None],
+        workers: int,
+        max_queued: int,
+        history: int = 100,
+        on_change: Optional[Callable[[Job], None]] = None,
+        tenant_weights: Optional[Dict[str, float]] = None,
+        tenant_cap: int = 0,
+        interactive_reserved: int = 0,
+    ):
+        """
+        Args:
+            run: Called on a worker thread for each job; an exception marks the job failed
+            workers: Number of jobs that run at once
+            max_queued: Jobs that may wait for a worker before submit() raises QueueFull
+            history: Finished jobs kept for status and message lookups
+            on_change: Called with the job after it is queued, started and finished
+            tenant_weights: Relative share of the workers per tenant (unlisted tenants weigh 1)
+            tenant_cap: Jobs one tenant may run at once (0 = no cap)
+            interactive_reserved: Workers bulk jobs may not use (at least one always may)
+        """
+        self.workers = workers
+        self.max_queued = max_queued
+        self.history = history
+        self._run = run
+        self._on_change = on_change or (lambda job: None)
+        bulk_cap = {BULK: max(1, workers - interactive_reserved)} if interactive_reserved else {}
+        self._pending = FairQueue(tenant_weights, tenant_cap, bulk_cap)
+        # Seconds from submission to start, per priority class
+        self._waits = {priority: LatencyTracker(window=500, min_samples=1) for priority in PRIORITIES}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running = 0
+        self._avg_seconds = 30.0  # running estimate of job duration, for Retry-After
+        self._counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0, "cancelled": 0}
+        self._cond = threading.Condition()
+        self._started = False
+
+    def submit(
+        self,
+        session: Optional[str] = None,
+        tenant: str = DEFAULT_TENANT,
+        priority: str = INTERACTIVE,
+        **params,
+    ) -> Job:
+        """
+        Queue a job, or raise QueueFull if the queue is at capacity.
+
+        Args:
+            session: Client session; its earlier unfinished jobs are cancelled first
+            tenant: Team, user or API key the job is accounted to for fair sharing
+            priority: One of PRIORITIES ("interactive" or "bulk")
+            params: Keyword arguments for the job
+
+        Raises:
+            ValueError: Unknown priority
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (expected one of: {', '.join(PRIORITIES)})")
+        if session:
+            with self._cond:
+                stale = [job for job in self._jobs.values() if job.session == session and not job.is_finished]
+            for job in stale:
+                self.cancel(job.id, "superseded by a newer submission")
+
+        with self._cond:
+            if len(self._pending) >= self.max_queued:
+                self._counts["rejected"] += 1
+                raise QueueFull(self._retry_after())
+            job = Job(params, session, tenant, priority)
+            self._jobs[job.id] = job
+            self._pending.push(job)
+            self._counts["submitted"] += 1
+            self._on_change(job)  # before a worker can report it as running
+            self._start_workers()
+            self._wake()
+            return job
+
+    def cancel(self, job_id: str, reason: str = "cancelled by request") -> bool:
+        """Cancel a queued or running job. Returns False if it is unknown or already finished."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return False
+            job.cancel_token.cancel(reason)
+            if job not in self._pending:
+                return True  # running: its worker finishes it once the run stops
+            self._pending.remove(job)
+            job.status = CANCELLED
+            job.error = reason
+            job.finished = time.time()
+            self._counts[CANCELLED] += 1
+            self._on_change(job)
+        job.feed.finish()
+        return True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def latest(self) -> Optional[Job]:
+        """Most recently submitted job still in history."""
+        with self._cond:
+            return next(reversed(self._jobs.values()), None)
+
+    def position(self, job: Job) -> int:
+        """Number of queued jobs ahead of this one (0 once it has started)."""
+        with self._cond:
+            return self._pending.position(job)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(
+                self._counts,
+                queued=len(self._pending),
+                running=self._running,
+                workers=self.workers,
+                max_queued=self.max_queued,
+                avg_seconds=round(self._avg_seconds, 1),
+                classes=self._class_stats(),
+                tenants=self._pending.tenants(),
+            )
+
+    def _class_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Queue length, running jobs and queue-wait percentiles per priority class. Caller holds the lock."""
+        queued = self._pending.queued()
+        stats = {}
+        for priority, waits in self._waits.items():
+            stats[priority] = {"queued": queued[priority], "running": self._pending.running_classes[priority]}
+            for name, q in [("wait_p50", 0.5), ("wait_p95", 0.95), ("wait_max", 1.0)]:
+                value = waits.percentile(q)
+                stats[priority][name] = round(value, 2) if value is not None else None
+        return stats
+
+    def _retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up. Caller holds the lock."""
+        return max(1, math.ceil(self._avg_seconds / self.workers))
+
+    def _start_workers(self):
+        """Start the worker threads on first use, so merely importing a backend starts none. Caller holds the lock."""
+        if self._started:
+            return
+        self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+
+    def _wake(self):
+        """Tell a worker a job was queued. Caller holds the lock."""
+        self._cond.notify()
+
+    def _next_job(self) -> Optional[Job]:
+        """Take the next job allowed to start and mark it running (None if there is none). Caller holds the lock."""
+        job = self._pending.pop()
+        if job is None:
+            return None
+        job.status = RUNNING
+        job.started = time.time()
+        self._running += 1
+        self._waits[job.priority].record(job.started - job.submitted)
+        return job
+
+    def _finish(self, job: Job, status: str, error: Optional[str]):
+        """Record how a running job ended and close its timeline."""
+        with self._cond:
+            job.status, job.error = status, error
+            job.finished = time.time()
+            self._running -= 1
+            self._pending.release(job)
+            self._wake()  # a tenant or class below its cap again may let a waiting job start
+            self._counts[status] += 1
+            if status != CANCELLED:
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (job.finished - job.started)
+            self._prune()
+        self._on_change(job)
+        job.feed.finish()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+            self._on_change(job)
+
+            try:
+                self._run(job)
+                status, error = DONE, None
+            except Cancelled as e:
+                status, error = CANCELLED, str(e)
+            except Exception as e:
+                status, error = FAILED, str(e)
+            self._finish(job, status, error)
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the history limit. Caller holds the lock."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.is_finished]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+
+class AsyncJobQueue(JobQueue):
+    """JobQueue whose workers are tasks on one event loop, so running jobs hold no threads."""
+
+    def __init__(
+        self,
+        run: Callable[[Job], Awaitable[None]],
+        workers: int,
+        max_queued: int,
+        history: int = 100,
+        on_change: Optional[Callable[[Job], None]] = None,
+        tenant_weights: Optional[Dict[str, float]] = None,
+        tenant_cap: int = 0,
+        interactive_reserved: int = 0,
+    ):
+        """
+        Args:
+            run: Coroutine function awaited for each job; an exception marks the job failed
+            workers: Number of jobs that run at once
+            max_queued: Jobs that may wait for a worker before submit() raises QueueFull
+            history: Finished jobs kept for status and message lookups
+            on_change: Called (on the loop) with the job after it is queued, started and finished
+            tenant_weights: Relative share of the workers per tenant (unlisted tenants weigh 1)
+            tenant_cap: Jobs one tenant may run at once (0 = no cap)
+            interactive_reserved: Workers bulk jobs may not use (at least one always may)
+        """
+        super().__init__(
+            run, workers, max_queued, history, on_change,
+            tenant_weights=tenant_weights, tenant_cap=tenant_cap, interactive_reserved=interactive_reserved,
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    def start(self):
+        """Start the worker tasks on the running event loop (call once, from the server's startup)."""
+        self._loop = asyncio.get_running_loop()
+        self._ready = asyncio.Event()
+        for i in range(self.workers):
+            self._loop.create_task(self._aworker(), name=f"job-worker-{i}")
+
+    def _start_workers(self):
+        if self._loop is None:
+            raise RuntimeError("AsyncJobQueue.start() must be called on the server's event loop first")
+
+    def _wake(self):
+        self._loop.call_soon_threadsafe(self._ready.set)
+
+    async def _aworker(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    self._ready.clear()
+            if job is None:
+                await self._ready.wait()
+                continue
+            self._on_change(job)
+
+            task = self._loop.create_task(self._run(job))
+            with job.cancel_token.on_cancel(lambda: self._loop.call_soon_threadsafe(task.cancel)):
+                try:
+                    await task
+                    status, error = DONE, None
+                except asyncio.CancelledError:
+                    if not job.cancel_token.cancelled:
+                        raise  # the worker itself is being shut down
+                    status, error = CANCELLED, job.cancel_token.reason
+                except Cancelled as e:
+                    status, error = CANCELLED, str(e)
+                except Exception as e:
+                    status, error = FAILED, str(e)
+            self._finish(job, status, error)
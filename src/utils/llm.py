@@ -0,0 +1,454 @@
+"""
+Shared LLM gateway for every agent and backend.
+
+Each provider (asi1, openai, anthropic) gets one long-lived async SDK
+client, whose keep-alive connection pool is shared by every caller. All
+clients live on a single background event loop owned by this module, so:
+
+- async callers (uagents handlers, orchestrators) ``await complete(...)``
+  without blocking their own event loop
+- sync callers (Flask worker threads) call ``complete_sync(...)``
+
+Every completion goes through the response cache (src/utils/cache.py),
+keyed on provider, model, prompts, max_tokens, temperature and json_mode.
+Memory-tier hits are answered on the caller's thread without touching the
+gateway loop. Identical requests that are already in flight are coalesced:
+later callers (from any thread or task) await the first one's result.
+Requests that do reach a provider are admitted by its adaptive rate
+limiter (src/utils/ratelimit.py), so callers no longer need to pace
+themselves with sleeps. Each attempt has a timeout (LLM_TIMEOUT, or the
+caller's per-stage ``timeout``). Timeouts, 429s and 5xx responses are retried
+with jittered exponential backoff, and with LLM_HEDGE enabled a duplicate
+request is raced against any attempt slower than the provider's observed p95
+(src/utils/resilience.py). A per-provider circuit breaker
+(src/utils/breaker.py) opens after a run of failures or latency-SLO
+violations. While it is open, requests get the last cached result for the
+same prompt if there is one, and otherwise fail fast with ProviderUnavailable
+so callers can fall back to canned responses instead of waiting on timeouts.
+
+Callers that pass ``on_partial`` get a streamed completion: the callback is
+invoked on the gateway thread with the text so far as tokens arrive (it is
+restarted from scratch if an attempt is retried), and the full text is
+still returned and cached as usual.
+
+Sync callers may pass a CancelToken (src/utils/cancel.py) as ``cancel``:
+cancelling it abandons the in-flight request (the provider call itself is
+only dropped if no coalesced caller still waits for it) and raises Cancelled.
+"""
+import asyncio
+import contextlib
+import concurrent.futures
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anthropic
+import openai
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from src.utils.cache import ResponseCache, cache_key
+from src.utils.config import (
+    LLM_PROVIDERS,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL,
+    LLM_CACHE_PATH,
+    LLM_RATE_LIMITS,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+    LLM_BACKOFF_BASE,
+    LLM_BACKOFF_MAX,
+    LLM_HEDGE,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_SLO,
+    LLM_BREAKER_COOLDOWN,
+)
+from src.utils.breaker import CircuitBreaker
+from src.utils.cancel import CancelToken, Cancelled
+from src.utils.ratelimit import FAILED, NEUTRAL, OK, THROTTLED, ProviderLimiter
+from src.utils.resilience import LatencyTracker, backoff_delay, first_success
+
+# Anthropic requires max_tokens on every request
+DEFAULT_MAX_TOKENS = 1024
+
+# on_partial(text_so_far) callback for streamed completions; runs on the gateway thread, must not block
+PartialCallback = Callable[[str], None]
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+_clients: Dict[str, Any] = {}
+
+# Identical requests currently in flight, by cache key (gateway loop only)
+_inflight: Dict[str, "_Flight"] = {}
+_counters = {
+    "requests": 0, "coalesced": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0, "stale_served": 0,
+}
+
+limiters: Dict[str, ProviderLimiter] = {
+    provider: ProviderLimiter(provider, **limits) for provider, limits in LLM_RATE_LIMITS.items()
+}
+latencies: Dict[str, LatencyTracker] = {provider: LatencyTracker() for provider in limiters}
+breakers: Dict[str, CircuitBreaker] = {
+    provider: CircuitBreaker(provider, LLM_BREAKER_FAILURES, LLM_BREAKER_SLO, LLM_BREAKER_COOLDOWN)
+    for provider in limiters
+}
+
+response_cache: Optional[ResponseCache] = (
+    ResponseCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL, LLM_CACHE_PATH) if LLM_CACHE_ENABLED else None
+)
+
+
+class ProviderUnavailable(Exception):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"{provider} is unavailable (circuit open, retrying in {retry_in:.0f}s)")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the gateway event loop, starting its thread on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="llm-gateway", daemon=True)
+            thread.start()
+    return _loop
+
+
+def _get_client(provider: str) -> Any:
+    """Return the pooled client for a provider. Must run on the gateway loop."""
+    client = _clients.get(provider)
+    if client is not None:
+        return client
+
+    if provider not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    settings = LLM_PROVIDERS[provider]
+
+    # Retries are the gateway's job (see _resilient_call), so the SDKs' own retry loops are off
+
+    if provider == "anthropic":
+        client = AsyncAnthropic(base_url=settings.get("base_url"), api_key=settings["api_key"], max_retries=0)
+    else:
+        client = AsyncOpenAI(base_url=settings["base_url"], api_key=settings["api_key"], max_retries=0)
+    _clients[provider] = client
+    return client
+
+
+async def _call(
+    provider: str,
+    model: str,
+    system: str,
+    prompt: str,
+    max_tokens: Optional[int],
+    temperature: Optional[float],
+    json_mode: bool,
+    on_partial: Optional[PartialCallback] = None,
+) -> str:
+    """Issue one completion request on the gateway loop, streaming it if on_partial is given."""
+    client = _get_client(provider)
+    kwargs: Dict[str, Any] = {"model": model}
+    if temperature is not None:
+        kwargs["temperature"] = temperature
+
+    if provider == "anthropic":
+        if system:
+            kwargs["system"] = system
+        kwargs["max_tokens"] = max_tokens or DEFAULT_MAX_TOKENS
+        messages = [{"role": "user", "content": prompt}]
+        if on_partial is None:
+            response = await client.messages.create(messages=messages, **kwargs)
+            return str(response.content[0].text)
+        text = ""
+        async with client.messages.stream(messages=messages, **kwargs) as stream:
+            async for piece in stream.text_stream:
+                text += piece
+                on_partial(text)
+        return text
+
+    messages = []
+    if system:
+        messages.append({"role": "system", "content": system})
+    messages.append({"role": "user", "content": prompt})
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    if json_mode:
+        kwargs["response_format"] = {"type": "json_object"}
+    if on_partial is None:
+        response = await client.chat.completions.create(messages=messages, **kwargs)
+        return str(response.choices[0].message.content)
+    text = ""
+    stream = await client.chat.completions.create(messages=messages, stream=True, **kwargs)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            text += chunk.choices[0].delta.content
+            on_partial(text)
+    return text
+
+
+def _classify(error: BaseException) -> Tuple[str, Optional[float]]:
+    """Map a failed request to a limiter outcome and an optional Retry-After in seconds."""
+    if isinstance(error, asyncio.CancelledError):
+        return NEUTRAL, None
+    if isinstance(error, (asyncio.TimeoutError, openai.APIConnectionError, anthropic.APIConnectionError)):
+        return FAILED, None
+    status = getattr(error, "status_code", None)
+    if status is None or (status != 429 and status < 500):
+        return NEUTRAL, None
+    retry_after = None
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("retry-after", ""))
+        except ValueError:
+            pass
+    return (THROTTLED if status == 429 else FAILED), retry_after
+
+
+async def _limited_call(args: Tuple, timeout: float, on_partial: Optional[PartialCallback] = None) -> str:
+    """One provider attempt, admitted by the provider's rate limiter and bounded by timeout."""
+    provider, _, system, prompt, max_tokens = args[:5]
+    limiter = limiters[provider]
+    breaker = breakers[provider]
+    # Rough token estimate: ~4 characters per prompt token plus the completion budget
+    await limiter.acquire((len(system) + len(prompt)) // 4 + (max_tokens or DEFAULT_MAX_TOKENS))
+    started = time.monotonic()
+    try:
+        text = await asyncio.wait_for(_call(*args, on_partial=on_partial), timeout)
+    except BaseException as e:
+        if isinstance(e, asyncio.TimeoutError):
+            _counters["timeouts"] += 1
+        outcome, retry_after = _classify(e)
+        limiter.release(outcome, retry_after)
+        if outcome == NEUTRAL:
+            breaker.record_neutral()
+        else:
+            breaker.record_failure()
+        raise
+    elapsed = time.monotonic() - started
+    limiter.release(OK)
+    latencies[provider].record(elapsed)
+    breaker.record_success(elapsed)
+    return text
+
+
+async def _resilient_call(args: Tuple, timeout: float, on_partial: Optional[PartialCallback] = None) -> str:
+    """
+    Provider call with bounded, jittered retries and optional p95 hedging.
+
+    Streamed calls are never hedged: two attempts would interleave their partial text.
+    """
+    provider = args[0]
+    if provider not in limiters:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    attempt = 0
+    while True:
+        if not breakers[provider].allow():
+            raise ProviderUnavailable(provider, breakers[provider].retry_in())
+        hedge_after = latencies[provider].percentile(0.95) if LLM_HEDGE and on_partial is None else None
+        try:
+            return await first_success(lambda: _limited_call(args, timeout, on_partial), hedge_after, _counters)
+        except Exception as e:
+            outcome, retry_after = _classify(e)
+            if outcome == NEUTRAL or attempt >= LLM_MAX_RETRIES:
+                raise
+        _counters["retries"] += 1
+        await asyncio.sleep(max(backoff_delay(attempt, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX), retry_after or 0))
+        attempt += 1
+
+
+async def _cached_call(key: str, args: Tuple, timeout: float, on_partial: Optional[PartialCallback] = None) -> str:
+    """Disk-tier lookup, then resilient provider call, on the gateway loop."""
+    if response_cache is None:
+        return await _resilient_call(args, timeout, on_partial)
+    loop = asyncio.get_running_loop()
+    cached = await loop.run_in_executor(None, response_cache.get_disk, key)
+    if cached is not None:
+        return cached
+    try:
+        text = await _resilient_call(args, timeout, on_partial)
+    except ProviderUnavailable:
+        stale = await loop.run_in_executor(None, response_cache.get_stale, key)
+        if stale is None:
+            raise
+        _counters["stale_served"] += 1
+        return stale
+    await loop.run_in_executor(None, response_cache.set, key, text)
+    return text
+
+
+class _Flight:
+    """One provider request shared by every caller waiting on it."""
+
+    def __init__(self):
+        self.task: Optional["asyncio.Task"] = None
+        self.waiters = 0
+        self.partial = ""
+        self.listeners: List[PartialCallback] = []
+
+    def publish(self, text: str):
+        """Forward streamed text to every listening caller. Partial text is best-effort."""
+        self.partial = text
+        for listener in list(self.listeners):
+            try:
+                listener(text)
+            except Exception:
+                pass
+
+
+async def _coalesced_call(
+    key: str, args: Tuple, timeout: float, on_partial: Optional[PartialCallback] = None
+) -> str:
+    """
+    Join an identical in-flight request or start a new one. Runs on the gateway loop.
+
+    A joining caller shares the first caller's attempt timeout and retries, and
+    only sees partial text if the first caller asked for a streamed completion.
+    """
+    _counters["requests"] += 1
+    flight = _inflight.get(key)
+    if flight is None:
+        flight = _Flight()
+        stream = flight.publish if on_partial else None
+        flight.task = asyncio.ensure_future(_cached_call(key, args, timeout, stream))
+        _inflight[key] = flight
+        flight.task.add_done_callback(
+            lambda task: _inflight.pop(key) if _inflight.get(key) is flight else None
+        )
+    else:
+        _counters["coalesced"] += 1
+        if on_partial and flight.partial:
+            on_partial(flight.partial)
+
+    if on_partial:
+        flight.listeners.append(on_partial)
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    except asyncio.CancelledError:
+        # Only abandon the provider call once nobody is waiting for it
+        if flight.waiters == 1 and not flight.task.done():
+            flight.task.cancel()
+        raise
+    finally:
+        flight.waiters -= 1
+        if on_partial:
+            flight.listeners.remove(on_partial)
+
+
+def _lookup(*args) -> Tuple[str, Optional[str]]:
+    """Return (cache key, memory-tier hit) for a request."""
+    key = cache_key(*args)
+    return key, response_cache.get_memory(key) if response_cache else None
+
+
+def llm_stats() -> Dict[str, Any]:
+    """Gateway counters for the backends' /api/stats endpoint."""
+    return {
+        "cache": response_cache.stats() if response_cache else None,
+        "requests": dict(_counters, in_flight=len(_inflight)),
+        "rate_limits": {provider: limiter.stats() for provider, limiter in limiters.items()},
+        "p95_seconds": {provider: tracker.percentile(0.95) for provider, tracker in latencies.items()},
+        "breakers": {provider: breaker.stats() for provider, breaker in breakers.items()},
+    }
+
+
+async def complete(
+    provider: str,
+    model: str,
+    system: str,
+    prompt: str,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    json_mode: bool = False,
+    timeout: Optional[float] = None,
+    on_partial: Optional[PartialCallback] = None,
+    total_timeout: Optional[float] = None,
+) -> str:
+    """
+    Get a completion from any event loop without blocking it.
+
+    Args:
+        provider: One of "asi1", "openai" or "anthropic"
+        model: Provider model name
+        system: System prompt (may be empty)
+        prompt: User prompt
+        max_tokens: Optional completion length limit
+        temperature: Optional sampling temperature
+        json_mode: Ask OpenAI-compatible providers for a JSON object
+        timeout: Seconds allowed per provider attempt (default LLM_TIMEOUT)
+        on_partial: Stream the completion, calling this with the text so far
+            (on the gateway thread) as tokens arrive. Not called on cache hits.
+        total_timeout: Seconds the whole call may take, retries and backoff included
+            (for callers with a deadline); the request is cancelled when it runs out
+
+    Returns:
+        The completion text
+
+    Raises:
+        ProviderUnavailable: The provider's circuit is open and nothing is cached for this request
+        TimeoutError: total_timeout ran out
+    """
+    args = (provider, model, system, prompt, max_tokens, temperature, json_mode)
+    key, cached = _lookup(*args)
+    if cached is not None:
+        return cached
+
+    loop = _get_loop()
+    coro = _coalesced_call(key, args, timeout or LLM_TIMEOUT, on_partial)
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is not loop:
+        coro = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+    if total_timeout is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, total_timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"No completion within {total_timeout:.1f}s") from None
+
+
+def complete_sync(
+    provider: str,
+    model: str,
+    system: str,
+    prompt: str,
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    json_mode: bool = False,
+    timeout: Optional[float] = None,
+    on_partial: Optional[PartialCallback] = None,
+    cancel: Optional[CancelToken] = None,
+    total_timeout: Optional[float] = None,
+) -> str:
+    """
+    Blocking version of complete() for worker threads.
+
+    Raises:
+        Cancelled: cancel was cancelled before or during the request
+        TimeoutError: total_timeout ran out
+    """
+    if cancel:
+        cancel.check()
+    args = (provider, model, system, prompt, max_tokens, temperature, json_mode)
+    key, cached = _lookup(*args)
+    if cached is not None:
+        return cached
+    coro = _coalesced_call(key, args, timeout or LLM_TIMEOUT, on_partial)
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    with cancel.on_cancel(future.cancel) if cancel else contextlib.nullcontext():
+        try:
+            return future.result(total_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"No completion within {total_timeout:.1f}s") from None
+        except concurrent.futures.CancelledError:
+            if cancel is None or not cancel.cancelled:
+                raise
+            raise Cancelled(cancel.reason) from None
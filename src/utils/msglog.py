@@ -0,0 +1,174 @@
+"""
+Append-only, segmented message log for the agents' timelines.
+
+Each agent's messages go to a directory of segments of SEGMENT_SIZE
+records. A segment is a JSON-lines data file plus an index file holding,
+per record, the 8-byte offset where the record ends. Appending writes one
+line and one index entry, so a log line costs the same however long the
+log is, and a read from index N opens the segment holding N, looks up its
+byte offset in the index and seeks straight to it.
+
+Record indexes are global sequence numbers: they keep counting across
+restarts, and retention drops whole segments from the front, so a reader's
+cursor stays valid after old messages are trimmed (a cursor from before the
+oldest retained record just resumes at that record). compact() applies the
+retention limits; it only ever deletes sealed segments, never the one being
+appended to. A record whose index entry never made it to disk (a crash
+mid-append) is cut off when the log is opened.
+"""
+import json
+import os
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+_OFFSET = struct.Struct("<Q")
+
+
+class MessageLog:
+    """One agent's append-only message log."""
+
+    def __init__(self, directory: str, segment_size: int = 1000,
+                 max_records: int = 0, max_age: float = 0, max_bytes: int = 0):
+        """
+        Args:
+            directory: Where the segments are kept (created if missing)
+            segment_size: Records per segment (the unit retention drops)
+            max_records: Records to keep at least before older segments are dropped (0 = no limit)
+            max_age: Seconds after its last append a sealed segment is dropped (0 = no limit)
+            max_bytes: Disk size to keep at least before older segments are dropped (0 = no limit)
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_records = max_records
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.first = 0  # sequence number of the oldest retained record
+        self._lock = threading.Lock()
+        self._data = None  # open handles of the segment being appended to
+        self._index = None
+        os.makedirs(directory, exist_ok=True)
+        self._length = self._recover()
+
+    def _path(self, segment: int, suffix: str) -> str:
+        return os.path.join(self.directory, f"{segment * self.segment_size:012d}.{suffix}")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[:-len(".log")]) // self.segment_size
+            for name in os.listdir(self.directory) if name.endswith(".log")
+        )
+
+    def _recover(self) -> int:
+        """Length of the log on disk, after trimming a torn last append."""
+        segments = self._segments()
+        if not segments:
+            return 0
+        self.first = segments[0] * self.segment_size
+        last = segments[-1]
+        index_path = self._path(last, "idx")
+        count = os.path.getsize(index_path) // _OFFSET.size if os.path.exists(index_path) else 0
+        with open(index_path, "ab") as index:
+            index.truncate(count * _OFFSET.size)
+        end = self._read_offset(last, count - 1) if count else 0
+        with open(self._path(last, "log"), "ab") as data:
+            data.truncate(end)
+        return last * self.segment_size + count
+
+    def _read_offset(self, segment: int, position: int) -> int:
+        """Byte offset where record `position` of a segment ends (0 for position -1)."""
+        if position < 0:
+            return 0
+        with open(self._path(segment, "idx"), "rb") as index:
+            index.seek(position * _OFFSET.size)
+            return _OFFSET.unpack(index.read(_OFFSET.size))[0]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, record: Dict) -> int:
+        """Append a record; returns its index."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            number = self._length
+            segment, position = divmod(number, self.segment_size)
+            if position == 0 or self._data is None:
+                self._close()
+                self._data = open(self._path(segment, "log"), "ab")
+                self._index = open(self._path(segment, "idx"), "ab")
+            self._data.write(line)
+            self._data.flush()
+            self._index.write(_OFFSET.pack(self._data.tell()))
+            self._index.flush()
+            self._length = number + 1
+        return number
+
+    def resume(self, start: int) -> Tuple[int, bool]:
+        """
+        Where a reader whose next record is start continues, and whether it must reset.
+
+        A trimmed start continues at the oldest retained record. A start past the end was handed out by
+        an earlier log (this one was cleared or replaced): the reader starts over from the oldest record.
+        """
+        with self._lock:
+            return self._resume(start)
+
+    def _resume(self, start: int) -> Tuple[int, bool]:
+        if start > self._length:
+            return self.first, True
+        return max(self.first, start), False
+
+    def read(self, start: int = 0, limit: Optional[int] = None) -> List[Dict]:
+        """Records from sequence number start on, continuing where resume() says (at most limit)."""
+        with self._lock:
+            number, _ = self._resume(start)
+            end = self._length if limit is None else min(self._length, number + limit)
+            return self._read(number, end)
+
+    def _read(self, number: int, end: int) -> List[Dict]:
+        records = []
+        while number < end:
+            segment, position = divmod(number, self.segment_size)
+            count = min(end - number, self.segment_size - position)
+            begin = self._read_offset(segment, position - 1)
+            stop = self._read_offset(segment, position + count - 1)
+            with open(self._path(segment, "log"), "rb") as data:
+                data.seek(begin)
+                chunk = data.read(stop - begin)
+            records.extend(json.loads(line) for line in chunk.decode("utf-8").splitlines())
+            number += count
+        return records
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """Drop the oldest sealed segments past the retention limits; returns the records dropped."""
+        now = time.time() if now is None else now
+        with self._lock:
+            segments = self._segments()
+            sizes = {
+                segment: os.path.getsize(self._path(segment, "log")) + os.path.getsize(self._path(segment, "idx"))
+                for segment in segments
+            }
+            total_bytes = sum(sizes.values())
+            dropped = 0
+            for segment in segments[:-1]:
+                kept = self._length - (segment + 1) * self.segment_size  # records newer than this segment
+                expired = (
+                    (self.max_records and kept >= self.max_records)
+                    or (self.max_bytes and total_bytes - sizes[segment] >= self.max_bytes)
+                    or (self.max_age and now - os.path.getmtime(self._path(segment, "log")) > self.max_age)
+                )
+                if not expired:
+                    break
+                for suffix in ("log", "idx"):
+                    os.remove(self._path(segment, suffix))
+                total_bytes -= sizes[segment]
+                self.first = (segment + 1) * self.segment_size
+                dropped += self.segment_size
+            return dropped
+
+    def _close(self):
+        for handle in (self._data, self._index):
+            if handle is not None:
+                handle.close()
+        self._data = self._index = None
@@ -0,0 +1,81 @@
+"""
+Sender/recipient pair profiles.
+
+Culture analysis only looks at who is writing to whom, never at the email
+body, so its result is cached per normalized (sender, recipient) pair and
+shared by the analyzer agent and both Flask backends. Profiles live in the
+same SQLite file as the LLM response cache, in their own table.
+"""
+import asyncio
+import re
+
+from src.utils.cache import ResponseCache, cache_key
+from src.utils.config import (
+    LLM_CACHE_PATH,
+    CULTURE_PROFILE_TTL,
+    CULTURE_PROFILE_MAX_ENTRIES,
+)
+from src.utils.llm import complete, complete_sync
+
+CULTURE_SYSTEM_PROMPT = "Detect cultural context and communication styles. Be concise (2-3 sentences)."
+
+culture_profiles = ResponseCache(
+    CULTURE_PROFILE_MAX_ENTRIES, CULTURE_PROFILE_TTL, LLM_CACHE_PATH, table="culture_profiles"
+)
+
+
+def normalize_party(info: str) -> str:
+    """Normalize free-text sender/recipient info so trivial variations share a profile."""
+    return re.sub(r"\s+", " ", info or "").strip(" \t.,;:!").lower()
+
+
+def pair_key(sender_info: str, recipient_info: str) -> str:
+    return cache_key("culture", normalize_party(sender_info), normalize_party(recipient_info))
+
+
+def culture_prompt(sender_info: str, recipient_info: str) -> str:
+    return f"Analyze cultural aspects:\n\nFrom: {sender_info}\nTo: {recipient_info}"
+
+
+async def culture_profile(sender_info: str, recipient_info: str,
+                          provider: str = "asi1", model: str = "asi1-mini") -> str:
+    """
+    Get the culture analysis for a sender/recipient pair, computing it on a miss.
+
+    Args:
+        sender_info: Free-text sender description
+        recipient_info: Free-text recipient description
+        provider: Gateway provider used on a cache miss
+        model: Model used on a cache miss
+
+    Returns:
+        The culture analysis text
+    """
+    key = pair_key(sender_info, recipient_info)
+    profile = culture_profiles.get_memory(key)
+    if profile is not None:
+        return profile
+
+    loop = asyncio.get_running_loop()
+    profile = await loop.run_in_executor(None, culture_profiles.get_disk, key)
+    if profile is not None:
+        return profile
+
+    profile = await complete(provider, model, CULTURE_SYSTEM_PROMPT,
+                             culture_prompt(sender_info, recipient_info), max_tokens=200)
+    await loop.run_in_executor(None, culture_profiles.set, key, profile)
+    return profile
+
+
+def culture_profile_sync(sender_info: str, recipient_info: str,
+                         provider: str = "asi1", model: str = "asi1-mini") -> str:
+    """Blocking version of culture_profile() for worker threads."""
+    key = pair_key(sender_info, recipient_info)
+    profile = culture_profiles.get_memory(key)
+    if profile is None:
+        profile = culture_profiles.get_disk(key)
+    if profile is None:
+        profile = complete_sync(provider, model, CULTURE_SYSTEM_PROMPT,
+                                culture_prompt(sender_info, recipient_info), max_tokens=200)
+        culture_profiles.set(key, profile)
+    return profile
@@ -0,0 +1,279 @@
+"""
+Dependency-graph scheduler for dialogue pipelines.
+
+A pipeline is a list of DialogueNode objects. Each node names the values it
+needs and the values it produces, keyed by the dialogue turn that produces
+them. The scheduler starts every node as soon as all of its inputs have been
+published (possibly by an early turn of a still-running dialogue) and records
+enough timing to report the critical path of each run. Nodes run in a copy
+of the caller's contextvars context, so per-run state (such as the backend's
+current job timeline) follows them onto the pipeline's worker threads.
+
+run() gives each running node a thread; run_async() runs the nodes' async
+runners as tasks on the caller's event loop instead, for the async server.
+When a node fails, the rest of the run is stopped before the error is
+raised: run() cancels the run's CancelToken, which the nodes check, and
+waits for their threads; run_async() cancels and awaits their tasks.
+"""
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.utils.cancel import CancelToken
+
+# run(values, on_turn): values holds every published value the node may read;
+# on_turn(turn_number, text) must be called as each turn of the dialogue finishes
+NodeRunner = Callable[[Dict[str, str], Callable[[int, str], None]], None]
+# The same contract as a coroutine, for DialogueGraph.run_async
+AsyncNodeRunner = Callable[[Dict[str, str], Callable[[int, str], None]], Awaitable[None]]
+
+
+class DialogueNode:
+    """One dialogue in a pipeline graph."""
+
+    def __init__(
+        self,
+        name: str,
+        run: NodeRunner,
+        needs: Optional[List[str]] = None,
+        outputs: Optional[Dict[str, int]] = None,
+        layer: str = "",
+        arun: Optional[AsyncNodeRunner] = None,
+    ):
+        """
+        Args:
+            name: Unique node name, used in critical path reports
+            run: Callable that runs the dialogue (see NodeRunner)
+            needs: Value keys that must be published before the node starts
+            outputs: Map of value key -> turn number that produces it
+            layer: Optional display grouping
+            arun: Optional coroutine version of run, used by DialogueGraph.run_async
+        """
+        self.name = name
+        self.run = run
+        self.arun = arun
+        self.needs = list(needs or [])
+        self.outputs = dict(outputs or {})
+        self.layer = layer
+
+
+class GraphRun:
+    """Values and timings collected from one pipeline run."""
+
+    def __init__(self):
+        self.values: Dict[str, str] = {}
+        self.started: Dict[str, float] = {}
+        self.finished: Dict[str, float] = {}
+        # node name -> name of the node whose output was the last input to arrive
+        self.gated_by: Dict[str, Optional[str]] = {}
+        self.elapsed = 0.0
+
+    @property
+    def critical_path(self) -> List[str]:
+        """Chain of nodes that determined the end-to-end latency, first to last."""
+        if not self.finished:
+            return []
+        node = max(self.finished, key=self.finished.get)
+        path = []
+        while node is not None:
+            path.append(node)
+            node = self.gated_by.get(node)
+        return list(reversed(path))
+
+    def describe_critical_path(self) -> str:
+        """Human-readable critical path with per-node durations."""
+        steps = [
+            f"{name} ({self.finished[name] - self.started[name]:.1f}s)"
+            for name in self.critical_path
+        ]
+        return f"{' → '.join(steps)} = {self.elapsed:.1f}s"
+
+
+class DialogueGraph:
+    """A validated set of dialogue nodes that can be run many times."""
+
+    def __init__(self, nodes: List[DialogueNode], inputs: List[str]):
+        """
+        Args:
+            nodes: Pipeline nodes
+            inputs: Value keys supplied by the caller of run()
+        """
+        self.nodes = list(nodes)
+        self.inputs = list(inputs)
+        self._validate()
+
+    def _validate(self):
+        """Reject duplicate names, duplicate or missing producers and cycles."""
+        names = [node.name for node in self.nodes]
+        if len(set(names)) != len(names):
+            raise ValueError("Pipeline node names must be unique")
+
+        producers: Dict[str, str] = {key: "" for key in self.inputs}
+        for node in self.nodes:
+            for key in node.outputs:
+                if key in producers:
+                    raise ValueError(f"Value '{key}' is produced more than once")
+                producers[key] = node.name
+
+        available = set(self.inputs)
+        remaining = list(self.nodes)
+        while remaining:
+            runnable = [node for node in remaining if set(node.needs) <= available]
+            if not runnable:
+                missing = {key for node in remaining for key in node.needs} - set(producers)
+                if missing:
+                    raise ValueError(f"No node produces: {', '.join(sorted(missing))}")
+                raise ValueError("Pipeline graph has a dependency cycle")
+            for node in runnable:
+                available.update(node.outputs)
+                remaining.remove(node)
+
+    def run(
+        self,
+        inputs: Dict[str, str],
+        on_start: Optional[Callable[[DialogueNode], None]] = None,
+        on_value: Optional[Callable[[str, str], None]] = None,
+        cancel: Optional[CancelToken] = None,
+    ) -> GraphRun:
+        """
+        Run the pipeline, starting each node as soon as its inputs are ready.
+
+        Args:
+            inputs: Initial values (must cover the keys given at construction)
+            on_start: Optional callback invoked (on the scheduler thread) as each node starts
+            on_value: Optional callback invoked (on the scheduler thread) with (key, text)
+                as each value is published
+            cancel: Token the nodes check; cancelled if a node fails, so the others stop early
+
+        Returns:
+            GraphRun with every published value and per-node timings
+        """
+        schedule = _Schedule(self, inputs, on_start, on_value)
+        events: "queue.Queue" = queue.Queue()
+
+        def execute(node: DialogueNode, values: Dict[str, str]):
+            try:
+                node.run(values, lambda turn, text: events.put(("turn", node, (turn, text))))
+                events.put(("done", node, None))
+            except BaseException as e:
+                events.put(("error", node, e))
+
+        pool = ThreadPoolExecutor(max_workers=len(self.nodes) or 1, thread_name_prefix="pipeline")
+        try:
+            while True:
+                for node, values in schedule.start_ready():
+                    pool.submit(contextvars.copy_context().run, execute, node, values)
+                if not schedule.running:
+                    break
+                schedule.handle(*events.get())
+        except BaseException as e:
+            if cancel is not None:
+                cancel.cancel(f"stopped after an error: {e}")
+            raise
+        finally:
+            # Never leave nodes running behind a finished or failed run
+            pool.shutdown(wait=True)
+        return schedule.finish()
+
+    async def run_async(
+        self,
+        inputs: Dict[str, str],
+        on_start: Optional[Callable[[DialogueNode], None]] = None,
+        on_value: Optional[Callable[[str, str], None]] = None,
+    ) -> GraphRun:
+        """
+        Like run(), but every node runs its arun coroutine as a task on the current event loop.
+
+        If the run fails or is cancelled, the nodes still running are cancelled and awaited.
+        """
+        missing = [node.name for node in self.nodes if node.arun is None]
+        if missing:
+            raise ValueError(f"Nodes without an async runner: {', '.join(missing)}")
+
+        schedule = _Schedule(self, inputs, on_start, on_value)
+        events: "asyncio.Queue" = asyncio.Queue()
+
+        async def execute(node: DialogueNode, values: Dict[str, str]):
+            try:
+                await node.arun(values, lambda turn, text: events.put_nowait(("turn", node, (turn, text))))
+                events.put_nowait(("done", node, None))
+            except asyncio.CancelledError:
+                raise
+            except BaseException as e:
+                events.put_nowait(("error", node, e))
+
+        tasks: List["asyncio.Task"] = []
+        try:
+            while True:
+                for node, values in schedule.start_ready():
+                    tasks.append(asyncio.ensure_future(execute(node, values)))
+                if not schedule.running:
+                    break
+                schedule.handle(*await events.get())
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return schedule.finish()
+
+
+class _Schedule:
+    """Bookkeeping of one pipeline run, shared by the threaded and the async scheduler."""
+
+    def __init__(self, graph: DialogueGraph, inputs: Dict[str, str], on_start, on_value):
+        self.result = GraphRun()
+        self.result.values.update(inputs)
+        self.on_start = on_start
+        self.on_value = on_value
+        self.producer: Dict[str, Optional[str]] = {key: None for key in inputs}
+        self.arrived: Dict[str, float] = {key: 0.0 for key in inputs}
+        self.turn_outputs = {
+            node.name: {turn: [key for key, t in node.outputs.items() if t == turn] for turn in node.outputs.values()}
+            for node in graph.nodes
+        }
+        self.pending = list(graph.nodes)
+        self.running = 0
+        self.t0 = time.monotonic()
+
+    def start_ready(self) -> List[Tuple[DialogueNode, Dict[str, str]]]:
+        """Mark every node whose inputs are all published as started; return them with their inputs."""
+        result = self.result
+        ready = [n for n in self.pending if all(key in result.values for key in n.needs)]
+        for node in ready:
+            self.pending.remove(node)
+            gate = max(node.needs, key=lambda key: self.arrived[key]) if node.needs else None
+            result.gated_by[node.name] = self.producer[gate] if gate else None
+            result.started[node.name] = time.monotonic() - self.t0
+            if self.on_start:
+                self.on_start(node)
+            self.running += 1
+        return [(node, dict(result.values)) for node in ready]
+
+    def handle(self, kind: str, node: DialogueNode, payload):
+        """Apply one event reported by a running node."""
+        now = time.monotonic() - self.t0
+        if kind == "turn":
+            turn, text = payload
+            for key in self.turn_outputs[node.name].get(turn, []):
+                self.result.values[key] = text
+                self.producer[key] = node.name
+                self.arrived[key] = now
+                if self.on_value:
+                    self.on_value(key, text)
+        elif kind == "done":
+            self.running -= 1
+            self.result.finished[node.name] = now
+            unpublished = [key for key in node.outputs if key not in self.result.values]
+            if unpublished:
+                raise RuntimeError(f"{node.name} finished without producing: {', '.join(unpublished)}")
+        else:
+            raise payload
+
+    def finish(self) -> GraphRun:
+        self.result.elapsed = time.monotonic() - self.t0
+        return self.result
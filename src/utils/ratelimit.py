@@ -0,0 +1,99 @@
+"""
+Adaptive per-provider rate limiting for the LLM gateway.
+
+Each provider gets a ProviderLimiter with:
+- requests-per-minute and tokens-per-minute token buckets
+- an AIMD concurrency window: +1 per window of successful requests,
+  halved on 429/5xx/connection failures, plus a pause for Retry-After
+
+Limiters are only touched from the gateway event loop, so they need no locks.
+"""
+import asyncio
+import time
+from typing import Dict, Optional
+
+# Outcomes reported to ProviderLimiter.release()
+OK = "ok"                  # success: grow the window
+THROTTLED = "throttled"    # 429: shrink the window and honour Retry-After
+FAILED = "failed"          # 5xx, timeout, connection error: shrink the window
+NEUTRAL = "neutral"        # cancelled or 4xx caller error: leave the window alone
+
+
+class ProviderLimiter:
+    """RPM/TPM budgets and an AIMD concurrency window for one provider."""
+
+    def __init__(self, name: str, rpm: int, tpm: int, max_concurrency: int):
+        self.name = name
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.window = float(max_concurrency)
+        self.active = 0
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._refilled = time.monotonic()
+        self._paused_until = 0.0
+        self._released: Optional[asyncio.Event] = None
+        self._counts = {"granted": 0, "throttled": 0, "failed": 0, "wait_seconds": 0.0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60)
+
+    def _delay(self, tokens: int) -> Optional[float]:
+        """Seconds to wait before a request may start, or None to wait for a release."""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.active >= int(self.window):
+            return None
+        wait_requests = (1 - self._requests) * 60 / self.rpm
+        wait_tokens = (tokens - self._tokens) * 60 / self.tpm
+        return max(wait_requests, wait_tokens, 0.0)
+
+    async def acquire(self, tokens: int):
+        """Wait until the budgets and the concurrency window admit one more request."""
+        if self._released is None:
+            self._released = asyncio.Event()
+        tokens = min(tokens, self.tpm)
+        started = time.monotonic()
+        while True:
+            delay = self._delay(tokens)
+            if delay == 0:
+                break
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        self.active += 1
+        self._requests -= 1
+        self._tokens -= tokens
+        self._counts["granted"] += 1
+        self._counts["wait_seconds"] += time.monotonic() - started
+
+    def release(self, outcome: str, retry_after: Optional[float] = None):
+        """Return a concurrency slot and adapt the window to the outcome."""
+        self.active -= 1
+        if outcome == OK:
+            self.window = min(float(self.max_concurrency), self.window + 1.0 / self.window)
+        elif outcome in (THROTTLED, FAILED):
+            self.window = max(1.0, self.window / 2)
+            self._counts[outcome] += 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        if self._released is not None:
+            self._released.set()
+
+    def stats(self) -> Dict:
+        return dict(
+            self._counts,
+            wait_seconds=round(self._counts["wait_seconds"], 3),
+            window=round(self.window, 2),
+            active=self.active,
+            rpm=self.rpm,
+            tpm=self.tpm,
+        )
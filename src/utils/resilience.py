@@ -0,0 +1,81 @@
+"""
+Retry, backoff and hedging helpers for the LLM gateway.
+
+- LatencyTracker keeps a rolling window of successful call latencies per
+  provider, so hedging can fire once a request outlives the observed p95
+- backoff_delay() is capped exponential backoff with full jitter
+- first_success() runs one attempt, launches a duplicate if it is still
+  running after hedge_after seconds, returns whichever succeeds first and
+  cancels the other
+"""
+import asyncio
+import random
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class LatencyTracker:
+    """Rolling window of call latencies in seconds."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: "deque[float]" = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-quantile (0-1) of recent latencies, or None until enough samples exist."""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def first_success(
+    attempt: Callable[[], Awaitable[str]],
+    hedge_after: Optional[float],
+    counters: Dict[str, int],
+) -> str:
+    """
+    Run attempt(), hedging with a second copy if the first is slower than hedge_after.
+
+    Args:
+        attempt: Factory for one request attempt
+        hedge_after: Seconds before a duplicate is launched (None disables hedging)
+        counters: Dict whose "hedges" and "hedge_wins" entries are incremented
+
+    Returns:
+        The first successful result. If every attempt fails, the last error is raised.
+    """
+    first = asyncio.ensure_future(attempt())
+    if hedge_after is None:
+        return await first
+
+    tasks = [first]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done:
+            counters["hedges"] += 1
+            tasks.append(asyncio.ensure_future(attempt()))
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        counters["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,25 @@
+"""
+Cheap local text similarity, for spotting dialogue turns that restate each other.
+
+Texts are compared as sets of lowercase word tokens (short words dropped),
+by Jaccard overlap: the shared share of all distinct words. No model call
+is needed, so it can run after every turn.
+"""
+import re
+from typing import FrozenSet
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+# Words shorter than this carry little meaning ("a", "to", "is") and are ignored
+MIN_TOKEN_LENGTH = 3
+
+
+def token_set(text: str) -> FrozenSet[str]:
+    return frozenset(word for word in _WORD.findall(text.lower()) if len(word) >= MIN_TOKEN_LENGTH)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Overlap of two token sets, from 0 (disjoint) to 1 (same words)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
@@ -0,0 +1,249 @@
+"""
+Persistent store for analysis results.
+
+Jobs, their per-stage outputs (analyses, dialogue turns, evaluations,
+rewrites) and their message transcripts are kept in a SQLite file in WAL
+mode, shared by the backends and the agents, so finished analyses can be
+looked up after a restart instead of being re-run. Jobs are indexed by
+sender, recipient, score and submission time.
+
+Writes never touch the caller's thread: they are queued and a background
+writer commits them in batches, one transaction per batch. Reads flush the
+queue first, so a process always sees its own writes.
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from src.utils.cache import cache_key
+from src.utils.config import RESULTS_DB_PATH, RESULTS_FLUSH_SECONDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    source TEXT,
+    sender TEXT,
+    recipient TEXT,
+    email_text TEXT,
+    status TEXT,
+    error TEXT,
+    score REAL,
+    submitted REAL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_sender ON jobs (sender, submitted);
+CREATE INDEX IF NOT EXISTS jobs_recipient ON jobs (recipient, submitted);
+CREATE INDEX IF NOT EXISTS jobs_score ON jobs (score);
+CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted);
+CREATE TABLE IF NOT EXISTS outputs (
+    job_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    value TEXT,
+    created REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    timestamp REAL,
+    agent TEXT,
+    type TEXT,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS messages_job ON messages (job_id, id);
+"""
+
+JOB_COLUMNS = ["source", "sender", "recipient", "email_text", "status", "error", "score", "submitted", "started", "finished"]
+
+# Only the columns a call passes are written; the others keep their stored values
+UPSERT_JOB = (
+    f"INSERT INTO jobs (id, {', '.join(JOB_COLUMNS)}) VALUES (?, {', '.join('?' for _ in JOB_COLUMNS)}) "
+    f"ON CONFLICT(id) DO UPDATE SET {', '.join(f'{c} = COALESCE(excluded.{c}, jobs.{c})' for c in JOB_COLUMNS)}"
+)
+UPSERT_OUTPUT = "INSERT OR REPLACE INTO outputs (job_id, stage, value, created) VALUES (?, ?, ?, ?)"
+INSERT_MESSAGE = "INSERT INTO messages (job_id, timestamp, agent, type, content) VALUES (?, ?, ?, ?, ?)"
+
+
+def email_job_id(email_text: str, sender_info: str, recipient_info: str, nonce: Optional[str] = None) -> str:
+    """
+    Job id for a submission to the agents: a hash of the email and a nonce (a fresh one unless given),
+    so analysing the same email again keeps its own rows. The agents pass it along in their messages.
+    """
+    return cache_key("email-job", email_text, sender_info, recipient_info, nonce or uuid.uuid4().hex)[:16]
+
+
+class ResultStore:
+    """SQLite result store with a batching background writer."""
+
+    def __init__(self, path: str, flush_interval: float = 0.5, batch_size: int = 500):
+        """
+        Args:
+            path: SQLite file ("" disables the store: writes are dropped, reads return nothing)
+            flush_interval: Seconds the writer waits to gather more writes into a batch
+            batch_size: Maximum writes committed in one transaction
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._counts = {"writes": 0, "batches": 0, "errors": 0}
+        if not path:
+            return
+        try:
+            self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Result store disabled ({path}: {e})")
+            self._conn = None
+            return
+        threading.Thread(target=self._writer, name="result-store", daemon=True).start()
+        atexit.register(self.flush)
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    # ---- writes (queued) ----
+
+    def _write(self, sql: str, params: tuple):
+        if self._conn is not None:
+            self._queue.put((sql, params))
+
+    def save_job(self, job_id: str, **fields: Any):
+        """Create or update a job row. Fields are JOB_COLUMNS; omitted ones are left unchanged."""
+        unknown = set(fields) - set(JOB_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+        self._write(UPSERT_JOB, (job_id, *(fields.get(column) for column in JOB_COLUMNS)))
+
+    def save_output(self, job_id: str, stage: str, value: str):
+        """Record (or replace) one stage's output for a job."""
+        self._write(UPSERT_OUTPUT, (job_id, stage, value, time.time()))
+
+    def save_outputs(self, job_id: str, outputs: Dict[str, str]):
+        for stage, value in outputs.items():
+            self.save_output(job_id, stage, value)
+
+    def save_message(self, job_id: str, message: Dict):
+        """Append a timeline message ({"timestamp", "agent", "type", "content"}) to a job's transcript."""
+        self._write(INSERT_MESSAGE, (
+            job_id, message.get("timestamp"), message.get("agent"), message.get("type"), message.get("content"),
+        ))
+
+    def flush(self, timeout: float = 10.0):
+        """Block until every write queued so far has been committed."""
+        if self._conn is None:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not isinstance(batch[-1], threading.Event):
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            writes = [item for item in batch if not isinstance(item, threading.Event)]
+            if writes:
+                self._commit(writes)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _commit(self, writes: List[tuple]):
+        """Apply a batch in one transaction; a failing write is dropped without losing the rest."""
+        with self._lock:
+            for sql, params in writes:
+                try:
+                    self._conn.execute(sql, params)
+                    self._counts["writes"] += 1
+                except sqlite3.Error as e:
+                    self._counts["errors"] += 1
+                    print(f"Result store: dropped a write ({e})")
+            try:
+                self._conn.commit()
+                self._counts["batches"] += 1
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                self._counts["errors"] += 1
+                print(f"Result store: lost a batch of {len(writes)} writes ({e})")
+
+    # ---- reads ----
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict]:
+        if self._conn is None:
+            return []
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return rows[0] if rows else None
+
+    def get_outputs(self, job_id: str) -> Dict[str, str]:
+        rows = self._query("SELECT stage, value FROM outputs WHERE job_id = ? ORDER BY created", (job_id,))
+        return {row["stage"]: row["value"] for row in rows}
+
+    def get_messages(self, job_id: str) -> List[Dict]:
+        return self._query(
+            "SELECT timestamp, agent, type, content FROM messages WHERE job_id = ? ORDER BY id", (job_id,)
+        )
+
+    def get_result(self, job_id: str) -> Optional[Dict]:
+        """A job with its outputs and transcript, or None if it was never stored."""
+        job = self.get_job(job_id)
+        if job is None:
+            return None
+        return {**job, "outputs": self.get_outputs(job_id), "messages": self.get_messages(job_id)}
+
+    def find_jobs(
+        self,
+        sender: Optional[str] = None,
+        recipient: Optional[str] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+    ) -> List[Dict]:
+        """Most recent jobs matching every given filter (email text left out)."""
+        conditions, params = [], []
+        for clause, value in [
+            ("sender = ?", sender),
+            ("recipient = ?", recipient),
+            ("score >= ?", min_score),
+            ("score <= ?", max_score),
+            ("submitted >= ?", since),
+            ("submitted <= ?", until),
+        ]:
+            if value is not None:
+                conditions.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(["id"] + [c for c in JOB_COLUMNS if c != "email_text"])
+        return self._query(
+            f"SELECT {columns} FROM jobs {where} ORDER BY submitted DESC LIMIT ?", (*params, limit)
+        )
+
+    def stats(self) -> Dict:
+        return dict(self._counts, enabled=self.enabled, pending=self._queue.qsize())
+
+
+# Shared by everything in the process
+results = ResultStore(RESULTS_DB_PATH, RESULTS_FLUSH_SECONDS)
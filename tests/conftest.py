@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the project as `src.*`, like the backends and agents do
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Keep tests off the shared on-disk cache and result store
+os.environ.setdefault("LLM_CACHE_PATH", "")
+os.environ.setdefault("RESULTS_DB_PATH", "")
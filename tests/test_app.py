@@ -0,0 +1,40 @@
+import importlib.util
+import os
+
+import pytest
+
+from src.utils.jobs import Job
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', 'backend', 'app.py')
+AGENTS = {1: ("Recipient Persona", ""), 2: ("Sender Advocate", "")}
+
+
+@pytest.fixture
+def backend():
+    """backend/app.py, running as a job of its own"""
+    spec = importlib.util.spec_from_file_location("app_under_test", BACKEND)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.current_job.set(Job({}))
+    return module
+
+
+def finish(backend, responses, stop):
+    turns = {}
+    result = backend.finish_dialogue(list(responses), AGENTS, lambda turn, text: turns.setdefault(turn, text), stop)
+    assert turns == {turn: result[turn - 1] for turn in range(len(responses) + 1, 5)}
+    return result
+
+
+def test_converged_dialogue_fills_each_turn_from_its_own_speaker(backend):
+    assert finish(backend, ["persona 1", "advocate 1"], "converged") == (
+        "persona 1", "advocate 1", "persona 1", "advocate 1",
+    )
+    assert finish(backend, ["persona 1", "advocate 1", "persona 2"], "converged")[3] == "advocate 1"
+
+
+def test_speaker_who_never_spoke_gets_a_placeholder(backend):
+    assert finish(backend, ["persona 1"], "converged")[1:] == (
+        "(no response — dialogue converged)", "persona 1", "(no response — dialogue converged)",
+    )
+    assert finish(backend, [], "time") == ("[Recipient Persona ran out of time]", "[Sender Advocate ran out of time]") * 2
@@ -0,0 +1,157 @@
+import asyncio
+import importlib.util
+import os
+import time
+
+import pytest
+
+from src.utils.jobs import Job
+from src.utils.store import ResultStore
+
+BACKEND = os.path.join(os.path.dirname(__file__), '..', 'backend', 'app_12agent.py')
+FINISHED = ("done", "cancelled", "failed")
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """backend/app_12agent.py with a private result store and canned LLM replies"""
+    spec = importlib.util.spec_from_file_location("app_12agent_under_test", BACKEND)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    def complete_sync(provider, model, system, prompt, cancel=None, **kwargs):
+        time.sleep(0.02)
+        if cancel:
+            cancel.check()
+        return f"Reply to: {system[:40]}"
+
+    def culture_profile_sync(sender_info, recipient_info):
+        time.sleep(0.3)  # outlives a superseded run's other agents
+        return f"Culture of {sender_info} and {recipient_info}"
+
+    monkeypatch.setattr(module, "complete_sync", complete_sync)
+    monkeypatch.setattr(module, "culture_profile_sync", culture_profile_sync)
+    monkeypatch.setattr(module, "results", ResultStore(str(tmp_path / "results.sqlite3"), flush_interval=0.01))
+    return module
+
+
+def submit(client, session="tab-1"):
+    response = client.post('/api/analyze', json={
+        "email_text": "Please send the report.", "sender_info": "Manager", "recipient_info": "Team",
+        "session_id": session, "budget_seconds": 0,
+    })
+    return response.get_json()["job_id"]
+
+
+def wait_finished(backend, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while True:
+        job = backend.results.get_job(job_id)
+        if job and job["status"] in FINISHED:
+            return job
+        assert time.time() < deadline, f"job {job_id} did not finish"
+        time.sleep(0.05)
+
+
+def test_back_to_back_submissions_keep_their_own_rows(backend):
+    client = backend.app.test_client()
+
+    clean = submit(client)
+    assert wait_finished(backend, clean)["status"] == "done"
+    clean_messages = len(backend.results.get_messages(clean))
+
+    first = submit(client)
+    second = submit(client)
+    assert wait_finished(backend, first)["status"] == "cancelled"
+    job = wait_finished(backend, second)
+    time.sleep(0.5)  # let the superseded run's culture lookup finish too
+
+    assert job["status"] == "done" and job["error"] is None
+    assert len(backend.results.get_messages(second)) == clean_messages
+    assert backend.results.get_outputs(second)["culture_analysis"].startswith("Culture of")
+    assert backend.results.get_job(first)["status"] == "cancelled"
+
+
+def test_submissions_from_other_sessions_are_not_superseded(backend):
+    client = backend.app.test_client()
+
+    mine = submit(client, session="tab-1")
+    theirs = submit(client, session="tab-2")
+
+    assert wait_finished(backend, mine)["status"] == "done"
+    assert wait_finished(backend, theirs)["status"] == "done"
+    assert client.get(f'/api/messages?job={theirs}').get_json()["job_id"] == theirs
+
+
+def test_cancelled_run_stops_writing_agent_output(backend):
+    client = backend.app.test_client()
+
+    job_id = submit(client)
+    time.sleep(0.1)  # inside the first wave, with the culture lookup still running
+    assert client.post(f'/api/jobs/{job_id}/cancel').status_code == 200
+    assert wait_finished(backend, job_id)["status"] == "cancelled"
+    time.sleep(0.5)  # past the culture lookup
+
+    messages = backend.results.get_messages(job_id)
+    assert messages[-1]["agent"] == "System" and "cancelled" in messages[-1]["content"]
+    assert not any(message["agent"] == "Culture Detector" and message["type"] == "result" for message in messages)
+    assert "culture_analysis" not in backend.results.get_outputs(job_id)
+
+
+def test_async_run_gathers_each_wave_on_the_event_loop(backend, monkeypatch):
+    in_flight = {"now": 0, "peak": 0}
+
+    async def complete(provider, model, system, prompt, **kwargs):
+        in_flight["now"] += 1
+        in_flight["peak"] = max(in_flight["peak"], in_flight["now"])
+        await asyncio.sleep(0.02)
+        in_flight["now"] -= 1
+        return f"Reply to: {system[:40]}"
+
+    async def culture_profile(sender_info, recipient_info):
+        await asyncio.sleep(0.02)
+        return f"Culture of {sender_info} and {recipient_info}"
+
+    monkeypatch.setattr(backend, "complete", complete)
+    monkeypatch.setattr(backend, "culture_profile", culture_profile)
+    job = Job({"email_text": "Please send the report.", "sender_info": "Manager", "recipient_info": "Team",
+               "budget_seconds": 0})
+
+    asyncio.run(backend.run_job_async(job))
+    backend.results.flush()
+
+    outputs = backend.results.get_outputs(job.id)
+    assert set(outputs) == {agent["key"] for wave in backend.WAVES for agent in wave["agents"]}
+    assert outputs["culture_analysis"] == "Culture of Manager and Team"
+    assert in_flight["peak"] == 3  # the evaluation wave's three agents ran side by side
+    assert job.feed.since(None)["messages"][-1]["content"] == "✅ 12-Agent Analysis Complete!"
+
+
+def test_submissions_carry_tenant_and_priority(backend):
+    client = backend.app.test_client()
+
+    response = client.post('/api/analyze', headers={"X-Tenant": "acme"}, json={
+        "email_text": "Please send the report.", "sender_info": "Manager", "recipient_info": "Team",
+        "tenant": "ignored", "priority": "bulk",
+    })
+    job = backend.jobs.get(response.get_json()["job_id"])
+    assert (job.tenant, job.priority) == ("acme", "bulk")
+    assert job.params["budget_seconds"] == backend.JOB_BUDGET_SECONDS["bulk"]
+
+    job_id = submit(client)
+    assert backend.jobs.get(job_id).tenant == "127.0.0.1"  # no tenant given: the client address
+    assert wait_finished(backend, job_id)["status"] == "done"
+
+    stats = client.get('/api/stats').get_json()["jobs"]
+    assert stats["submitted"] == 2 and set(stats["classes"]) == {"interactive", "bulk"}
+    assert client.post('/api/analyze', json={"email_text": "x", "priority": "urgent"}).status_code == 400
+
+
+def test_timelines_are_only_served_by_job_id(backend):
+    client = backend.app.test_client()
+    job_id = submit(client)
+
+    assert client.get('/api/messages').get_json()["messages"] == []  # never someone else's latest run
+    assert client.get('/api/stream').status_code == 400
+    assert wait_finished(backend, job_id)["status"] == "done"
+    assert client.get(f'/api/messages?job={job_id}').get_json()["messages"]
@@ -0,0 +1,63 @@
+import time
+
+from src.utils.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def opened(cooldown=60.0) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=3, slo_seconds=1.0, cooldown=cooldown)
+    for _ in range(3):
+        breaker.record_failure()
+    return breaker
+
+
+def test_a_run_of_failures_opens_the_circuit():
+    breaker = CircuitBreaker("test", failure_threshold=3, slo_seconds=0, cooldown=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)  # resets the run
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert 0 < breaker.retry_in() <= 60
+    assert breaker.stats()["opened"] == 1 and breaker.stats()["short_circuited"] == 1
+
+
+def test_slow_successes_count_as_violations():
+    breaker = CircuitBreaker("test", failure_threshold=2, slo_seconds=1.0, cooldown=60)
+    breaker.record_success(5.0)
+    breaker.record_success(5.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = opened(cooldown=0.01)
+    time.sleep(0.02)
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = opened(cooldown=0.01)
+    time.sleep(0.02)
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.stats()["opened"] == 2
+
+
+def test_neutral_probe_outcome_allows_another_probe():
+    breaker = opened(cooldown=0.01)
+    time.sleep(0.02)
+    assert breaker.allow()
+
+    breaker.record_neutral()
+    assert breaker.state == HALF_OPEN and breaker.allow()
@@ -0,0 +1,61 @@
+import time
+
+from src.utils.budget import DEGRADATION_LADDER, MIN_CALL_SECONDS, LadderStep, TimeBudget
+
+
+def budget_spent(share: float, seconds: float = 100.0) -> TimeBudget:
+    """A budget that started long enough ago to have spent share of itself"""
+    return TimeBudget(seconds, started=time.time() - share * seconds)
+
+
+def test_unbounded_budget_stays_on_the_first_step():
+    budget = TimeBudget(0)
+    assert budget.seconds is None and budget.remaining() is None and budget.call_timeout() is None
+    assert budget.step() is DEGRADATION_LADDER[0]
+    assert budget.describe() == "no time budget"
+
+
+def test_steps_follow_the_spent_share():
+    assert budget_spent(0.1).step().name == "full analysis"
+    assert budget_spent(0.6).step().token_scale == 0.5
+    assert budget_spent(0.8).step().skip_optional
+    assert budget_spent(1.2).step().stop
+
+
+def test_on_change_fires_once_per_step_reached():
+    budget = budget_spent(0.6)
+    reached = []
+
+    budget.step(on_change=reached.append)
+    budget.step(on_change=reached.append)
+
+    assert [step.name for step in reached] == ["concise answers"]
+    assert budget.degraded and not budget.exhausted
+    assert budget.describe().startswith("concise answers after 60s of a 100s budget")
+
+
+def test_exhausted_once_the_stop_step_is_reached():
+    budget = budget_spent(1.5)
+    budget.step()
+    assert budget.exhausted
+
+
+def test_time_spent_queued_counts():
+    budget = TimeBudget(10, started=time.time() - 9.5)
+    assert budget.remaining() < 1
+    assert budget.step().name == "wrapping up"
+
+
+def test_calls_always_get_a_minimum_timeout():
+    assert budget_spent(0.1).call_timeout() > 80
+    assert budget_spent(2.0).call_timeout() == MIN_CALL_SECONDS
+
+
+def test_max_tokens_scales_with_a_floor():
+    assert LadderStep(0, "half", token_scale=0.5).max_tokens(300) == 150
+    assert LadderStep(0, "tiny", token_scale=0.01).max_tokens(300) == 32
+
+
+def test_custom_ladder():
+    ladder = [LadderStep(0.0, "normal"), LadderStep(0.5, "stop", stop=True)]
+    assert TimeBudget(100, started=time.time() - 60, ladder=ladder).step().name == "stop"
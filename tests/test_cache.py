@@ -0,0 +1,67 @@
+import time
+
+from src.utils.cache import LRUCache, ResponseCache, cache_key
+
+
+def test_cache_key_depends_on_every_part():
+    assert cache_key("anthropic", "model", "system", "prompt") == cache_key("anthropic", "model", "system", "prompt")
+    assert cache_key("anthropic", "model", "system", "prompt") != cache_key("anthropic", "model", "system", "prompt!")
+    assert cache_key("a", "bc") != cache_key("ab", "c")
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    cache = LRUCache(max_entries=2, ttl=0)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
+def test_expired_entries_are_only_served_stale():
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("old", "value", created=time.time() - 120)
+
+    assert cache.get("old") is None
+    assert cache.get("old", stale_ok=True) == "value"
+
+
+def test_disk_tier_survives_a_new_cache_and_is_promoted_to_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(10, ttl=0, path=path).set("key", "value")
+
+    cache = ResponseCache(10, ttl=0, path=path)
+    assert cache.get_memory("key") is None
+    assert cache.get_disk("key") == "value"
+    assert cache.get_memory("key") == "value"
+
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["hit_rate"] == 1.0
+
+
+def test_misses_are_counted_once_both_tiers_missed():
+    cache = ResponseCache(10, ttl=0)
+    assert cache.get_memory("key") is None
+    assert cache.get_disk("key") is None
+    assert cache.stats()["misses"] == 1 and cache.stats()["hit_rate"] == 0.0
+
+
+def test_stale_fallback_reads_expired_disk_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(10, ttl=0.01, path=path).set("key", "value")
+    time.sleep(0.05)
+
+    cache = ResponseCache(10, ttl=0.01, path=path)
+    assert cache.get_disk("key") is None
+    assert cache.get_stale("key") == "value"
+
+
+def test_unusable_disk_path_disables_the_disk_tier(tmp_path):
+    cache = ResponseCache(10, ttl=0, path=str(tmp_path / "missing" / "cache.sqlite3"))
+    assert cache.disk is None
+    cache.set("key", "value")
+    assert cache.get_memory("key") == "value"
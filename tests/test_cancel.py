@@ -0,0 +1,50 @@
+import pytest
+
+from src.utils.cancel import CancelToken, Cancelled
+
+
+def test_check_raises_with_the_first_reason_only():
+    token = CancelToken()
+    token.check()
+
+    token.cancel("superseded by a newer submission")
+    token.cancel("cancelled by request")
+
+    assert token.cancelled and token.reason == "superseded by a newer submission"
+    with pytest.raises(Cancelled, match="superseded"):
+        token.check()
+
+
+def test_callbacks_fire_once_on_cancel_and_not_after_their_block():
+    token = CancelToken()
+    fired = []
+
+    with token.on_cancel(lambda: fired.append("inside")):
+        pass
+    with token.on_cancel(lambda: fired.append("registered")):
+        token.cancel()
+        token.cancel()
+
+    assert fired == ["registered"]
+
+
+def test_callback_registered_after_cancel_fires_at_once():
+    token = CancelToken()
+    token.cancel()
+    fired = []
+
+    with token.on_cancel(lambda: fired.append("late")):
+        assert fired == ["late"]
+
+
+def test_failing_callback_does_not_stop_the_others():
+    token = CancelToken()
+    fired = []
+
+    def broken():
+        raise RuntimeError("boom")
+
+    with token.on_cancel(broken), token.on_cancel(lambda: fired.append("second")):
+        token.cancel()
+
+    assert fired == ["second"]
@@ -0,0 +1,71 @@
+from src.utils.compaction import (
+    ContextCompactor, estimate_tokens, extractive_digest, render, trim_text,
+)
+
+LONG = " ".join(f"Finding number {n} matters for the reply." for n in range(60))
+GROUPS = [[("Context", "Short note."), ("Relationship", LONG)], [("Recipient", LONG)]]
+
+
+def test_render_labels_sections_and_separates_groups():
+    assert render([[("A", "one"), ("B", "two")], [("C", "three")]]) == "A: one\nB: two\n\nC: three"
+
+
+def test_trim_text_keeps_leading_whole_sentences():
+    assert trim_text("Short.", 10) == "Short."
+    trimmed = trim_text("First sentence here. Second sentence here. Third one.", 8)
+    assert trimmed == "First sentence here. …"
+    assert trim_text("x" * 100 + " tail", 5).endswith(" …")
+
+
+def test_extractive_digest_fits_the_budget_and_keeps_every_label():
+    digest = extractive_digest(GROUPS, 200)
+
+    assert estimate_tokens(digest) <= 200
+    assert "Context: Short note." in digest  # short sections stay whole
+    assert "Relationship: Finding number 0" in digest and "Recipient: Finding number 0" in digest
+
+
+def test_small_contexts_pass_through():
+    compactor = ContextCompactor(max_tokens=10_000)
+    assert compactor.compact(GROUPS) == render(GROUPS)
+    assert compactor.stats()["compacted"] == 0
+
+
+def test_disabled_compactor_never_compacts():
+    compactor = ContextCompactor(max_tokens=0)
+    assert compactor.compact(GROUPS) == render(GROUPS) and not compactor.calls_llm
+
+
+def test_digests_are_made_once_and_shared():
+    calls = []
+
+    def summarize(text, max_tokens):
+        calls.append(max_tokens)
+        return "Digest."
+
+    compactor = ContextCompactor(max_tokens=100, summarize=summarize)
+    assert compactor.calls_llm
+    assert compactor.compact(GROUPS) == compactor.compact(GROUPS) == "Digest."
+
+    stats = compactor.stats()
+    assert calls == [100]
+    assert (stats["contexts"], stats["compacted"], stats["hits"], stats["mode"]) == (2, 1, 1, "summary")
+    assert stats["tokens_in"] == estimate_tokens(render(GROUPS)) and stats["tokens_out"] == estimate_tokens("Digest.")
+
+
+def test_failed_summary_falls_back_to_the_extractive_digest():
+    def summarize(text, max_tokens):
+        raise RuntimeError("provider down")
+
+    compactor = ContextCompactor(max_tokens=200, summarize=summarize)
+    assert compactor.compact(GROUPS) == extractive_digest(GROUPS, 200)
+    assert compactor.stats()["summary_failures"] == 1
+
+
+def test_digest_cache_is_bounded():
+    compactor = ContextCompactor(max_tokens=50, max_entries=2)
+    for number in range(3):
+        compactor.compact([[("Section", f"{number} {LONG}")]])
+    compactor.compact([[("Section", f"0 {LONG}")]])
+
+    assert compactor.stats()["hits"] == 0  # the oldest digest was evicted
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+from src.utils.events import MessageFeed, format_event, parse_event_id
+
+
+def message(agent, content, **fields):
+    return {"timestamp": time.time(), "agent": agent, "type": "message", "content": content, **fields}
+
+
+def collect(feed, count, **kwargs):
+    """The first count non-heartbeat events a follower of feed sees"""
+    events = []
+    for event in feed.follow(heartbeat=0.05, **kwargs):
+        if event[0] != "heartbeat":
+            events.append(event)
+        if len(events) == count:
+            return events
+
+
+def test_since_returns_only_new_messages_and_resets_on_a_new_run():
+    feed = MessageFeed()
+    feed.start()
+    feed.append(message("A", "one"))
+    page = feed.since()
+    assert [m["content"] for m in page["messages"]] == ["one"] and page["cursor"] == "1:1"
+
+    feed.append(message("B", "two"))
+    page = feed.since(page["cursor"])
+    assert [m["content"] for m in page["messages"]] == ["two"] and not page["reset"]
+
+    feed.finish()
+    assert feed.since(page["cursor"])["cursor"] == "1:2:done"
+
+    feed.start()
+    page = feed.since(page["cursor"])
+    assert page["reset"] and page["messages"] == [] and page["analysis_in_progress"]
+
+
+def test_since_long_polls_until_something_new_arrives():
+    feed = MessageFeed()
+    feed.start()
+    cursor = feed.since()["cursor"]
+    threading.Timer(0.05, feed.append, [message("A", "late")]).start()
+
+    started = time.monotonic()
+    page = feed.since(cursor, wait=5)
+
+    assert [m["content"] for m in page["messages"]] == ["late"]
+    assert time.monotonic() - started < 1
+
+
+def test_asince_awaits_without_blocking_the_loop():
+    feed = MessageFeed()
+    feed.start()
+
+    async def poll():
+        cursor = feed.since()["cursor"]
+        asyncio.get_running_loop().call_later(0.05, feed.append, message("A", "late"))
+        return await feed.asince(cursor, wait=5)
+
+    assert [m["content"] for m in asyncio.run(poll())["messages"]] == ["late"]
+
+
+def test_follow_sends_draft_deltas_then_the_finished_message():
+    feed = MessageFeed()
+    feed.start()
+    feed.draft("A", "Hel")
+    events = []
+    follower = feed.follow(heartbeat=0.05)
+    events.append(next(follower))
+    feed.draft("A", "Hello")
+    events.append(next(follower))
+    feed.append(message("A", "Hello!"))
+    events.append(next(follower))
+
+    assert events[0] == ("draft", "", {"agent": "A", "turn_id": "A", "text": "Hel"})
+    assert events[1] == ("draft", "", {"agent": "A", "turn_id": "A", "delta": "lo"})
+    assert events[2][0] == "message" and events[2][1] == "1:1"
+    assert feed.drafts == {}
+
+
+def test_one_agent_in_two_concurrent_turns_keeps_two_drafts():
+    feed = MessageFeed()
+    feed.start()
+    feed.draft("Goal Alignment", "Tone is", "dialogue5:2")
+    feed.draft("Goal Alignment", "Risks are", "dialogue6:1")
+    feed.append(message("Goal Alignment", "Tone is fine.", turn_id="dialogue5:2"))
+
+    assert feed.drafts == {"dialogue6:1": ("Goal Alignment", "Risks are")}
+    events = collect(feed, 2)
+    assert events[0][0] == "message" and events[0][2]["turn_id"] == "dialogue5:2"
+    assert events[1] == ("draft", "", {"agent": "Goal Alignment", "turn_id": "dialogue6:1", "text": "Risks are"})
+
+
+def test_reconnecting_follower_resumes_after_its_last_event():
+    feed = MessageFeed()
+    feed.start()
+    feed.append(message("A", "one"))
+    feed.append(message("B", "two"))
+    feed.finish()
+
+    generation, cursor, done_sent = parse_event_id("1:1")  # Last-Event-ID of the first message
+    events = collect(feed, 2, generation=generation, cursor=cursor, done_sent=done_sent)
+
+    assert events[0][0] == "message" and events[0][2]["content"] == "two"
+    assert events[1] == ("done", "1:2:done", {})
+
+
+def test_finish_of_a_superseded_generation_is_ignored():
+    feed = MessageFeed()
+    feed.start()
+    old = feed.generation
+    feed.start()
+    feed.finish(old)
+    assert feed.running
+    feed.finish(feed.generation)
+    assert not feed.running
+
+
+def test_event_ids_and_frames():
+    assert parse_event_id("3:7:done") == (3, 7, True)
+    assert parse_event_id("3:7") == (3, 7, False)
+    assert parse_event_id(None) == (None, 0, False)
+    assert parse_event_id("garbage") == (None, 0, False)
+    assert format_event("heartbeat", "", {}) == ": keep-alive\n\n"
+    assert format_event("done", "1:2:done", {}) == 'id: 1:2:done\nevent: done\ndata: {}\n\n'
+    assert format_event("draft", "", {"agent": "A"}) == 'event: draft\ndata: {"agent": "A"}\n\n'
+
+
+def test_followers_stop_after_a_finished_runs_done_event():
+    feed = MessageFeed()
+    feed.start()
+    feed.append(message("A", "one"))
+    feed.finish()
+
+    assert [event[0] for event in feed.follow(heartbeat=0.05)] == ["message", "done"]
+    assert list(feed.follow(*parse_event_id("1:1:done"), heartbeat=0.05)) == []  # reconnected after done
+
+    async def follow():
+        return [event[0] async for event in feed.afollow(heartbeat=0.05)]
+
+    assert asyncio.run(follow()) == ["message", "done"]
@@ -0,0 +1,106 @@
+import itertools
+
+from src.utils.fairqueue import BULK, INTERACTIVE, FairQueue
+
+_clock = itertools.count()
+
+
+class FakeJob:
+    def __init__(self, tenant, priority=INTERACTIVE, name=""):
+        self.tenant = tenant
+        self.priority = priority
+        self.submitted = next(_clock)
+        self.name = name or tenant
+
+    def __repr__(self):
+        return self.name
+
+
+def drain(queue):
+    """Pop every startable job, releasing each at once (one worker)"""
+    order = []
+    while True:
+        job = queue.pop()
+        if job is None:
+            return order
+        order.append(job.name)
+        queue.release(job)
+
+
+def test_tenants_take_turns_instead_of_first_come_first_served():
+    queue = FairQueue()
+    for number in range(3):
+        queue.push(FakeJob("big", name=f"big{number}"))
+    queue.push(FakeJob("small"))
+
+    assert drain(queue) == ["big0", "small", "big1", "big2"]
+
+
+def test_weights_share_the_workers_proportionally():
+    queue = FairQueue(tenant_weights={"heavy": 2})
+    for number in range(4):
+        queue.push(FakeJob("heavy", name=f"h{number}"))
+        queue.push(FakeJob("light", name=f"l{number}"))
+
+    assert drain(queue)[:6] == ["h0", "l0", "h1", "l1", "h2", "h3"]  # two heavy turns per light one
+
+
+def test_interactive_jobs_go_before_bulk_ones():
+    queue = FairQueue()
+    queue.push(FakeJob("a", BULK, "bulk"))
+    queue.push(FakeJob("b", INTERACTIVE, "interactive"))
+
+    assert drain(queue) == ["interactive", "bulk"]
+
+
+def test_tenant_cap_holds_a_tenants_next_job_until_one_finishes():
+    queue = FairQueue(tenant_cap=1)
+    first, second = FakeJob("a", name="a0"), FakeJob("a", name="a1")
+    queue.push(first)
+    queue.push(second)
+
+    assert queue.pop() is first
+    assert queue.pop() is None
+    queue.release(first)
+    assert queue.pop() is second
+
+
+def test_class_cap_leaves_workers_for_the_other_class():
+    queue = FairQueue(class_caps={BULK: 1})
+    queue.push(FakeJob("a", BULK, "bulk0"))
+    queue.push(FakeJob("b", BULK, "bulk1"))
+
+    assert queue.pop().name == "bulk0"
+    assert queue.pop() is None
+    queue.push(FakeJob("c", INTERACTIVE, "interactive"))
+    assert queue.pop().name == "interactive"
+
+
+def test_removed_job_gives_its_turn_back():
+    queue = FairQueue()
+    first, cancelled = FakeJob("a", name="a0"), FakeJob("a", name="a1")
+    queue.push(first)
+    queue.push(cancelled)
+    queue.remove(cancelled)
+    queue.push(FakeJob("a", name="a2"))
+    queue.push(FakeJob("b", name="b0"))
+    queue.push(FakeJob("b", name="b1"))
+
+    assert cancelled not in queue and len(queue) == 4
+    assert drain(queue) == ["a0", "b0", "a2", "b1"]  # a2 queues where a1 was, not behind it
+
+
+def test_positions_and_counts():
+    queue = FairQueue()
+    bulk = FakeJob("a", BULK, "bulk")
+    jobs = [FakeJob("a", name="a0"), FakeJob("a", name="a1"), FakeJob("b", name="b0")]
+    queue.push(bulk)
+    for job in jobs:
+        queue.push(job)
+
+    assert [queue.position(job) for job in jobs] == [0, 2, 1]
+    assert queue.position(bulk) == 3
+    assert queue.queued() == {INTERACTIVE: 3, BULK: 1}
+    running = queue.pop()
+    assert queue.tenants() == {"a": {"queued": 2, "running": 1}, "b": {"queued": 1, "running": 0}}
+    assert queue.position(running) == 0
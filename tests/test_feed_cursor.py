@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+from src.utils.feed_cursor import cursor_etag, etag_matches, format_cursor, long_poll, parse_cursor
+
+AGENTS = ["analyzer", "evaluator", "output"]
+
+
+def test_cursor_round_trip_ignores_unknown_agents_and_bad_positions():
+    positions = parse_cursor("output:3, analyzer:12,critic:9,evaluator:x", AGENTS)
+    assert positions == {"analyzer": 12, "evaluator": 0, "output": 3}
+    assert format_cursor(positions) == "analyzer:12,evaluator:0,output:3"
+    assert format_cursor(parse_cursor(None, AGENTS)) == "analyzer:0,evaluator:0,output:0"
+
+
+def test_etags_hold_no_commas_and_match_if_none_match():
+    etag = cursor_etag("analyzer:12,evaluator:4")
+    assert etag == '"analyzer:12/evaluator:4"'
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches(f"W/{etag}", etag) and etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+
+
+def test_long_poll_returns_once_an_agent_moves_past_the_cursor():
+    calls = []
+
+    async def collect(since):
+        calls.append(since)
+        return {"messages": [], "cursor": "analyzer:1,evaluator:0,output:0" if len(calls) == 3 else "analyzer:0,evaluator:0,output:0"}
+
+    body = asyncio.run(long_poll(collect, "analyzer:0", AGENTS, wait=5, interval=0.01))
+    assert body["cursor"].startswith("analyzer:1") and calls == ["analyzer:0"] * 3
+
+
+def test_long_poll_gives_up_when_the_wait_is_over():
+    async def collect(since):
+        return {"messages": [], "cursor": format_cursor(parse_cursor(since, AGENTS))}
+
+    started = time.monotonic()
+    body = asyncio.run(long_poll(collect, None, AGENTS, wait=0.1, interval=0.02))
+    assert body["messages"] == [] and time.monotonic() - started < 1
+    assert asyncio.run(long_poll(collect, None, AGENTS, wait=0, interval=0.02))["cursor"] == "analyzer:0,evaluator:0,output:0"
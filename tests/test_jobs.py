@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.cancel import Cancelled
+from src.utils.config import (
+    ASYNC_JOB_WORKERS, JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY,
+    JOB_TENANT_WEIGHTS, JOB_TENANT_MAX_RUNNING, JOB_INTERACTIVE_RESERVED,
+)
+from src.utils.jobs import AsyncJobQueue, JobQueue, QueueFull, CANCELLED, DONE, FAILED
+
+FAIR_SHARE = dict(
+    tenant_weights=JOB_TENANT_WEIGHTS,
+    tenant_cap=JOB_TENANT_MAX_RUNNING,
+    interactive_reserved=JOB_INTERACTIVE_RESERVED,
+)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_queue_with_backend_config():
+    ran = []
+    jobs = JobQueue(lambda job: ran.append(job.params["n"]), JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, **FAIR_SHARE)
+    job = jobs.submit(tenant="a", n=1)
+    wait_for(lambda: job.is_finished)
+    assert job.status == DONE and ran == [1]
+
+
+def test_async_job_queue_with_async_server_config():
+    """The construction backend/app_async.py does at import time."""
+    async def run(job):
+        await asyncio.sleep(0)
+        if job.params["fail"]:
+            raise RuntimeError("boom")
+
+    async def main():
+        jobs = AsyncJobQueue(run, ASYNC_JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY, **FAIR_SHARE)
+        jobs.start()
+        ok, bad = jobs.submit(tenant="a", fail=False), jobs.submit(tenant="b", fail=True)
+        while not (ok.is_finished and bad.is_finished):
+            await asyncio.sleep(0.01)
+        return ok, bad
+
+    ok, bad = asyncio.run(main())
+    assert ok.status == DONE
+    assert bad.status == FAILED and bad.error == "boom"
+
+
+def test_async_job_cancel_cancels_task():
+    async def run(job):
+        await asyncio.sleep(30)
+
+    async def main():
+        jobs = AsyncJobQueue(run, 2, 4, **FAIR_SHARE)
+        jobs.start()
+        job = jobs.submit()
+        while job.status != "running":
+            await asyncio.sleep(0.01)
+        jobs.cancel(job.id, "stop")
+        while not job.is_finished:
+            await asyncio.sleep(0.01)
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == CANCELLED and job.error == "stop"
+
+
+def test_queue_full_and_unknown_priority():
+    release = threading.Event()
+    jobs = JobQueue(lambda job: release.wait(5), workers=1, max_queued=1)
+    first = jobs.submit()
+    wait_for(lambda: first.status == "running")
+    jobs.submit()
+    with pytest.raises(QueueFull):
+        jobs.submit()
+    with pytest.raises(ValueError):
+        jobs.submit(priority="urgent")
+    release.set()
+
+
+def test_same_session_supersedes_only_its_own_jobs():
+    def run(job):
+        while True:
+            job.cancel_token.check()
+            time.sleep(0.01)
+
+    jobs = JobQueue(run, workers=3, max_queued=4)
+    mine, other = jobs.submit(session="s1"), jobs.submit(session="s2")
+    wait_for(lambda: mine.status == "running" and other.status == "running")
+    newer = jobs.submit(session="s1")
+    wait_for(lambda: mine.is_finished)
+    assert mine.status == CANCELLED and "superseded" in mine.error
+    assert not other.is_finished
+    for job in (other, newer):
+        jobs.cancel(job.id)
+    wait_for(lambda: other.is_finished and newer.is_finished)
+
+
+def test_worker_reports_cancelled_run():
+    def run(job):
+        raise Cancelled("gone")
+
+    jobs = JobQueue(run, workers=1, max_queued=1)
+    job = jobs.submit()
+    wait_for(lambda: job.is_finished)
+    assert job.status == CANCELLED and job.error == "gone"
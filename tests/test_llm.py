@@ -0,0 +1,193 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import uuid
+
+import pytest
+
+from src.utils import llm
+from src.utils.cancel import CancelToken, Cancelled
+
+MODEL = "test-model"
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Replace provider requests with a fake that records every prompt it is sent"""
+    fake = {"prompts": [], "delay": 0.05, "cancelled": 0}
+
+    async def call(provider, model, system, prompt, max_tokens, temperature, json_mode, on_partial=None):
+        fake["prompts"].append(prompt)
+        try:
+            await asyncio.sleep(fake["delay"])
+        except asyncio.CancelledError:
+            fake["cancelled"] += 1
+            raise
+        if on_partial:
+            on_partial("Reply")
+        return f"Reply to {prompt}"
+
+    monkeypatch.setattr(llm, "_call", call)
+    return fake
+
+
+def unique_prompt() -> str:
+    """A prompt no earlier test has cached"""
+    return f"prompt {uuid.uuid4().hex}"
+
+
+def test_sync_completion_is_answered_from_memory_the_second_time(provider):
+    prompt = unique_prompt()
+
+    assert llm.complete_sync("anthropic", MODEL, "system", prompt) == f"Reply to {prompt}"
+    assert llm.complete_sync("anthropic", MODEL, "system", prompt) == f"Reply to {prompt}"
+    assert provider["prompts"] == [prompt]
+
+
+def test_async_completion_from_another_event_loop(provider):
+    prompt = unique_prompt()
+    assert asyncio.run(llm.complete("openai", MODEL, "", prompt)) == f"Reply to {prompt}"
+
+
+def test_streamed_completion_reports_partial_text(provider):
+    partials = []
+    prompt = unique_prompt()
+
+    text = llm.complete_sync("anthropic", MODEL, "system", prompt, on_partial=partials.append)
+
+    assert partials == ["Reply"] and text == f"Reply to {prompt}"
+
+
+def test_total_timeout_raises_timeout_error(provider):
+    provider["delay"] = 1.0
+    with pytest.raises(TimeoutError):
+        llm.complete_sync("anthropic", MODEL, "system", unique_prompt(), total_timeout=0.05)
+
+
+def test_unknown_provider_is_rejected(provider):
+    with pytest.raises(ValueError, match="Unknown LLM provider"):
+        llm.complete_sync("nobody", MODEL, "system", unique_prompt())
+
+
+def test_stats_cover_every_provider():
+    stats = llm.llm_stats()
+    assert set(stats["rate_limits"]) == set(stats["breakers"]) == set(llm.limiters)
+    assert "in_flight" in stats["requests"]
+
+
+def test_identical_concurrent_requests_share_one_provider_call(provider):
+    prompt = unique_prompt()
+    before = llm.llm_stats()["requests"]["coalesced"]
+
+    async def burst():
+        return await asyncio.gather(*[llm.complete("anthropic", MODEL, "system", prompt) for _ in range(3)])
+
+    assert asyncio.run(burst()) == [f"Reply to {prompt}"] * 3
+    assert provider["prompts"] == [prompt]
+    assert llm.llm_stats()["requests"]["coalesced"] - before == 2
+
+
+def test_joining_caller_receives_the_streamed_text(provider):
+    prompt = unique_prompt()
+    provider["delay"] = 0.1
+    partials = []
+
+    async def join_late():
+        first = asyncio.ensure_future(llm.complete("anthropic", MODEL, "system", prompt, on_partial=lambda text: None))
+        await asyncio.sleep(0.02)
+        second = llm.complete("anthropic", MODEL, "system", prompt, on_partial=partials.append)
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(join_late()) == [f"Reply to {prompt}"] * 2
+    assert provider["prompts"] == [prompt] and partials == ["Reply"]
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+def test_server_errors_are_retried_with_backoff(provider, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.01)
+    fake_call = llm._call
+    failures = [ServerError("overloaded")]
+
+    async def flaky(*args, **kwargs):
+        if failures:
+            raise failures.pop()
+        return await fake_call(*args, **kwargs)
+
+    monkeypatch.setattr(llm, "_call", flaky)
+    prompt = unique_prompt()
+    before = llm.llm_stats()["requests"]["retries"]
+
+    assert llm.complete_sync("openai", MODEL, "", prompt) == f"Reply to {prompt}"
+    assert llm.llm_stats()["requests"]["retries"] - before == 1
+
+
+def test_caller_errors_are_not_retried(provider, monkeypatch):
+    class BadRequest(Exception):
+        status_code = 400
+
+    async def rejected(*args, **kwargs):
+        provider["prompts"].append(args[3])
+        raise BadRequest("invalid model")
+
+    monkeypatch.setattr(llm, "_call", rejected)
+    with pytest.raises(BadRequest):
+        llm.complete_sync("openai", MODEL, "", unique_prompt())
+    assert len(provider["prompts"]) == 1
+
+
+def test_open_circuit_serves_the_stale_cache_or_fails_fast(provider, monkeypatch):
+    cached = unique_prompt()
+    llm.complete_sync("asi1", MODEL, "", cached)
+    monkeypatch.setattr(llm.response_cache.memory, "ttl", 1e-9)  # everything cached is now stale
+
+    breaker = llm.breakers["asi1"]
+    monkeypatch.setattr(breaker, "state", "open")
+    monkeypatch.setattr(breaker, "_opened_at", float("inf"))  # no probe until the test is over
+
+    assert llm.complete_sync("asi1", MODEL, "", cached) == f"Reply to {cached}"
+    with pytest.raises(llm.ProviderUnavailable):
+        llm.complete_sync("asi1", MODEL, "", unique_prompt())
+    assert provider["prompts"] == [cached]
+
+
+def test_cancelling_a_sync_caller_abandons_its_provider_call(provider):
+    provider["delay"] = 1.0
+    cancel = CancelToken()
+    threading.Timer(0.05, cancel.cancel, ["superseded by a newer submission"]).start()
+
+    started = time.monotonic()
+    with pytest.raises(Cancelled, match="superseded"):
+        llm.complete_sync("anthropic", MODEL, "system", unique_prompt(), cancel=cancel)
+
+    assert time.monotonic() - started < 0.5
+    deadline = time.monotonic() + 1
+    while not provider["cancelled"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert provider["cancelled"] == 1
+
+
+def test_cancelled_caller_leaves_a_shared_call_to_the_others(provider):
+    provider["delay"] = 0.2
+    prompt = unique_prompt()
+    cancel = CancelToken()
+    other = concurrent.futures.ThreadPoolExecutor(1).submit(llm.complete_sync, "anthropic", MODEL, "system", prompt)
+    time.sleep(0.02)
+    threading.Timer(0.05, cancel.cancel).start()
+
+    with pytest.raises(Cancelled):
+        llm.complete_sync("anthropic", MODEL, "system", prompt, cancel=cancel)
+
+    assert other.result(2) == f"Reply to {prompt}"
+    assert provider["prompts"] == [prompt] and provider["cancelled"] == 0
+
+
+def test_cancelled_token_is_checked_before_any_request(provider):
+    cancel = CancelToken()
+    cancel.cancel("cancelled by request")
+    with pytest.raises(Cancelled):
+        llm.complete_sync("anthropic", MODEL, "system", unique_prompt(), cancel=cancel)
+    assert provider["prompts"] == []
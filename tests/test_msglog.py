@@ -0,0 +1,99 @@
+import os
+
+from src.utils.msglog import MessageLog
+
+
+def record(number):
+    return {"timestamp": float(number), "agent": "Analyzer", "type": "message", "content": f"message {number}"}
+
+
+def fill(log, count):
+    for number in range(len(log), len(log) + count):
+        assert log.append(record(number)) == number
+
+
+def contents(records):
+    return [r["content"] for r in records]
+
+
+def test_reads_across_segments_from_any_index(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=4)
+    fill(log, 10)
+
+    assert len(log) == 10
+    assert contents(log.read(3, limit=3)) == ["message 3", "message 4", "message 5"]
+    assert contents(log.read(8)) == ["message 8", "message 9"]
+    assert log.read(10) == []
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".log")]) == 3
+
+
+def test_reopened_log_keeps_counting(tmp_path):
+    fill(MessageLog(str(tmp_path), segment_size=4), 6)
+
+    log = MessageLog(str(tmp_path), segment_size=4)
+    assert len(log) == 6
+    assert log.append(record(6)) == 6
+    assert contents(log.read(5)) == ["message 5", "message 6"]
+
+
+def test_torn_append_is_cut_off_on_open(tmp_path):
+    fill(MessageLog(str(tmp_path), segment_size=4), 6)
+    with open(tmp_path / "000000000004.log", "ab") as data:
+        data.write(b'{"content": "half a rec')  # crashed before its index entry
+
+    log = MessageLog(str(tmp_path), segment_size=4)
+    assert len(log) == 6
+    log.append(record(6))
+    assert contents(log.read(6)) == ["message 6"]
+
+
+def test_retention_by_count_drops_whole_sealed_segments(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=4, max_records=5)
+    fill(log, 14)
+
+    assert log.compact() == 8
+    assert log.first == 8
+    assert contents(log.read(0, limit=2)) == ["message 8", "message 9"]  # a trimmed cursor resumes at the oldest
+    assert log.append(record(14)) == 14
+
+
+def test_segment_being_appended_to_is_never_dropped(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=4, max_age=1)
+    fill(log, 6)
+
+    assert log.compact(now=1e12) == 4
+    assert contents(log.read(0)) == ["message 4", "message 5"]
+
+
+def test_retention_by_size(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=2, max_bytes=1)
+    fill(log, 6)
+
+    assert log.compact() == 4
+    assert log.first == 4
+
+
+def test_no_limits_keep_everything(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=2)
+    fill(log, 6)
+    assert log.compact() == 0 and log.first == 0
+
+
+def test_cursor_past_the_end_starts_over(tmp_path):
+    fill(MessageLog(str(tmp_path / "old"), segment_size=4), 10)
+    log = MessageLog(str(tmp_path / "new"), segment_size=4)  # the agent restarted on a fresh log
+    fill(log, 3)
+
+    assert log.resume(10) == (0, True)
+    assert contents(log.read(10)) == ["message 0", "message 1", "message 2"]
+    assert log.resume(3) == (3, False) and log.read(3) == []
+    assert log.resume(1) == (1, False)
+
+
+def test_cursor_past_the_end_of_a_trimmed_log_starts_at_the_oldest(tmp_path):
+    log = MessageLog(str(tmp_path), segment_size=4, max_records=5)
+    fill(log, 14)
+    log.compact()
+
+    assert log.resume(20) == (8, True)
+    assert log.resume(2) == (8, False)
@@ -0,0 +1,128 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.cancel import CancelToken, Cancelled
+from src.utils.pipeline import DialogueGraph, DialogueNode
+
+
+def reply(text, delay=0.0):
+    """Node runner that publishes text as its only turn after delay seconds"""
+    def run(values, on_turn):
+        time.sleep(delay)
+        on_turn(1, text.format(**values))
+    return run
+
+
+def test_nodes_start_once_their_inputs_are_published():
+    graph = DialogueGraph([
+        DialogueNode("a", reply("A({email})", 0.05), needs=["email"], outputs={"a": 1}),
+        DialogueNode("b", reply("B({email})", 0.01), needs=["email"], outputs={"b": 1}),
+        DialogueNode("c", reply("C({a},{b})"), needs=["a", "b"], outputs={"c": 1}),
+    ], inputs=["email"])
+
+    run = graph.run({"email": "hi"})
+
+    assert run.values["c"] == "C(A(hi),B(hi))"
+    assert run.critical_path == ["a", "c"]  # a arrived last, so it gated c
+
+
+def test_early_turns_unblock_dependents_before_the_dialogue_ends():
+    def dialogue(values, on_turn):
+        on_turn(1, "draft")
+        time.sleep(0.1)
+        on_turn(2, "final")
+
+    graph = DialogueGraph([
+        DialogueNode("long", dialogue, outputs={"draft": 1, "final": 2}),
+        DialogueNode("reader", reply("read {draft}"), needs=["draft"], outputs={"read": 1}),
+    ], inputs=[])
+
+    run = graph.run({})
+
+    assert run.values["read"] == "read draft"
+    assert run.finished["reader"] < run.finished["long"]
+
+
+@pytest.mark.parametrize("nodes, message", [
+    ([DialogueNode("a", reply("x"), outputs={"v": 1}), DialogueNode("a", reply("y"), outputs={"w": 1})], "unique"),
+    ([DialogueNode("a", reply("x"), outputs={"v": 1}), DialogueNode("b", reply("y"), outputs={"v": 1})], "more than once"),
+    ([DialogueNode("a", reply("x"), needs=["missing"], outputs={"v": 1})], "No node produces: missing"),
+    ([DialogueNode("a", reply("x"), needs=["w"], outputs={"v": 1}),
+      DialogueNode("b", reply("y"), needs=["v"], outputs={"w": 1})], "cycle"),
+])
+def test_invalid_graphs_are_rejected(nodes, message):
+    with pytest.raises(ValueError, match=message):
+        DialogueGraph(nodes, inputs=[])
+
+
+def test_node_finishing_without_its_outputs_fails_the_run():
+    graph = DialogueGraph([DialogueNode("silent", lambda values, on_turn: None, outputs={"v": 1})], inputs=[])
+    with pytest.raises(RuntimeError, match="silent finished without producing: v"):
+        graph.run({})
+
+
+def test_failed_node_cancels_and_waits_for_its_siblings():
+    cancel = CancelToken()
+    sibling_stopped = threading.Event()
+
+    def sibling(values, on_turn):
+        try:
+            while True:
+                cancel.check()
+                time.sleep(0.01)
+        finally:
+            sibling_stopped.set()
+
+    def failing(values, on_turn):
+        time.sleep(0.05)
+        raise RuntimeError("provider down")
+
+    graph = DialogueGraph([
+        DialogueNode("sibling", sibling, outputs={"s": 1}),
+        DialogueNode("failing", failing, outputs={"f": 1}),
+    ], inputs=[])
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        graph.run({}, cancel=cancel)
+
+    assert cancel.cancelled
+    assert sibling_stopped.is_set()  # already stopped when run() raised
+
+
+def test_cancelled_run_raises_cancelled():
+    cancel = CancelToken()
+
+    def node(values, on_turn):
+        cancel.cancel("cancelled by request")
+        cancel.check()
+
+    graph = DialogueGraph([DialogueNode("n", node, outputs={"v": 1})], inputs=[])
+    with pytest.raises(Cancelled, match="cancelled by request"):
+        graph.run({}, cancel=cancel)
+
+
+def test_run_async_cancels_and_awaits_siblings_on_failure():
+    state = {}
+
+    async def sibling(values, on_turn):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            state["sibling"] = "cancelled"
+            raise
+
+    async def failing(values, on_turn):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    graph = DialogueGraph([
+        DialogueNode("sibling", reply("x"), outputs={"s": 1}, arun=sibling),
+        DialogueNode("failing", reply("y"), outputs={"f": 1}, arun=failing),
+    ], inputs=[])
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        asyncio.run(graph.run_async({}))
+    assert state["sibling"] == "cancelled"
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from src.utils.ratelimit import FAILED, NEUTRAL, OK, THROTTLED, ProviderLimiter
+
+
+def test_concurrency_window_admits_one_more_once_a_slot_is_released():
+    limiter = ProviderLimiter("test", rpm=1000, tpm=100000, max_concurrency=2)
+
+    async def scenario():
+        await limiter.acquire(10)
+        await limiter.acquire(10)
+        third = asyncio.ensure_future(limiter.acquire(10))
+        await asyncio.sleep(0.05)
+        assert not third.done()
+        limiter.release(OK)
+        await asyncio.wait_for(third, 1)
+
+    asyncio.run(scenario())
+    assert limiter.active == 2 and limiter.stats()["granted"] == 3
+
+
+def test_window_halves_on_failure_and_creeps_back_on_success():
+    limiter = ProviderLimiter("test", rpm=1000, tpm=100000, max_concurrency=8)
+
+    limiter.active = 2
+    limiter.release(FAILED)
+    limiter.release(THROTTLED)
+    assert limiter.window == 2.0
+    assert limiter.stats()["failed"] == limiter.stats()["throttled"] == 1
+
+    limiter.active = 2
+    limiter.release(NEUTRAL)
+    assert limiter.window == 2.0
+    limiter.release(OK)
+    assert limiter.window == 2.5
+
+
+def test_window_never_drops_below_one():
+    limiter = ProviderLimiter("test", rpm=1000, tpm=100000, max_concurrency=2)
+    for _ in range(5):
+        limiter.active = 1
+        limiter.release(FAILED)
+    assert limiter.window == 1.0
+
+
+def test_request_budget_paces_requests_once_spent():
+    limiter = ProviderLimiter("test", rpm=600, tpm=100000, max_concurrency=10)  # one request per 0.1s
+
+    async def scenario():
+        limiter._requests = 0.0
+        started = time.monotonic()
+        await limiter.acquire(1)
+        return time.monotonic() - started
+
+    assert 0.05 < asyncio.run(scenario()) < 1
+
+
+def test_retry_after_pauses_admission():
+    limiter = ProviderLimiter("test", rpm=1000, tpm=100000, max_concurrency=4)
+    limiter.active = 1
+    limiter.release(THROTTLED, retry_after=0.1)
+
+    async def scenario():
+        started = time.monotonic()
+        await limiter.acquire(1)
+        return time.monotonic() - started
+
+    assert 0.05 < asyncio.run(scenario()) < 1
+
+
+def test_oversized_request_is_capped_at_the_token_budget():
+    limiter = ProviderLimiter("test", rpm=1000, tpm=100, max_concurrency=4)
+    asyncio.run(asyncio.wait_for(limiter.acquire(10_000), 1))
+    assert limiter.active == 1
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from src.utils.resilience import LatencyTracker, backoff_delay, first_success
+
+
+def test_percentile_needs_enough_samples():
+    tracker = LatencyTracker(window=100, min_samples=5)
+    for seconds in (1, 2, 3, 4):
+        tracker.record(seconds)
+    assert tracker.percentile(0.95) is None
+    tracker.record(5)
+    assert tracker.percentile(0.95) == 5
+    assert tracker.percentile(0.5) == 3
+
+
+def test_backoff_is_jittered_below_a_capped_exponential():
+    for attempt in range(6):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=4) <= min(4, 0.5 * 2 ** attempt)
+
+
+def hedged(delays, hedge_after):
+    """first_success() over attempts that take the given delays in turn"""
+    counters = {"hedges": 0, "hedge_wins": 0}
+    started, cancelled = [], []
+
+    async def attempt():
+        number = len(started)
+        started.append(number)
+        try:
+            await asyncio.sleep(delays[number])
+        except asyncio.CancelledError:
+            cancelled.append(number)
+            raise
+        return f"attempt {number}"
+
+    result = asyncio.run(first_success(attempt, hedge_after, counters))
+    return result, counters, started, cancelled
+
+
+def test_fast_attempt_is_not_hedged():
+    result, counters, started, _ = hedged([0.01], hedge_after=0.5)
+    assert result == "attempt 0" and counters["hedges"] == 0 and started == [0]
+
+
+def test_slow_attempt_is_raced_by_a_hedge_that_wins():
+    result, counters, started, cancelled = hedged([1.0, 0.01], hedge_after=0.05)
+    assert result == "attempt 1"
+    assert counters == {"hedges": 1, "hedge_wins": 1}
+    assert cancelled == [0]
+
+
+def test_failed_hedge_leaves_the_first_attempt_to_finish():
+    async def scenario():
+        counters = {"hedges": 0, "hedge_wins": 0}
+        calls = []
+
+        async def attempt():
+            calls.append(len(calls))
+            if len(calls) == 2:
+                raise RuntimeError("hedge failed")
+            await asyncio.sleep(0.1)
+            return "first"
+
+        return await first_success(attempt, 0.02, counters), counters
+
+    result, counters = asyncio.run(scenario())
+    assert result == "first" and counters == {"hedges": 1, "hedge_wins": 0}
+
+
+def test_last_error_is_raised_when_every_attempt_fails():
+    async def attempt():
+        await asyncio.sleep(0.03)
+        raise RuntimeError("provider down")
+
+    with pytest.raises(RuntimeError, match="provider down"):
+        asyncio.run(first_success(attempt, 0.01, {"hedges": 0, "hedge_wins": 0}))
@@ -0,0 +1,82 @@
+import pytest
+
+from src.utils.store import ResultStore, email_job_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.sqlite3"), flush_interval=0.01)
+
+
+def test_job_updates_keep_the_fields_they_leave_out(store):
+    store.save_job("job-1", source="app", sender="Manager", status="queued", submitted=1.0)
+    store.save_job("job-1", status="done", finished=2.0)
+
+    job = store.get_job("job-1")
+    assert (job["source"], job["sender"], job["status"], job["submitted"], job["finished"]) == (
+        "app", "Manager", "done", 1.0, 2.0,
+    )
+    assert store.get_job("job-2") is None
+
+
+def test_unknown_job_fields_are_rejected(store):
+    with pytest.raises(ValueError, match="Unknown job fields: colour"):
+        store.save_job("job-1", colour="blue")
+
+
+def test_outputs_and_transcript_read_back_in_order(store):
+    store.save_job("job-1", status="running")
+    store.save_outputs("job-1", {"context_analysis": "first", "tone_validation": "second"})
+    store.save_output("job-1", "context_analysis", "replaced")
+    for content in ("one", "two", "three"):
+        store.save_message("job-1", {"timestamp": 1.0, "agent": "A", "type": "message", "content": content})
+
+    result = store.get_result("job-1")
+    assert result["outputs"] == {"context_analysis": "replaced", "tone_validation": "second"}
+    assert [m["content"] for m in result["messages"]] == ["one", "two", "three"]
+    assert store.get_result("missing") is None
+
+
+def test_writes_survive_reopening_the_file(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    first = ResultStore(path, flush_interval=0.01)
+    first.save_job("job-1", status="done")
+    first.flush()
+
+    assert ResultStore(path).get_job("job-1")["status"] == "done"
+
+
+def test_find_jobs_filters_and_orders_newest_first(store):
+    store.save_job("old", sender="Manager", recipient="Team", score=4.0, submitted=100.0)
+    store.save_job("new", sender="Manager", recipient="Client", score=8.0, submitted=200.0, email_text="secret")
+    store.save_job("other", sender="Intern", recipient="Team", score=6.0, submitted=300.0)
+
+    assert [job["id"] for job in store.find_jobs(sender="Manager")] == ["new", "old"]
+    assert [job["id"] for job in store.find_jobs(min_score=5.0, max_score=7.0)] == ["other"]
+    assert [job["id"] for job in store.find_jobs(since=150.0, until=250.0)] == ["new"]
+    assert [job["id"] for job in store.find_jobs(limit=1)] == ["other"]
+    assert "email_text" not in store.find_jobs()[0]
+
+
+def test_writes_are_committed_in_batches(store):
+    for number in range(20):
+        store.save_message("job-1", {"timestamp": float(number), "agent": "A", "type": "message", "content": "x"})
+    store.flush()
+
+    stats = store.stats()
+    assert stats["writes"] == 20 and stats["batches"] < 20 and stats["pending"] == 0
+
+
+def test_disabled_store_drops_writes_and_reads_nothing():
+    store = ResultStore("")
+    store.save_job("job-1", status="done")
+    store.flush()
+    assert not store.enabled
+    assert store.get_job("job-1") is None and store.find_jobs() == []
+
+
+def test_every_submission_of_an_email_gets_its_own_job_id():
+    assert email_job_id("text", "Manager", "Team") != email_job_id("text", "Manager", "Team")
+    assert email_job_id("text", "Manager", "Team", "n1") == email_job_id("text", "Manager", "Team", "n1")
+    assert email_job_id("text", "Manager", "Team", "n1") != email_job_id("text", "Manager", "Client", "n1")
+    assert len(email_job_id("text", "Manager", "Team")) == 16